@@ -1,34 +1,96 @@
 __version__ = "0.1.0"
 
 import os
-from browsergym.core.registration import register_task
+from functools import partial
+
 import gymnasium as gym
-import json
 from . import config
-from .tasks.group2.group2_tasks import GenericGroup2Task, JSONOutputTask
-from .tasks.long_horizon.see_image_and_do import  SeeImageAndCreateIncidentTask
+from .catalog import REPORT_SUFFIX, get_catalog
 
 ALL_FIELDWORKARENA_TASK_IDS = []
 
-# Add all tasks in group2 to the registry
-for task_file in os.listdir(config.G2_TASK_PATH):
-    if task_file.endswith(".json"):
-        #jsonファイルを読み込む
-        with open(os.path.join(config.G2_TASK_PATH, task_file), 'r', encoding='utf-8') as f:
-            task_configs = json.load(f)
-            for task_config in task_configs:
-                task_id = "fieldworkarena." + task_config["id"]
-                if task_config["output_format"] == "json":
-                    register_task(task_id, JSONOutputTask, task_kwargs={"task_id": task_id})
-                else:
-                    register_task(task_id, GenericGroup2Task, task_kwargs={"task_id": task_id})
-                report_task_id = task_id + ".report"
-                register_task(report_task_id, SeeImageAndCreateIncidentTask, task_kwargs={"image_task_id": task_id})
-
-                ALL_FIELDWORKARENA_TASK_IDS.append(task_id)
+# task classes are imported on first use, see __getattr__
+_TASK_CLASSES = {
+    "GenericGroup2Task": ".tasks.group2.group2_tasks",
+    "JSONOutputTask": ".tasks.group2.group2_tasks",
+    "SeeImageAndCreateIncidentTask": ".tasks.long_horizon.see_image_and_do",
+}
+
+
+def _task_class(name: str):
+    import importlib
+
+    return getattr(importlib.import_module(_TASK_CLASSES[name], __name__), name)
+
+
+def __getattr__(name):
+    if name in _TASK_CLASSES:
+        return _task_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def task_entry(task_id: str):
+    """Return (task_class, task_kwargs) of a fieldworkarena task id (with or without ".report")."""
+    catalog = get_catalog()
+    if task_id.endswith(REPORT_SUFFIX) and task_id[: -len(REPORT_SUFFIX)] in catalog:
+        return _task_class("SeeImageAndCreateIncidentTask"), {"image_task_id": task_id[: -len(REPORT_SUFFIX)]}
+    task_config = catalog.get(task_id)
+    if task_config is None:
+        raise ValueError(f"Unknown FieldWorkArena task id {task_id!r}.")
+    if task_config["output_format"] == "json":
+        return _task_class("JSONOutputTask"), {"task_id": task_id}
+    return _task_class("GenericGroup2Task"), {"task_id": task_id}
+
+
+def _make_env(task_id: str, *env_args, **env_kwargs):
+    # resolved by gym.make(), so browsergym and the task classes are only imported for the task in use
+    from browsergym.core.env import BrowserEnv
+    from browsergym.core.registration import frozen_partial
+
+    task_class, task_kwargs = task_entry(task_id)
+    return BrowserEnv(frozen_partial(task_class, **task_kwargs), *env_args, **env_kwargs)
+
+
+def _register_lazy(task_id: str) -> None:
+    gym.register(
+        id=f"browsergym/{task_id}",
+        entry_point=partial(_make_env, task_id),
+        nondeterministic=True,
+    )
+
+
+def register_tasks(task_ids=None) -> None:
+    """
+    Register tasks with browsergym's `register_task`, importing their classes now.
+    Registers every task in the catalog (and its ".report" variant) if `task_ids` is None.
+    """
+    from browsergym.core.registration import register_task
+
+    if task_ids is None:
+        task_ids = [
+            task_id + suffix for task_id in get_catalog() for suffix in ("", REPORT_SUFFIX)
+        ]
+    for task_id in task_ids:
+        task_class, task_kwargs = task_entry(task_id)
+        gym.registry.pop(f"browsergym/{task_id}", None)
+        register_task(task_id, task_class, task_kwargs=task_kwargs)
+
+
+# Add all tasks in group2 to the registry.
+# By default only lightweight specs are registered and the task classes are resolved on gym.make();
+# set FIELDWORKARENA_EAGER_REGISTRATION=1 to import and register everything up front.
+catalog = get_catalog()
+for task_id in catalog:
+    _register_lazy(task_id)
+    _register_lazy(task_id + REPORT_SUFFIX)
+
+    ALL_FIELDWORKARENA_TASK_IDS.append(task_id)
+
+if os.environ.get("FIELDWORKARENA_EAGER_REGISTRATION", "0") == "1":
+    register_tasks()
 
 # # Write all task IDs to a file
 # output_file_path = os.path.join(config.G2_TASK_PATH, "all_task_ids.txt")
 # with open(output_file_path, 'w', encoding='utf-8') as f:
 #     for task_id in ALL_FIELDWORKARENA_TASK_IDS:
-#         f.write(task_id + "\n")
\ No newline at end of file
+#         f.write(task_id + "\n")
@@ -0,0 +1,303 @@
+"""
+Incremental SQLite index of the episodes of a results directory.
+
+Every browsergym experiment directory in `result_dir` becomes one row of `<result_dir>/index.sqlite`
+with its task id, category (factory / warehouse / retail), task group (1.1 ... 4.2), reward, steps,
+duration, answer and error. A directory is (re)read only when the size or mtime of its
+summary_info.json or experiment.log changed since the last scan, and rows of deleted directories
+are dropped, so scanning a results directory with thousands of episodes again only costs one stat
+per file. Scores written by fieldworkarena-grade (scores.jsonl) are joined in when that file changes.
+Summaries per category and per group are GROUP BY queries on the index.
+
+Usage: fieldworkarena-aggregate results/ [--by category group] [--all_runs]
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+from .catalog import get_catalog, task_group
+from .grading import EXPERIMENT_LOG, SCORES_FILE, exp_task_id, read_answer
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = "index.sqlite"
+SUMMARY_INFO = "summary_info.json"
+
+# bump when the layout of the index changes, the index is then rebuilt
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    name TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL,
+    task_id TEXT,
+    category TEXT,
+    grp TEXT,
+    reward REAL,
+    n_steps INTEGER,
+    duration REAL,
+    answer TEXT,
+    err_msg TEXT,
+    score REAL
+);
+CREATE INDEX IF NOT EXISTS episodes_task_id ON episodes (task_id);
+CREATE INDEX IF NOT EXISTS episodes_category ON episodes (category);
+CREATE INDEX IF NOT EXISTS episodes_grp ON episodes (grp);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+COLUMNS = ("name", "stamp", "task_id", "category", "grp", "reward", "n_steps", "duration", "answer", "err_msg", "score")
+
+# summary columns and the episodes column they group by
+GROUP_COLUMNS = {"category": "category", "group": "grp", "task": "task_id"}
+
+
+def _file_stamp(path: str) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def exp_dir_stamp(exp_dir: str) -> Optional[str]:
+    """Size and mtime of the files the index reads, or None for an episode that has not finished."""
+    summary_stamp = _file_stamp(os.path.join(exp_dir, SUMMARY_INFO))
+    if summary_stamp == "-":
+        return None
+    return f"{summary_stamp}|{_file_stamp(os.path.join(exp_dir, EXPERIMENT_LOG))}"
+
+
+def read_episode(exp_dir: str) -> dict:
+    """Index row of an experiment directory, from its summary_info.json and experiment.log."""
+    try:
+        with open(os.path.join(exp_dir, SUMMARY_INFO), "r", encoding="utf-8") as f:
+            summary = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not read %s: %s", os.path.join(exp_dir, SUMMARY_INFO), e)
+        summary = {}
+
+    logged = read_answer(exp_dir) or {}
+    task_id = logged.get("task_id") or exp_task_id(exp_dir)
+
+    # step_elapsed is the environment's time, agent_elapsed the agent's (mostly the model call)
+    elapsed = [summary.get(key) for key in ("stats.cum_step_elapsed", "stats.cum_agent_elapsed")]
+    elapsed = [value for value in elapsed if value is not None]
+
+    return {
+        "name": os.path.basename(exp_dir),
+        "task_id": task_id,
+        "category": get_catalog().category_of(task_id) if task_id else None,
+        "grp": task_group(task_id) if task_id else None,
+        "reward": summary.get("cum_reward"),
+        "n_steps": summary.get("n_steps"),
+        "duration": sum(elapsed) if elapsed else None,
+        "answer": logged.get("answer"),
+        "err_msg": summary.get("err_msg") or None,
+        "score": None,
+    }
+
+
+def read_scores(result_dir: str) -> Dict[str, float]:
+    """Scores of fieldworkarena-grade by experiment directory name."""
+    scores = {}
+    path = os.path.join(result_dir, SCORES_FILE)
+    if not os.path.exists(path):
+        return scores
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            scores[os.path.basename(os.path.normpath(entry["exp_dir"]))] = entry.get("score")
+    return scores
+
+
+class ResultsIndex:
+    def __init__(self, result_dir: str, index_path: Optional[str] = None) -> None:
+        self.result_dir = result_dir
+        self.index_path = index_path or os.path.join(result_dir, INDEX_FILE)
+        self._db = sqlite3.connect(self.index_path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        version = self._db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self._db.executescript("DROP TABLE IF EXISTS episodes; DROP TABLE IF EXISTS meta;")
+            self._db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def scan(self) -> dict:
+        """Bring the index up to date with the result directory; returns counters."""
+        known = dict(self._db.execute("SELECT name, stamp FROM episodes"))
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "running": 0}
+        rows = []
+        seen = set()
+        with os.scandir(self.result_dir) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                stamp = exp_dir_stamp(entry.path)
+                if stamp is None:
+                    stats["running"] += 1
+                    continue
+                seen.add(entry.name)
+                if known.get(entry.name) == stamp:
+                    stats["unchanged"] += 1
+                    continue
+                stats["updated" if entry.name in known else "added"] += 1
+                row = read_episode(entry.path)
+                row["stamp"] = stamp
+                rows.append(row)
+        removed = [(name,) for name in known.keys() - seen]
+        stats["removed"] = len(removed)
+
+        scores_stamp = _file_stamp(os.path.join(self.result_dir, SCORES_FILE))
+        rescore = scores_stamp != self._meta("scores_stamp")
+        scores = read_scores(self.result_dir) if rows or rescore else {}
+        for row in rows:
+            row["score"] = scores.get(row["name"])
+
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO episodes ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(row[column] for column in COLUMNS) for row in rows],
+            )
+            self._db.executemany("DELETE FROM episodes WHERE name = ?", removed)
+            self._fill_categories()
+            if rescore:
+                self._db.execute("UPDATE episodes SET score = NULL")
+                self._db.executemany(
+                    "UPDATE episodes SET score = ? WHERE name = ?", [(score, name) for name, score in scores.items()]
+                )
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('scores_stamp', ?)", (scores_stamp,))
+        return stats
+
+    def _fill_categories(self) -> None:
+        """Categories of rows indexed while the task id lists could not be found."""
+        catalog = get_catalog()
+        missing = self._db.execute(
+            "SELECT DISTINCT task_id FROM episodes WHERE category IS NULL AND task_id IS NOT NULL"
+        ).fetchall()
+        found = [(category, task_id) for (task_id,) in missing if (category := catalog.category_of(task_id))]
+        self._db.executemany("UPDATE episodes SET category = ? WHERE task_id = ?", found)
+
+    def summary(self, by: str = "category", latest_only: bool = True) -> List[dict]:
+        """
+        Episodes, mean reward, mean score, mean steps, total duration and errors per category, group
+        or task. With `latest_only`, only the latest episode of each task counts (directory names
+        start with the date), so reruns do not count twice.
+        """
+        column = GROUP_COLUMNS[by]
+        episodes = "episodes"
+        if latest_only:
+            episodes = "(SELECT * FROM episodes WHERE name IN (SELECT MAX(name) FROM episodes GROUP BY task_id))"
+        query = f"""
+            SELECT {column}, COUNT(*), AVG(reward), AVG(score), COUNT(score), AVG(n_steps), SUM(duration),
+                   SUM(err_msg IS NOT NULL)
+            FROM {episodes}
+            GROUP BY {column}
+            ORDER BY {column}
+        """
+        keys = (by, "episodes", "reward", "score", "scored", "steps", "duration", "errors")
+        return [dict(zip(keys, row)) for row in self._db.execute(query)]
+
+    def episodes(self, task_id: Optional[str] = None) -> List[dict]:
+        """Index rows, of one task or of all episodes."""
+        query = f"SELECT {', '.join(COLUMNS)} FROM episodes"
+        params = ()
+        if task_id is not None:
+            query += " WHERE task_id = ?"
+            params = (task_id,)
+        return [dict(zip(COLUMNS, row)) for row in self._db.execute(query + " ORDER BY name", params)]
+
+
+def _format(value, digits: int = 3) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.{digits}f}"
+    return str(value)
+
+
+def print_summary(rows: List[dict], by: str) -> None:
+    header = (by, "episodes", "reward", "score", "scored", "steps", "duration", "errors")
+    table = [header] + [
+        (
+            _format(row[by]),
+            _format(row["episodes"]),
+            _format(row["reward"]),
+            _format(row["score"]),
+            _format(row["scored"]),
+            _format(row["steps"], 1),
+            _format(row["duration"], 0),
+            _format(row["errors"]),
+        )
+        for row in rows
+    ]
+    widths = [max(len(line[i]) for line in table) for i in range(len(header))]
+    for line in table:
+        cells = [line[0].ljust(widths[0])] + [cell.rjust(width) for cell, width in zip(line[1:], widths[1:])]
+        print("  ".join(cells))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Index the episodes of a results directory and summarize them.")
+    parser.add_argument("result_dir", help="Directory with the experiment directories, e.g. results/.")
+    parser.add_argument(
+        "--index",
+        default=None,
+        help=f"Path of the SQLite index (default: <result_dir>/{INDEX_FILE}).",
+    )
+    parser.add_argument(
+        "--by",
+        nargs="+",
+        choices=list(GROUP_COLUMNS),
+        default=["category", "group"],
+        help="Summaries to print.",
+    )
+    parser.add_argument(
+        "--all_runs",
+        action="store_true",
+        help="Count every episode instead of only the latest one of each task.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with ResultsIndex(args.result_dir, args.index) as index:
+        start = time.perf_counter()
+        stats = index.scan()
+        scan_time = time.perf_counter() - start
+        print(
+            f"{index.index_path}: {stats['added']} added, {stats['updated']} updated, {stats['removed']} removed, "
+            f"{stats['unchanged']} unchanged, {stats['running']} not finished ({scan_time * 1000:.0f} ms)"
+        )
+        for by in args.by:
+            start = time.perf_counter()
+            rows = index.summary(by, latest_only=not args.all_runs)
+            summary_time = time.perf_counter() - start
+            print()
+            print_summary(rows, by)
+            print(f"({summary_time * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
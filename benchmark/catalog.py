@@ -0,0 +1,252 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from . import config
+
+TASK_ID_PREFIX = "fieldworkarena."
+REPORT_SUFFIX = ".report"
+
+# bump when the pickled layout of the catalog changes
+CACHE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def _task_group(raw_id: str) -> str:
+    """'1.1.0001' -> '1.1', 'demo.1' -> 'demo'"""
+    return raw_id.rsplit(".", 1)[0]
+
+
+def base_task_id(task_id: str) -> str:
+    """Task id without the .report suffix of report tasks."""
+    return task_id[: -len(REPORT_SUFFIX)] if task_id.endswith(REPORT_SUFFIX) else task_id
+
+
+def task_group(task_id: str) -> str:
+    """'fieldworkarena.1.1.0001' (or its .report task) -> '1.1'."""
+    task_id = base_task_id(task_id)
+    if task_id.startswith(TASK_ID_PREFIX):
+        task_id = task_id[len(TASK_ID_PREFIX) :]
+    return _task_group(task_id)
+
+
+def _task_id_list_path(path: str) -> Optional[str]:
+    """A task id list of config.TASK_ID_LISTS, relative to the working directory or else to the repository."""
+    if os.path.exists(path):
+        return path
+    repo_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+    return repo_path if not os.path.isabs(path) and os.path.exists(repo_path) else None
+
+
+def _media_names(input_data) -> List[str]:
+    if isinstance(input_data, str):
+        # "<type> <path>" form
+        return [input_data.split(" ", 1)[-1].strip()]
+    return [os.path.basename(name) for name in input_data]
+
+
+def media_path(data_name: str) -> str:
+    """Path of a file referenced in `input_data`, relative to the working directory."""
+    if data_name.endswith("jpg") or data_name.endswith("png"):
+        return os.path.join(config.IMAGE_DIR, data_name)
+    elif data_name.endswith("mp4"):
+        return os.path.join(config.MOVIE_DIR, data_name)
+    elif data_name.endswith("pdf") or data_name.endswith("txt"):
+        return os.path.join(config.DOC_DIR, data_name)
+    else:
+        return os.path.join(config.DATA_DIR, data_name)
+
+
+def _source_files(task_dir: str) -> List[str]:
+    return [
+        os.path.join(task_dir, task_file)
+        for task_file in sorted(os.listdir(task_dir))
+        if task_file.endswith(".json")
+    ]
+
+
+def _file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def _file_stamp(path: str) -> Tuple[str, int, int, str]:
+    """(name, size, mtime_ns, sha1) of a task file."""
+    st = os.stat(path)
+    return os.path.basename(path), st.st_size, st.st_mtime_ns, _file_hash(path)
+
+
+class TaskCatalog:
+    """Index of all group2 task configs, keyed by full task id ("fieldworkarena.<id>")."""
+
+    def __init__(self, task_dir: str = config.G2_TASK_PATH, cache_path: Optional[str] = None) -> None:
+        self.task_dir = task_dir
+        self.cache_path = cache_path
+        self.source_files: List[str] = []
+        self._configs: Dict[str, dict] = {}
+        self._by_group: Dict[str, List[str]] = {}
+        self._by_output_format: Dict[str, List[str]] = {}
+        self._by_media: Dict[str, List[str]] = {}
+        self._by_category: Optional[Dict[str, List[str]]] = None
+        self._category_of: Dict[str, str] = {}
+        if not (cache_path and self._load_cache()):
+            self._load()
+            if cache_path:
+                self._write_cache()
+
+    def _load(self) -> None:
+        for path in _source_files(self.task_dir):
+            with open(path, "r", encoding="utf-8") as f:
+                task_configs = json.load(f)
+            self.source_files.append(path)
+            for task_config in task_configs:
+                self._add(task_config)
+
+    def _state(self) -> dict:
+        return {
+            "configs": self._configs,
+            "by_group": self._by_group,
+            "by_output_format": self._by_output_format,
+            "by_media": self._by_media,
+        }
+
+    def _load_cache(self) -> bool:
+        """Restore the catalog from `cache_path` if it matches the task files on disk."""
+        try:
+            with open(self.cache_path, "rb") as f:
+                cached = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning("Ignoring unreadable catalog cache %s: %s", self.cache_path, e)
+            return False
+        if cached.get("version") != CACHE_VERSION:
+            return False
+
+        paths = _source_files(self.task_dir)
+        stamps = cached["stamps"]
+        if [os.path.basename(path) for path in paths] != [stamp[0] for stamp in stamps]:
+            return False
+        refreshed = False
+        for i, (path, (name, size, mtime_ns, digest)) in enumerate(zip(paths, stamps)):
+            st = os.stat(path)
+            if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                continue
+            # size or mtime changed: only the content hash can tell us the file is unchanged
+            if st.st_size != size or _file_hash(path) != digest:
+                return False
+            stamps[i] = (name, st.st_size, st.st_mtime_ns, digest)
+            refreshed = True
+
+        state = cached["state"]
+        self._configs = state["configs"]
+        self._by_group = state["by_group"]
+        self._by_output_format = state["by_output_format"]
+        self._by_media = state["by_media"]
+        self.source_files = paths
+        if refreshed:
+            # e.g. a fresh checkout touched the files; store the new mtimes
+            self._write_cache()
+        return True
+
+    def _write_cache(self) -> None:
+        cached = {
+            "version": CACHE_VERSION,
+            "stamps": [_file_stamp(path) for path in self.source_files],
+            "state": self._state(),
+        }
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # atomic, so concurrent interpreters never read a half-written cache
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            # e.g. the package is installed read-only; the catalog still works without a cache
+            logger.warning("Could not write catalog cache %s: %s", self.cache_path, e)
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _add(self, task_config: dict) -> None:
+        task_id = TASK_ID_PREFIX + task_config["id"]
+        self._configs[task_id] = task_config
+        self._by_group.setdefault(_task_group(task_config["id"]), []).append(task_id)
+        self._by_output_format.setdefault(task_config["output_format"], []).append(task_id)
+        for media in _media_names(task_config["input_data"]):
+            self._by_media.setdefault(media, []).append(task_id)
+
+    def __len__(self) -> int:
+        return len(self._configs)
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._configs
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._configs)
+
+    def get(self, task_id: str) -> Optional[dict]:
+        """Return the config of `task_id`, or None if it is not in the catalog."""
+        return self._configs.get(task_id)
+
+    def configs(self) -> List[dict]:
+        return list(self._configs.values())
+
+    def task_ids(self) -> List[str]:
+        return list(self._configs)
+
+    def groups(self) -> List[str]:
+        return list(self._by_group)
+
+    def by_group(self, group: str) -> List[str]:
+        return list(self._by_group.get(group, []))
+
+    def by_output_format(self, output_format: str) -> List[str]:
+        return list(self._by_output_format.get(output_format, []))
+
+    def media(self) -> List[str]:
+        """All distinct media file names referenced by `input_data`."""
+        return list(self._by_media)
+
+    def by_media(self, media_name: str) -> List[str]:
+        return list(self._by_media.get(os.path.basename(media_name), []))
+
+    def _load_categories(self) -> Dict[str, List[str]]:
+        if self._by_category is None:
+            by_category = {}
+            for name, path in config.TASK_ID_LISTS.items():
+                path = _task_id_list_path(path)
+                if path is None:
+                    continue
+                with open(path, "r", encoding="utf-8") as f:
+                    by_category[name] = [line.strip() for line in f if line.strip()]
+                for task_id in by_category[name]:
+                    self._category_of[task_id] = name
+            self._by_category = by_category
+        return self._by_category
+
+    def by_category(self, category: str) -> List[str]:
+        """Task ids of a category (factory / warehouse / retail), read from the task id lists."""
+        return list(self._load_categories().get(category, []))
+
+    def category_of(self, task_id: str) -> Optional[str]:
+        self._load_categories()
+        return self._category_of.get(base_task_id(task_id))
+
+
+_catalog: Optional[TaskCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> TaskCatalog:
+    """Return the process-wide catalog, loading it on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = TaskCatalog(cache_path=config.CATALOG_CACHE_PATH or None)
+    return _catalog
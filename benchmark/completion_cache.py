@@ -0,0 +1,173 @@
+"""
+Record/replay cache of chat completions.
+
+Requests are keyed by a hash of the model, the parameters and the messages, with base64 images
+replaced by their hash so that the key stays small. Responses are appended to
+`<cache_dir>/completions.jsonl`; an index of the byte offset of every key is kept in
+`index.pickle` and extended incrementally with the records appended since, also by other processes.
+
+Modes (FIELDWORKARENA_LLM_CACHE):
+    passthrough  no cache (default)
+    record       answer from the cache, call the API and record on a miss
+    replay       answer from the cache only, a miss raises CompletionCacheMiss (works without network)
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "./cache/completions"
+MODES = ("passthrough", "record", "replay")
+
+STORE_FILE = "completions.jsonl"
+INDEX_FILE = "index.pickle"
+
+
+class CompletionCacheMiss(LookupError):
+    pass
+
+
+def _normalize(value):
+    """Request with every base64 data url replaced by its hash."""
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str) and value.startswith("data:") and ";base64," in value:
+        header, _, data = value.partition(",")
+        return f"{header},sha1:{hashlib.sha1(data.encode('ascii')).hexdigest()}"
+    return value
+
+
+def request_key(**kwargs) -> str:
+    data = json.dumps(_normalize(kwargs), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _to_json(response) -> dict:
+    if hasattr(response, "model_dump"):
+        return response.model_dump(mode="json")
+    return response
+
+
+def _from_json(data: dict):
+    try:
+        from openai.types.chat import ChatCompletion
+    except ImportError:
+        return data
+    return ChatCompletion.model_validate(data)
+
+
+class CompletionCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, mode: str = "record") -> None:
+        if mode not in MODES:
+            raise ValueError(f"Unknown completion cache mode {repr(mode)}, expected one of {MODES}.")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.store_path = os.path.join(cache_dir, STORE_FILE)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        self._lock = threading.Lock()
+        # key -> byte offset of its record in the store, and the store size the index covers
+        self._offsets = {}
+        self._indexed_size = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self) -> None:
+        try:
+            with open(self.index_path, "rb") as f:
+                offsets, indexed_size = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+            return
+        # an index for a bigger store belongs to a store that was replaced
+        if os.path.exists(self.store_path) and indexed_size <= os.path.getsize(self.store_path):
+            self._offsets, self._indexed_size = offsets, indexed_size
+
+    def _save_index(self) -> None:
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump((self._offsets, self._indexed_size), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            logger.warning("Could not write completion cache index %s: %s", self.index_path, e)
+
+    def _scan(self) -> None:
+        """Index the records appended to the store since the last scan."""
+        try:
+            size = os.path.getsize(self.store_path)
+        except OSError:
+            return
+        if size <= self._indexed_size:
+            return
+        with open(self.store_path, "rb") as f:
+            f.seek(self._indexed_size)
+            offset = self._indexed_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # a record still being written
+                    break
+                try:
+                    self._offsets[json.loads(line)["key"]] = offset
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        self._indexed_size = offset
+        self._save_index()
+
+    def get(self, key: str):
+        """Recorded response of `key`, or None."""
+        with self._lock:
+            if key not in self._offsets:
+                self._scan()
+            offset = self._offsets.get(key)
+        if offset is None:
+            return None
+        with open(self.store_path, "rb") as f:
+            f.seek(offset)
+            record = json.loads(f.readline())
+        return _from_json(record["response"])
+
+    def put(self, key: str, response, model: str = None) -> None:
+        line = json.dumps({"key": key, "model": model, "time": time.time(), "response": _to_json(response)}) + "\n"
+        with self._lock, open(self.store_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(line.encode("utf-8"))
+            f.flush()
+            self._offsets[key] = offset
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._scan()
+            return len(self._offsets)
+
+
+_completion_cache = None
+
+
+def get_completion_cache():
+    """
+    Return the process-wide completion cache, or None in passthrough mode. Configured with
+    FIELDWORKARENA_LLM_CACHE (mode) and FIELDWORKARENA_LLM_CACHE_DIR (directory).
+    """
+    global _completion_cache
+    mode = os.environ.get("FIELDWORKARENA_LLM_CACHE") or "passthrough"
+    if mode == "passthrough":
+        return None
+    cache_dir = os.environ.get("FIELDWORKARENA_LLM_CACHE_DIR") or DEFAULT_CACHE_DIR
+    if _completion_cache is None or (_completion_cache.cache_dir, _completion_cache.mode) != (cache_dir, mode):
+        _completion_cache = CompletionCache(cache_dir, mode)
+    return _completion_cache
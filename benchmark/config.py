@@ -7,7 +7,20 @@ TASK_PATH = str(resources.files(tasks))
 
 G2_TASK_PATH = str(resources.files(tasks).joinpath("group2"))
 
+# compiled cache of the group2 task catalog, rebuilt whenever a task file changes.
+# Set FIELDWORKARENA_CATALOG_CACHE="" to disable it.
+CATALOG_CACHE_PATH = os.environ.get(
+    "FIELDWORKARENA_CATALOG_CACHE", os.path.join(G2_TASK_PATH, ".catalog_cache.pickle")
+)
+
 DATA_DIR = "./data/"
 IMAGE_DIR = DATA_DIR + "image/"
 MOVIE_DIR = DATA_DIR + "movie/"
 DOC_DIR = DATA_DIR + "document/"
+
+# task id lists used by run_tasks.sh / run_tasks.bat, one per category
+TASK_ID_LISTS = {
+    "factory": "./all_task_ids_factory.txt",
+    "warehouse": "./all_task_ids_warehouse.txt",
+    "retail": "./all_task_ids_retail.txt",
+}
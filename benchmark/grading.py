@@ -0,0 +1,289 @@
+"""
+Grade the answers of a results directory with llm_fuzzy_match.
+
+The answer of an episode is the `<answer>` the task logged to `<exp_dir>/experiment.log` when the
+agent replied in the chat. Reference answers come from the evaluation data: task json files (the
+second turn of `conversations`) or a json object mapping task ids to answers.
+
+Answers that the deterministic comparators of metrics/automatic/comparators.py (numbers, time
+ranges, json) are sure about need no model; the others are graded with bounded concurrency. Every
+grader verdict is cached in `<result_dir>/grading_cache.jsonl` by (question, reference, answer), so
+grading a run again only grades the new answers. Scores are written to `<result_dir>/scores.jsonl`.
+
+Usage: fieldworkarena-grade results/ --references answers_factory.json answers_warehouse.json
+"""
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import time
+from typing import Dict, List, Optional
+
+from .catalog import TASK_ID_PREFIX, base_task_id, get_catalog
+from .metrics.automatic.comparators import TIME_TOLERANCE, fast_match
+from .metrics.automatic.automatic_evaluation import (
+    FUZZY_MATCH_MODEL,
+    allm_fuzzy_match_response,
+    fuzzy_match_score,
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "grading_cache.jsonl"
+SCORES_FILE = "scores.jsonl"
+EXPERIMENT_LOG = "experiment.log"
+
+# grader requests in flight at the same time
+MAX_CONCURRENCY = 16
+
+ANSWER_PATTERN = re.compile(r"<id>(.*?)</id>\s*<answer>(.*?)</answer>", re.DOTALL)
+
+# browsergym names experiment directories "<date>_<agent>_on_<task name>_<seed>"
+EXP_DIR_PATTERN = re.compile(r"_on_(fieldworkarena\.[^_]+)_[^_]*$")
+
+
+def _full_task_id(task_id: str) -> str:
+    return task_id if task_id.startswith(TASK_ID_PREFIX) else TASK_ID_PREFIX + task_id
+
+
+def exp_task_id(exp_dir: str) -> Optional[str]:
+    """Task id an experiment directory was run for, from its name or its exp_args.pkl."""
+    match = EXP_DIR_PATTERN.search(os.path.basename(os.path.normpath(exp_dir)))
+    if match:
+        return match.group(1)
+    try:
+        # unpickling needs browsergym and the agent module, like browsergym's own ExpResult
+        with open(os.path.join(exp_dir, "exp_args.pkl"), "rb") as f:
+            return pickle.load(f).env_args.task_name
+    except Exception:
+        return None
+
+
+def read_answer(exp_dir: str) -> Optional[dict]:
+    """
+    Task id and last logged answer of an experiment directory, or None without a log. Only answers
+    logged for the directory's own task count; when its task id is unknown, the last answer does.
+    """
+    log_path = os.path.join(exp_dir, EXPERIMENT_LOG)
+    try:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            log = f.read()
+    except OSError:
+        return None
+    task_id = exp_task_id(exp_dir)
+    # report tasks log the id of the image task they report on
+    accepted = {task_id, base_task_id(task_id)} if task_id else None
+    for logged_id, answer in reversed(ANSWER_PATTERN.findall(log)):
+        logged_id = _full_task_id(logged_id.strip())
+        if accepted is None or logged_id in accepted:
+            return {"task_id": task_id or logged_id, "exp_dir": exp_dir, "answer": answer.strip()}
+    return {"task_id": task_id, "exp_dir": exp_dir, "answer": None}
+
+
+def read_answers(result_dir: str) -> List[dict]:
+    """Answers of all experiment directories in `result_dir`, in directory order."""
+    answers = []
+    for log_path in sorted(glob.glob(os.path.join(result_dir, "*", EXPERIMENT_LOG))):
+        answer = read_answer(os.path.dirname(log_path))
+        if answer is not None:
+            answers.append(answer)
+    return answers
+
+
+def load_references(paths) -> Dict[str, str]:
+    """Reference answers by full task id, from task json files or {task_id: answer} objects."""
+    references = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            references.update({_full_task_id(task_id): str(answer) for task_id, answer in data.items()})
+            continue
+        for task_config in data:
+            turns = task_config.get("conversations", [])
+            if len(turns) > 1:
+                references[_full_task_id(task_config["id"])] = turns[1]["value"]
+    return references
+
+
+def question_of(task_id: str) -> Optional[str]:
+    task_config = get_catalog().get(base_task_id(task_id))
+    if task_config is None:
+        return None
+    return task_config["conversations"][0]["value"]
+
+
+def verdict_key(question: str, reference: str, answer: str, model: str = FUZZY_MATCH_MODEL) -> str:
+    data = json.dumps([question, reference, answer, model], ensure_ascii=False)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class VerdictCache:
+    """Append-only cache of grader responses, in the result directory next to the answers."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._verdicts: Dict[str, str] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # a run killed mid-write leaves a partial last line
+                        continue
+                    self._verdicts[entry["key"]] = entry["verdict"]
+
+    def get(self, key: str) -> Optional[str]:
+        return self._verdicts.get(key)
+
+    def put(self, key: str, verdict: str) -> None:
+        self._verdicts[key] = verdict
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"key": key, "verdict": verdict}) + "\n")
+
+
+async def _grade(entry: dict, cache: VerdictCache, semaphore: asyncio.Semaphore, stats: dict, tolerance: float) -> None:
+    fast = fast_match(entry["answer"], entry["reference"], tolerance)
+    if fast is not None:
+        entry["verdict"], entry["grader"] = fast
+        entry["status"] = "graded"
+        stats["fast_path"] += 1
+        return
+
+    entry["grader"] = "llm"
+    key = verdict_key(entry["question"], entry["reference"], entry["answer"])
+    verdict = cache.get(key)
+    if verdict is None:
+        async with semaphore:
+            try:
+                verdict = await allm_fuzzy_match_response(entry["answer"], entry["reference"], entry["question"])
+            except Exception as e:
+                logger.error("Could not grade %s: %s", entry["exp_dir"], e)
+                entry["status"] = "error"
+                stats["errors"] += 1
+                return
+        cache.put(key, verdict)
+        stats["graded"] += 1
+    else:
+        stats["cached"] += 1
+    entry["verdict"] = verdict
+    entry["status"] = "graded"
+
+
+async def grade_entries(
+    entries: List[dict], cache: VerdictCache, max_concurrency: int = MAX_CONCURRENCY, tolerance: float = TIME_TOLERANCE
+) -> dict:
+    """
+    Grade the entries that have an answer and a reference in place; returns counters. Answers the
+    deterministic comparators are sure about are not sent to the grader model ("fast_path").
+    """
+    stats = {"fast_path": 0, "graded": 0, "cached": 0, "errors": 0}
+    semaphore = asyncio.Semaphore(max_concurrency)
+    await asyncio.gather(*(_grade(entry, cache, semaphore, stats, tolerance) for entry in entries))
+    return stats
+
+
+def grade_results(
+    result_dir: str,
+    references: Dict[str, str],
+    max_concurrency: int = MAX_CONCURRENCY,
+    disallow_partial: bool = True,
+    tolerance: float = TIME_TOLERANCE,
+):
+    """Grade all answers of `result_dir`, write the scores file and return (entries, counters)."""
+    entries = read_answers(result_dir)
+    to_grade = []
+    for entry in entries:
+        entry["reference"] = references.get(entry["task_id"])
+        entry["question"] = question_of(entry["task_id"]) if entry["task_id"] else None
+        if entry["answer"] is None:
+            entry["status"] = "no_answer"
+        elif entry["reference"] is None or entry["question"] is None:
+            entry["status"] = "no_reference"
+        else:
+            to_grade.append(entry)
+
+    cache = VerdictCache(os.path.join(result_dir, CACHE_FILE))
+    stats = asyncio.run(grade_entries(to_grade, cache, max_concurrency, tolerance))
+
+    with open(os.path.join(result_dir, SCORES_FILE), "w", encoding="utf-8") as f:
+        for entry in entries:
+            if entry.get("status") == "graded":
+                try:
+                    entry["score"] = fuzzy_match_score(entry["verdict"], disallow_partial)
+                except AssertionError:
+                    # a grader reply that is none of correct / incorrect / partially correct
+                    logger.error("Unexpected grader verdict for %s: %r", entry["exp_dir"], entry["verdict"])
+                    entry["status"] = "error"
+                    entry["score"] = None
+                    stats["errors"] += 1
+            elif entry["status"] == "no_answer":
+                entry["score"] = 0.0
+            else:
+                entry["score"] = None
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    return entries, stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Grade the answers of a results directory.")
+    parser.add_argument("result_dir", help="Directory with the experiment directories, e.g. results/.")
+    parser.add_argument(
+        "--references",
+        nargs="+",
+        required=True,
+        help="Reference answers: task json files or json objects mapping task ids to answers.",
+    )
+    parser.add_argument(
+        "--max_concurrency",
+        type=int,
+        default=MAX_CONCURRENCY,
+        help="Grader requests in flight at the same time.",
+    )
+    parser.add_argument(
+        "--allow_partial",
+        action="store_true",
+        help="Count 'partially correct' verdicts as correct.",
+    )
+    parser.add_argument(
+        "--time_tolerance",
+        type=float,
+        default=TIME_TOLERANCE,
+        help="Seconds an hh:mm:ss time may differ from the reference and still be correct.",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = time.time()
+    entries, stats = grade_results(
+        args.result_dir,
+        load_references(args.references),
+        max_concurrency=args.max_concurrency,
+        disallow_partial=not args.allow_partial,
+        tolerance=args.time_tolerance,
+    )
+    scored = [entry["score"] for entry in entries if entry["score"] is not None]
+    counts = {}
+    for entry in entries:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+
+    print(f"{len(entries)} episodes: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    print(
+        f"  fast path: {stats['fast_path']} (LLM calls avoided)  grader calls: {stats['graded']}  "
+        f"from cache: {stats['cached']}  errors: {stats['errors']}"
+    )
+    if scored:
+        print(f"  score: {sum(scored) / len(scored):.3f} over {len(scored)} episodes")
+    print(f"  scores written to {os.path.join(args.result_dir, SCORES_FILE)} in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Shared asynchronous OpenAI client.
+
+One AsyncOpenAI client, and so one HTTP connection pool, runs on an event loop in a background
+thread. Coroutines use `acreate` directly; synchronous callers (DemoAgent in the runner's episode
+threads, llm_fuzzy_match) use `create`, which only blocks the calling thread, so the model calls of
+many episodes are in flight at the same time in one process. Every request has a timeout and is
+retried with jittered exponential backoff on rate limits, timeouts and server errors. Requests
+wait for the host-wide rate limits of benchmark.rate_limit before they are sent, and can be
+recorded and replayed with benchmark.completion_cache.
+"""
+import asyncio
+import dataclasses
+import logging
+import os
+import random
+import threading
+
+from .completion_cache import CompletionCache, CompletionCacheMiss, get_completion_cache, request_key
+from .rate_limit import RateLimiter, estimate_tokens, get_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# connections kept open to the API by one process
+MAX_CONNECTIONS = 64
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    max_retries: int = 5
+    base_delay: float = 1.0  # seconds, doubled on every retry
+    max_delay: float = 60.0
+    timeout: float = 120.0  # seconds per attempt
+
+
+def backoff_delay(attempt: int, policy: RetryPolicy, retry_after: float = None) -> float:
+    """Seconds to wait before retry `attempt` (0-based): the server's Retry-After, or full jitter."""
+    if retry_after is not None:
+        return min(retry_after, policy.max_delay)
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2**attempt))
+
+
+def _retry_after(error) -> float:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _retryable_errors() -> tuple:
+    import openai
+
+    return (
+        openai.RateLimitError,
+        openai.APITimeoutError,
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        asyncio.TimeoutError,
+    )
+
+
+class LLMClient:
+    def __init__(
+        self,
+        api_key: str = None,
+        base_url: str = None,
+        max_connections: int = MAX_CONNECTIONS,
+        policy: RetryPolicy = RetryPolicy(),
+        rate_limiter: RateLimiter = None,
+        completion_cache: CompletionCache = None,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.policy = policy
+        self.rate_limiter = rate_limiter
+        self.completion_cache = completion_cache
+        self._client = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _async_client(self):
+        if self._client is None:
+            import httpx
+            import openai
+
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            self._client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                # retries and timeouts are handled in acreate
+                max_retries=0,
+                timeout=self.policy.timeout,
+                http_client=openai.DefaultAsyncHttpxClient(limits=limits),
+            )
+        return self._client
+
+    async def acreate(self, **kwargs):
+        """chat.completions.create with a timeout per attempt and retries with backoff."""
+        loop = self._event_loop()
+        if asyncio.get_running_loop() is not loop:
+            # the connection pool belongs to the client's loop
+            return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._acreate(**kwargs), loop))
+        return await self._acreate(**kwargs)
+
+    async def _acreate(self, **kwargs):
+        model = kwargs.get("model")
+        cache = self.completion_cache
+        if cache is not None:
+            key = request_key(**kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+            if cache.mode == "replay":
+                raise CompletionCacheMiss(f"No recorded completion for this {model} request (key {key}).")
+
+        client = self._async_client()
+        retryable = _retryable_errors()
+        limited = self.rate_limiter is not None and self.rate_limiter.is_limited()
+        if limited:
+            estimated = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        for attempt in range(self.policy.max_retries + 1):
+            if limited:
+                waited = await self.rate_limiter.aacquire(model, estimated)
+                if waited:
+                    logger.debug("%s: waited %.1fs for the rate limit.", model, waited)
+            try:
+                response = await asyncio.wait_for(client.chat.completions.create(**kwargs), self.policy.timeout)
+            except retryable as e:
+                if attempt == self.policy.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.policy, _retry_after(e))
+                logger.warning("%s: %s, retrying in %.1fs.", kwargs.get("model"), type(e).__name__, delay)
+                await asyncio.sleep(delay)
+                continue
+            if limited:
+                usage = getattr(response, "usage", None)
+                await self.rate_limiter.asettle(model, estimated, getattr(usage, "total_tokens", None))
+            if cache is not None:
+                cache.put(key, response, model)
+            return response
+
+    def _event_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True)
+                self._thread.start()
+        return self._loop
+
+    def create(self, **kwargs):
+        """Blocking version of `acreate`, run on the client's event loop."""
+        return asyncio.run_coroutine_threadsafe(self._acreate(**kwargs), self._event_loop()).result()
+
+    def close(self) -> None:
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.close(), loop).result()
+            self._client = None
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
+
+
+_llm_client = None
+_llm_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """
+    Return the process-wide client. Configured like openai.OpenAI() with OPENAI_API_KEY and
+    OPENAI_BASE_URL, and with FIELDWORKARENA_LLM_TIMEOUT / FIELDWORKARENA_LLM_RETRIES, the
+    rate limits of get_rate_limiter() and the cache mode of get_completion_cache().
+    """
+    global _llm_client
+    with _llm_client_lock:
+        if _llm_client is None:
+            policy = RetryPolicy(
+                max_retries=int(os.environ.get("FIELDWORKARENA_LLM_RETRIES", RetryPolicy.max_retries)),
+                timeout=float(os.environ.get("FIELDWORKARENA_LLM_TIMEOUT", RetryPolicy.timeout)),
+            )
+            _llm_client = LLMClient(
+                base_url=os.environ.get("OPENAI_BASE_URL"),
+                policy=policy,
+                rate_limiter=get_rate_limiter(),
+                completion_cache=get_completion_cache(),
+            )
+        return _llm_client
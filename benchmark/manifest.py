@@ -0,0 +1,83 @@
+"""
+Resume manifest for benchmark runs.
+
+Every finished episode is appended to `<result_dir>/manifest.jsonl` with a key that hashes the
+task id, the task config and the agent arguments. On restart, episodes whose latest entry has the
+same key and finished without error are skipped; changed or failed ones are run again.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List
+
+from .catalog import base_task_id, get_catalog
+
+MANIFEST_FILE = "manifest.jsonl"
+
+
+def _agent_fields(agent_args) -> dict:
+    if dataclasses.is_dataclass(agent_args):
+        fields = dataclasses.asdict(agent_args)
+    else:
+        fields = dict(vars(agent_args))
+    fields["__class__"] = f"{type(agent_args).__module__}.{type(agent_args).__qualname__}"
+    return fields
+
+
+def episode_key(task_id: str, agent_args) -> str:
+    """Hash of the task id, its config and the agent arguments."""
+    payload = {
+        "task_id": task_id,
+        "task_config": get_catalog().get(base_task_id(task_id)),
+        "agent_args": _agent_fields(agent_args),
+    }
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+class RunManifest:
+    def __init__(self, result_dir: str) -> None:
+        self.path = os.path.join(result_dir, MANIFEST_FILE)
+        self._entries: Dict[str, dict] = {}
+        self._read()
+
+    def _read(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # a run killed mid-write leaves a partial last line
+                    continue
+                self._entries[entry["task_id"]] = entry
+
+    def is_done(self, task_id: str, key: str) -> bool:
+        entry = self._entries.get(task_id)
+        return (
+            entry is not None
+            and entry["key"] == key
+            and entry["status"] == "done"
+            and os.path.isdir(entry["exp_dir"])
+        )
+
+    def pending(self, task_ids: Iterable[str], agent_args) -> List[str]:
+        """Task ids that have no finished result for the current task config and agent arguments."""
+        return [task_id for task_id in task_ids if not self.is_done(task_id, episode_key(task_id, agent_args))]
+
+    def record(self, task_id: str, agent_args, record: dict) -> None:
+        entry = {
+            "task_id": task_id,
+            "key": episode_key(task_id, agent_args),
+            "status": "failed" if record.get("err_msg") or not record.get("exp_dir") else "done",
+            "exp_dir": str(record.get("exp_dir")),
+            "time": time.time(),
+        }
+        self._entries[task_id] = entry
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # one short append per episode, so concurrent writers don't interleave lines
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
@@ -1,12 +1,19 @@
+import logging
 import os
-from openai import OpenAI
+from typing import Any
 
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"], base_url=os.environ.get("OPENAI_BASE_URL"))
+from ...completion_cache import get_completion_cache
+from ...llm import get_llm_client
+from .comparators import fast_match
 
+logger = logging.getLogger(__name__)
 
-def llm_fuzzy_match(pred: str, reference: str, question: str, disallow_partial: bool=True) -> float:
-    """Check whether the prediction matches the reference with GPT-4-turbo"""
-    messages: list[dict[str, Any]] = []
+
+FUZZY_MATCH_MODEL = "gpt-4o-mini"
+
+
+def fuzzy_match_messages(pred: str, reference: str, question: str) -> list[dict[str, Any]]:
+    """Grading prompt of llm_fuzzy_match."""
     # construct the question to ask
     message = "Help a teacher to grade the answer of a student given a question. Keep in mind that the student may use different phrasing or wording to answer the question. The goal is to evaluate whether the answer is semantically equivalent to the reference answer.\n"
     message += f"question: {question}\n"
@@ -14,27 +21,61 @@ def llm_fuzzy_match(pred: str, reference: str, question: str, disallow_partial:
     message += "all the string 'N/A' that you see is a special sequence that means 'not achievable'\n"
     message += f"student answer: {pred}\n"
     message += "Conclude the judgement by 'correct', 'incorrect', or 'partially correct'. Only output one of these options, and nothing else."
-    messages = [
+    return [
         {"role": "system", "content": "You are a helpful assistant"},
         {"role": "user", "content": message},
     ]
 
+
+def fuzzy_match_score(response: str, disallow_partial: bool = True) -> float:
+    """Score of a grader response ('correct', 'incorrect' or 'partially correct')."""
+    response = response.lower()
+    if "incorrect" in response or ("partially correct" in response and disallow_partial):
+        return 0.0
+    else:
+        assert "correct" in response, response
+        return 1.0
+
+
+def llm_fuzzy_match(pred: str, reference: str, question: str, disallow_partial: bool=True) -> float:
+    """Check whether the prediction matches the reference with GPT-4-turbo"""
     response = generate_from_openai_chat_completion(
-        model="gpt-4o-mini",
-        messages=messages,
+        model=FUZZY_MATCH_MODEL,
+        messages=fuzzy_match_messages(pred, reference, question),
         temperature=0,
         max_tokens=768,
         top_p=1.0,
         context_length=0,
     ).lower()
+    logger.debug("Grader response: %s", response)
+    return fuzzy_match_score(response, disallow_partial)
 
-    print(response)
 
-    if "incorrect" in response or ("partially correct" in response and disallow_partial):
-        return 0.0
-    else:
-        assert "correct" in response, response
-        return 1.0
+def fuzzy_match(pred: str, reference: str, question: str, disallow_partial: bool = True) -> float:
+    """llm_fuzzy_match, unless a deterministic comparator is sure about the answer."""
+    fast = fast_match(pred, reference)
+    if fast is not None:
+        return fuzzy_match_score(fast[0], disallow_partial)
+    return llm_fuzzy_match(pred, reference, question, disallow_partial)
+
+
+async def allm_fuzzy_match_response(pred: str, reference: str, question: str) -> str:
+    """Raw grader response of llm_fuzzy_match, as a coroutine for concurrent grading."""
+    response = await agenerate_from_openai_chat_completion(
+        model=FUZZY_MATCH_MODEL,
+        messages=fuzzy_match_messages(pred, reference, question),
+        temperature=0,
+        max_tokens=768,
+        top_p=1.0,
+        context_length=0,
+    )
+    return response.lower()
+
+
+def _replaying() -> bool:
+    cache = get_completion_cache()
+    return cache is not None and cache.mode == "replay"
+
 
 def generate_from_openai_chat_completion(
     messages: list[dict[str, str]],
@@ -45,11 +86,36 @@ def generate_from_openai_chat_completion(
     context_length: int,
     stop_token: str | None = None,
 ) -> str:
-    if "OPENAI_API_KEY" not in os.environ:
+    if "OPENAI_API_KEY" not in os.environ and not _replaying():
+        raise ValueError(
+            "OPENAI_API_KEY environment variable must be set when using OpenAI API."
+        )
+    response = get_llm_client().create(
+        model=model,
+        messages=messages,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=top_p,
+    )
+    answer: str = response.choices[0].message.content
+    return answer
+
+
+async def agenerate_from_openai_chat_completion(
+    messages: list[dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    top_p: float,
+    context_length: int,
+    stop_token: str | None = None,
+) -> str:
+    """Coroutine version of generate_from_openai_chat_completion, for many concurrent requests."""
+    if "OPENAI_API_KEY" not in os.environ and not _replaying():
         raise ValueError(
             "OPENAI_API_KEY environment variable must be set when using OpenAI API."
         )
-    response = client.chat.completions.create(
+    response = await get_llm_client().acreate(
         model=model,
         messages=messages,
         temperature=temperature,
@@ -0,0 +1,194 @@
+"""
+Deterministic comparators tried before llm_fuzzy_match.
+
+Counts, hh:mm:ss start/end times and the answers of the `output_format: json` tasks can be checked
+without a model. Each comparator returns "correct" or "incorrect" when it is sure, and None when
+the answer needs the LLM grader (free text, units, several candidate values, ...).
+"""
+import json
+import math
+import re
+from typing import Optional, Tuple
+
+# start/end times within this many seconds of the reference are correct
+TIME_TOLERANCE = 3.0
+
+NUMBER_PATTERN = re.compile(r"(?<![\w.:])-?\d+(?:,\d{3})*(?:\.\d+)?(?![\w:])")
+TIME_PATTERN = re.compile(r"(?<!\d)(?:(\d{1,2}):)?(\d{1,2}):(\d{2})(?:\.(\d+))?(?!\d)")
+JSON_PATTERN = re.compile(r"\{.*\}|\[.*\]", re.DOTALL)
+
+# the only words a reference may have besides its times to be compared as a time range
+TIME_RANGE_WORDS = {"start", "starts", "started", "end", "ends", "ended", "time", "from", "to", "until", "and"}
+TIME_RANGE_SEPARATORS = re.compile(r"[\s\-\u2013\u2014~,;:.()\[\]{}/\"'_=]+")
+
+# references that mean "not achievable" are left to the grader prompt
+NOT_ACHIEVABLE = {"n/a", "na", "none", "i don't know"}
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.casefold().strip().strip(".").split())
+
+
+def _numbers(text: str) -> list[float]:
+    return [float(match.replace(",", "")) for match in NUMBER_PATTERN.findall(text)]
+
+
+def _times(text: str) -> list[float]:
+    """Seconds of every hh:mm:ss (or mm:ss) time in `text`."""
+    seconds = []
+    for hours, minutes, secs, fraction in TIME_PATTERN.findall(text):
+        value = int(hours or 0) * 3600 + int(minutes) * 60 + int(secs)
+        if fraction:
+            value += float("0." + fraction)
+        seconds.append(value)
+    return seconds
+
+
+def compare_exact(answer: str, reference: str) -> Optional[str]:
+    if _normalize_text(answer) == _normalize_text(reference):
+        return "correct"
+    return None
+
+
+def compare_numbers(answer: str, reference: str) -> Optional[str]:
+    """A reference that is a bare number, against the one number of the answer."""
+    if not re.fullmatch(r"\s*" + NUMBER_PATTERN.pattern + r"\s*\.?\s*", reference):
+        return None
+    (expected,) = _numbers(reference)
+    found = set(_numbers(answer))
+    if len(found) != 1 or _times(answer):
+        return None
+    return "correct" if math.isclose(found.pop(), expected, rel_tol=1e-9, abs_tol=1e-9) else "incorrect"
+
+
+def _is_time_range(text: str) -> bool:
+    """True for text that is only times, separators and start/end labels, e.g. "start: 00:00:12, end: 00:00:20"."""
+    rest = TIME_PATTERN.sub(" ", text).casefold()
+    words = [word for word in TIME_RANGE_SEPARATORS.split(rest) if word]
+    return all(word in TIME_RANGE_WORDS for word in words)
+
+
+def compare_time_ranges(answer: str, reference: str, tolerance: float = TIME_TOLERANCE) -> Optional[str]:
+    """
+    The hh:mm:ss times of the reference against those of the answer, in order. Only for references
+    that are nothing but times (and separators or start/end labels): other text needs the grader.
+    """
+    expected = _times(reference)
+    if not expected or not _is_time_range(reference):
+        return None
+    found = _times(answer)
+    if len(found) != len(expected):
+        return None
+    if all(abs(a - e) <= tolerance for a, e in zip(found, expected)):
+        return "correct"
+    return "incorrect"
+
+
+def _compare_values(answer, reference, tolerance: float) -> Optional[bool]:
+    """
+    True/False when the values surely match or not, None when only the grader can tell. False is
+    only returned for comparable values that differ (two numbers, two times, two booleans); a
+    different structure (renamed or extra keys, another shape, a reordered list) needs the grader.
+    """
+    if isinstance(reference, dict):
+        if not isinstance(answer, dict):
+            return None
+        answer = {_normalize_text(str(key)): value for key, value in answer.items()}
+        reference = {_normalize_text(str(key)): value for key, value in reference.items()}
+        if answer.keys() != reference.keys():
+            return None
+        return _all_match((_compare_values(answer[key], reference[key], tolerance) for key in reference))
+    if isinstance(reference, list):
+        if not isinstance(answer, list):
+            return None
+        if len(answer) == len(reference):
+            in_order = _all_match((_compare_values(a, r, tolerance) for a, r in zip(answer, reference)))
+            if in_order is True:
+                return True
+        # another order or length: wrong only if some answer value surely matches no reference value
+        for a in answer:
+            if all(_compare_values(a, r, tolerance) is False for r in reference):
+                return False
+        return None
+    if isinstance(reference, bool) or reference is None:
+        if isinstance(answer, bool) or answer is None:
+            return answer == reference
+        return None
+    if isinstance(reference, (int, float)):
+        if isinstance(answer, str):
+            numbers = _numbers(answer)
+            if len(numbers) != 1:
+                return None
+            answer = numbers[0]
+        if not isinstance(answer, (int, float)) or isinstance(answer, bool):
+            return None
+        return math.isclose(answer, reference, rel_tol=1e-9, abs_tol=1e-9)
+    if isinstance(answer, (dict, list)):
+        return None
+
+    # strings
+    answer, reference = str(answer), str(reference)
+    if _normalize_text(answer) == _normalize_text(reference):
+        return True
+    for compare in (compare_numbers, lambda a, r: compare_time_ranges(a, r, tolerance)):
+        verdict = compare(answer, reference)
+        if verdict is not None:
+            return verdict == "correct"
+    return None
+
+
+def _all_match(results) -> Optional[bool]:
+    unsure = False
+    for result in results:
+        if result is False:
+            return False
+        if result is None:
+            unsure = True
+    return None if unsure else True
+
+
+def _parse_json(text: str):
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    match = JSON_PATTERN.search(text)
+    if match is None:
+        raise ValueError("no json in text")
+    return json.loads(match.group(0))
+
+
+def compare_json(answer: str, reference: str, tolerance: float = TIME_TOLERANCE) -> Optional[str]:
+    """A json reference against the json in the answer, field by field."""
+    try:
+        expected = json.loads(reference)
+    except ValueError:
+        return None
+    if not isinstance(expected, (dict, list)):
+        return None
+    try:
+        found = _parse_json(answer)
+    except ValueError:
+        # an answer in prose is for the grader
+        return None
+    result = _compare_values(found, expected, tolerance)
+    if result is None:
+        return None
+    return "correct" if result else "incorrect"
+
+
+def fast_match(answer: str, reference: str, tolerance: float = TIME_TOLERANCE) -> Optional[Tuple[str, str]]:
+    """(verdict, comparator name) if a comparator is sure about the answer, otherwise None."""
+    if _normalize_text(reference) in NOT_ACHIEVABLE:
+        return None
+    comparators = (
+        ("json", lambda a, r: compare_json(a, r, tolerance)),
+        ("exact", compare_exact),
+        ("time_range", lambda a, r: compare_time_ranges(a, r, tolerance)),
+        ("number", compare_numbers),
+    )
+    for name, compare in comparators:
+        verdict = compare(answer, reference)
+        if verdict is not None:
+            return verdict, name
+    return None
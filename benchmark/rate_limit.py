@@ -0,0 +1,175 @@
+"""
+Requests-per-minute and tokens-per-minute limits shared by all processes of a host.
+
+Every model call made through benchmark.llm (DemoAgent and llm_fuzzy_match) first takes one request
+and its estimated tokens from two token buckets per model. The buckets live in a small JSON file
+under a lock file, so the `demo/run.py` processes of run_tasks.sh and the workers of
+fieldworkarena-run draw from the same budget instead of each running into the provider's 429s.
+Once a response arrives the estimate is corrected with the actual token usage.
+
+Configured with FIELDWORKARENA_RPM and FIELDWORKARENA_TPM (unset or 0: no limit) and
+FIELDWORKARENA_RATE_LIMIT_DIR (directory of the state files, the temp directory by default).
+Without fcntl (Windows) the limits only hold within one process.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# OpenAI vision pricing, see demo/token_budget.py
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+# completion tokens assumed when a request has no max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def estimate_tokens(messages: list, max_tokens: int = None) -> int:
+    """Rough token count of a chat request: about 4 characters per token, images by detail, plus the completion."""
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "text":
+                chars += len(part["text"])
+            elif part.get("type") == "image_url":
+                image_url = part["image_url"]
+                detail = image_url.get("detail", "auto") if isinstance(image_url, dict) else "auto"
+                images += IMAGE_TOKENS.get(detail, IMAGE_TOKENS["auto"])
+    return chars // 4 + images + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+
+class RateLimiter:
+    def __init__(self, rpm: float = None, tpm: float = None, state_dir: str = None) -> None:
+        self.rpm = rpm or None
+        self.tpm = tpm or None
+        self.state_dir = state_dir or tempfile.gettempdir()
+        # without fcntl, threads of this process still share the buckets
+        self._thread_lock = threading.Lock()
+
+    def is_limited(self) -> bool:
+        return self.rpm is not None or self.tpm is not None
+
+    def _state_path(self, model: str) -> str:
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", model or "default")
+        return os.path.join(self.state_dir, f"fieldworkarena-rate-{name}.json")
+
+    def _update(self, model: str, update):
+        """Run `update(state)` on the refilled buckets of `model` under the lock and save them."""
+        path = self._state_path(model)
+        with self._thread_lock, open(path + ".lock", "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {"requests": self.rpm or 0, "tokens": self.tpm or 0, "time": time.time()}
+
+            # both buckets refill continuously up to one minute's worth
+            now = time.time()
+            elapsed = max(0.0, now - state["time"])
+            if self.rpm:
+                state["requests"] = min(self.rpm, state["requests"] + elapsed * self.rpm / 60)
+            if self.tpm:
+                state["tokens"] = min(self.tpm, state["tokens"] + elapsed * self.tpm / 60)
+            state["time"] = now
+
+            result = update(state)
+
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_path, path)
+        return result
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """
+        Take one request and `tokens` tokens if both are available and return 0, otherwise take
+        nothing and return the seconds until they should be.
+        """
+        if not self.is_limited():
+            return 0.0
+        # a request larger than the whole bucket waits for a full bucket and then runs into debt
+        if self.tpm:
+            tokens = min(tokens, self.tpm)
+
+        def take(state) -> float:
+            wait = 0.0
+            if self.rpm and state["requests"] < 1:
+                wait = max(wait, (1 - state["requests"]) * 60 / self.rpm)
+            if self.tpm and state["tokens"] < tokens:
+                wait = max(wait, (tokens - state["tokens"]) * 60 / self.tpm)
+            if wait == 0.0:
+                if self.rpm:
+                    state["requests"] -= 1
+                if self.tpm:
+                    state["tokens"] -= tokens
+            return wait
+
+        return self._update(model, take)
+
+    def settle(self, model: str, estimated: int, actual: int) -> None:
+        """Correct the tokens taken for a request by its actual usage."""
+        if not self.tpm or actual is None:
+            return
+        estimated = min(estimated, self.tpm)
+
+        def correct(state) -> None:
+            state["tokens"] = min(self.tpm, state["tokens"] + estimated - actual)
+
+        self._update(model, correct)
+
+    def acquire(self, model: str, tokens: int) -> float:
+        """Wait until the request can be made and return the seconds waited."""
+        waited = 0.0
+        while (wait := self.reserve(model, tokens)) > 0:
+            time.sleep(wait)
+            waited += wait
+        return waited
+
+    async def aacquire(self, model: str, tokens: int) -> float:
+        """
+        Coroutine version of `acquire`. The state file is locked and read on a worker thread, so
+        waiting for another process' lock does not stall the other requests of the event loop.
+        """
+        waited = 0.0
+        while (wait := await asyncio.to_thread(self.reserve, model, tokens)) > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited
+
+    async def asettle(self, model: str, estimated: int, actual: int) -> None:
+        """Coroutine version of `settle`, run on a worker thread like `aacquire`."""
+        if not self.tpm or actual is None:
+            return
+        await asyncio.to_thread(self.settle, model, estimated, actual)
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter configured from the environment."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            rpm=float(os.environ.get("FIELDWORKARENA_RPM") or 0),
+            tpm=float(os.environ.get("FIELDWORKARENA_TPM") or 0),
+            state_dir=os.environ.get("FIELDWORKARENA_RATE_LIMIT_DIR"),
+        )
+    return _rate_limiter
@@ -0,0 +1,620 @@
+"""
+Run many FieldWorkArena episodes in a single process.
+
+`run_tasks.sh` starts a new interpreter per task id, so every episode pays for python startup,
+imports, task registration and a Chromium launch. This runner keeps the interpreter, the gym
+registry and one Playwright browser alive across episodes, and writes the same experiment
+directories as `demo/run.py`. With `--n_jobs N` episodes are spread over N worker processes, and
+with `--n_threads M` each process runs M episodes at a time whose model calls overlap.
+"""
+import argparse
+import importlib
+import logging
+import queue
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from .catalog import get_catalog
+from .manifest import RunManifest
+from . import config
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = list(config.TASK_ID_LISTS)
+
+# --n_threads > 1 patches browsergym internals (_install_thread_playwright, _install_thread_logging)
+# that were written against this version
+THREADED_BROWSERGYM_VERSION = "0.13.3"
+
+
+def str2bool(v):
+    if isinstance(v, bool):
+        return v
+    if v.lower() in ("yes", "true", "t", "y", "1"):
+        return True
+    elif v.lower() in ("no", "false", "f", "n", "0"):
+        return False
+    else:
+        raise argparse.ArgumentTypeError("Boolean value expected.")
+
+
+def read_task_ids(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def collect_task_ids(task_names=None, task_lists=None, categories=None) -> list[str]:
+    """Task ids from explicit names, `all_task_ids_*.txt` files and categories, in order and without duplicates."""
+    task_ids = list(task_names or [])
+    for path in task_lists or []:
+        task_ids.extend(read_task_ids(path))
+    catalog = get_catalog()
+    for category in categories or []:
+        for name in CATEGORIES if category == "all" else [category]:
+            task_ids.extend(catalog.by_category(name))
+    return list(dict.fromkeys(task_ids))
+
+
+def load_agent_args_class(spec: str, agent_path: str = None):
+    """Load an AbstractAgentArgs subclass from a "module:ClassName" spec."""
+    if agent_path and agent_path not in sys.path:
+        sys.path.insert(0, agent_path)
+    module_name, class_name = spec.split(":", 1)
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+class _SharedBrowser:
+    """Browser proxy whose close() is a no-op, so BrowserEnv can't close the shared browser."""
+
+    def __init__(self, browser) -> None:
+        self._browser = browser
+
+    def close(self, *args, **kwargs) -> None:
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._browser, name)
+
+
+@contextmanager
+def shared_browser():
+    """
+    Reuse one Chromium per set of launch options while the context is active.
+
+    BrowserEnv launches a new browser on every reset(); each episode still gets its own
+    browser context (cookies, pages), only the browser process is kept alive.
+    """
+    from browsergym.core import _get_global_playwright
+
+    chromium = _get_global_playwright().chromium
+    launch = chromium.launch
+    browsers = {}
+
+    def shared_launch(*args, **kwargs):
+        key = repr((args, sorted(kwargs.items())))
+        if key not in browsers or not browsers[key].is_connected():
+            browsers[key] = launch(*args, **kwargs)
+        return _SharedBrowser(browsers[key])
+
+    chromium.launch = shared_launch
+    try:
+        yield
+    finally:
+        chromium.launch = launch
+        for browser in browsers.values():
+            if browser.is_connected():
+                browser.close()
+
+
+def make_exp_args(task_name: str, agent_args, max_steps: int = 100, headless: bool = True):
+    from browsergym.experiments import EnvArgs, ExpArgs
+
+    # same settings as demo/run.py
+    env_args = EnvArgs(
+        task_name=task_name,
+        task_seed=None,
+        max_steps=max_steps,
+        headless=headless,
+    )
+    return ExpArgs(env_args=env_args, agent_args=agent_args)
+
+
+def run_episode(task_name: str, agent_args, result_dir: str, max_steps: int = 100, headless: bool = True) -> dict:
+    """Run one episode and return its experiment record (with "exp_dir" and "wall_time")."""
+    from browsergym.experiments import get_exp_result
+
+    exp_args = make_exp_args(task_name, agent_args, max_steps=max_steps, headless=headless)
+    start = time.time()
+    exp_args.prepare(result_dir)
+    exp_args.run()
+    record = get_exp_result(exp_args.exp_dir).get_exp_record()
+    record["exp_dir"] = str(exp_args.exp_dir)
+    record["wall_time"] = time.time() - start
+    return record
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run FieldWorkArena episodes in one process.")
+    parser.add_argument(
+        "task_lists",
+        nargs="*",
+        help="Task id list files, e.g. all_task_ids_factory.txt.",
+    )
+    parser.add_argument(
+        "--category",
+        action="append",
+        choices=CATEGORIES + ["all"],
+        help="Run all tasks of a category (can be repeated).",
+    )
+    parser.add_argument(
+        "--task_name",
+        action="append",
+        help="Run a single task id (can be repeated).",
+    )
+    parser.add_argument(
+        "--agent",
+        type=str,
+        default="agent:DemoAgentArgs",
+        help="Agent arguments class as 'module:ClassName'.",
+    )
+    parser.add_argument(
+        "--agent_path",
+        type=str,
+        default="./demo",
+        help="Directory added to sys.path to import the agent module.",
+    )
+    parser.add_argument(
+        "--model_name",
+        type=str,
+        default="gpt-4o",
+        help="OpenAI model name.",
+    )
+    parser.add_argument(
+        "--use_html",
+        type=str2bool,
+        default=False,
+        help="Use HTML in the agent's observation space.",
+    )
+    parser.add_argument(
+        "--use_axtree",
+        type=str2bool,
+        default=True,
+        help="Use AXTree in the agent's observation space.",
+    )
+    parser.add_argument(
+        "--image_max_pixels",
+        type=int,
+        default=None,
+        help="Downscale goal images and video frames to at most this many pixels.",
+    )
+    parser.add_argument(
+        "--image_max_bytes",
+        type=int,
+        default=None,
+        help="Maximum encoded size of one goal image or video frame.",
+    )
+    parser.add_argument(
+        "--episode_image_max_bytes",
+        type=int,
+        default=None,
+        help="Maximum encoded size of all goal images and video frames of an episode.",
+    )
+    parser.add_argument(
+        "--screenshot_max_pixels",
+        type=int,
+        default=None,
+        help="Downscale page screenshots to at most this many pixels.",
+    )
+    parser.add_argument(
+        "--skip_unchanged_screenshot",
+        type=str2bool,
+        default=None,
+        help="Send a short note instead of a screenshot identical to the last one sent.",
+    )
+    parser.add_argument(
+        "--observation_diff",
+        type=str2bool,
+        default=None,
+        help="Send the changes of the AXTree/DOM since the last full tree instead of the full tree.",
+    )
+    parser.add_argument(
+        "--diff_refresh_every",
+        type=int,
+        default=None,
+        help="With --observation_diff, send the full tree again after this many steps.",
+    )
+    parser.add_argument(
+        "--max_prompt_tokens",
+        type=int,
+        default=None,
+        help="Trim the prompt to this many tokens: older history, then video frames, then the page tree.",
+    )
+    parser.add_argument(
+        "--goal_media_once",
+        type=str2bool,
+        default=None,
+        help="Send the full goal media only on the first step, reduced versions on the following steps.",
+    )
+    parser.add_argument(
+        "--max_steps",
+        type=int,
+        default=100,
+        help="Maximum number of steps per episode.",
+    )
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes running episodes concurrently.",
+    )
+    parser.add_argument(
+        "--n_threads",
+        type=int,
+        default=1,
+        help=(
+            "Experimental: number of episodes run concurrently in each process, sharing one pooled LLM "
+            f"client. Patches browsergym internals, so values above 1 require browsergym-core "
+            f"{THREADED_BROWSERGYM_VERSION}."
+        ),
+    )
+    parser.add_argument(
+        "--rerun",
+        action="store_true",
+        help="Run every episode, even if the resume manifest has a finished result for it.",
+    )
+    parser.add_argument(
+        "--result_dir",
+        type=str,
+        default="./results",
+        help="Directory to save the experiment results.",
+    )
+
+    args = parser.parse_args(argv)
+    if not (args.task_lists or args.category or args.task_name):
+        parser.error("Give at least one task list file, --category or --task_name.")
+    if args.n_threads > 1:
+        try:
+            check_threaded_support()
+        except RuntimeError as e:
+            parser.error(str(e))
+    return args
+
+
+def make_agent_args(args):
+    agent_args_class = load_agent_args_class(args.agent, args.agent_path)
+    # only pass the optional settings that are used, so agents without them still work
+    optional = {
+        name: getattr(args, name)
+        for name in (
+            "image_max_pixels",
+            "image_max_bytes",
+            "episode_image_max_bytes",
+            "screenshot_max_pixels",
+            "skip_unchanged_screenshot",
+            "observation_diff",
+            "diff_refresh_every",
+            "max_prompt_tokens",
+            "goal_media_once",
+        )
+        if getattr(args, name) is not None
+    }
+    # same agent settings as demo/run.py
+    return agent_args_class(
+        model_name=args.model_name,
+        chat_mode=False,
+        demo_mode="off",
+        use_html=args.use_html,
+        use_axtree=args.use_axtree,
+        use_screenshot=True,
+        **optional,
+    )
+
+
+def _try_episode(task_name: str, agent_args, result_dir: str, max_steps: int) -> dict:
+    try:
+        return run_episode(task_name, agent_args, result_dir, max_steps=max_steps)
+    except Exception as e:
+        # ExpArgs.run() already records agent/env errors; this only catches harness failures
+        logger.exception("Episode %s failed.", task_name)
+        return {"err_msg": f"{type(e).__name__}: {e}", "wall_time": 0.0}
+
+
+def run_serial(task_ids, agent_args, result_dir: str, max_steps: int = 100):
+    """Run episodes one after another in this process, yielding (task_name, record)."""
+    with shared_browser():
+        for task_name in task_ids:
+            yield task_name, _try_episode(task_name, agent_args, result_dir, max_steps)
+
+
+_thread_local = threading.local()
+
+
+def check_threaded_support() -> None:
+    """Raise RuntimeError unless the installed browsergym is the one the threading patches were written for."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        installed = version("browsergym-core")
+    except PackageNotFoundError:
+        installed = None
+    if installed != THREADED_BROWSERGYM_VERSION:
+        raise RuntimeError(
+            f"--n_threads > 1 is experimental and patches browsergym internals written for browsergym-core "
+            f"{THREADED_BROWSERGYM_VERSION}, but {installed or 'no browsergym-core'} is installed. "
+            "Use --n_threads 1 (and --n_jobs for parallel episodes)."
+        )
+
+
+def _install_thread_playwright() -> None:
+    """
+    Make browsergym use the Playwright of the current thread when it has one: the sync API can't
+    be used from another thread than the one that started it, and browsergym keeps a single one.
+    Every browsergym module that imported _get_global_playwright by name (core.env for the browser,
+    core.chat for the chat page of every reset()) gets the thread-aware version.
+    """
+    import browsergym.core
+
+    get_global_playwright = browsergym.core._get_global_playwright
+    if getattr(get_global_playwright, "thread_aware", False):
+        return
+
+    def get_playwright():
+        playwright = getattr(_thread_local, "playwright", None)
+        return playwright if playwright is not None else get_global_playwright()
+
+    get_playwright.thread_aware = True
+    for module_name in ("browsergym.core.env", "browsergym.core.chat"):
+        try:
+            importlib.import_module(module_name)
+        except ImportError:
+            pass
+    for module_name, module in list(sys.modules.items()):
+        if not module_name.startswith("browsergym"):
+            continue
+        if getattr(module, "_get_global_playwright", None) is get_global_playwright:
+            module._get_global_playwright = get_playwright
+
+
+class _ThreadFilter(logging.Filter):
+    """Pass only the records logged by one thread."""
+
+    def __init__(self, thread_id: int) -> None:
+        super().__init__()
+        self.thread_id = thread_id
+
+    def filter(self, record) -> bool:
+        return record.thread == self.thread_id
+
+
+_logging_lock = threading.Lock()
+# experiment.log handler of the episode running on each thread
+_episode_log_handlers = {}
+
+
+def _install_thread_logging() -> None:
+    """
+    Give every episode thread its own experiment.log. ExpArgs._set_logger removes all root
+    StreamHandlers, FileHandlers included, so concurrent episodes would remove each other's log
+    files and the <id>/<answer> lines of all episodes would end up in the latest one. The episode's
+    file handler only takes the records of its thread, and the file handlers of the other running
+    episodes are put back. The root logger's handler list is replaced rather than changed in place,
+    so that threads logging at the same time never walk a list whose handlers are being removed and
+    added again (which skips or repeats records).
+    """
+    from browsergym.experiments import ExpArgs
+
+    set_logger = ExpArgs._set_logger
+    if getattr(set_logger, "thread_aware", False):
+        return
+    unset_logger = getattr(ExpArgs, "_unset_logger", None)
+
+    def thread_set_logger(self):
+        root_logger = logging.getLogger()
+        with _logging_lock:
+            root_logger.handlers = list(root_logger.handlers)
+            set_logger(self)
+            handler = self.logging_file_handler
+            handler.addFilter(_ThreadFilter(threading.get_ident()))
+            _episode_log_handlers[threading.get_ident()] = handler
+            for other in _episode_log_handlers.values():
+                if other not in root_logger.handlers:
+                    root_logger.addHandler(other)
+
+    thread_set_logger.thread_aware = True
+    ExpArgs._set_logger = thread_set_logger
+
+    if unset_logger is not None:
+
+        def thread_unset_logger(self):
+            with _logging_lock:
+                _drop_thread_log_handler()
+                root_logger = logging.getLogger()
+                root_logger.handlers = list(root_logger.handlers)
+                unset_logger(self)
+
+        ExpArgs._unset_logger = thread_unset_logger
+
+
+def _drop_thread_log_handler() -> None:
+    """Forget the experiment.log handler of the current thread's episode (call with _logging_lock held)."""
+    handler = _episode_log_handlers.pop(threading.get_ident(), None)
+    if handler is not None:
+        root_logger = logging.getLogger()
+        root_logger.handlers = [other for other in root_logger.handlers if other is not handler]
+
+
+@contextmanager
+def thread_playwright():
+    """Start a Playwright for the current thread, used by browsergym after _install_thread_playwright()."""
+    from playwright.sync_api import sync_playwright
+
+    _thread_local.playwright = sync_playwright().start()
+    try:
+        yield
+    finally:
+        playwright, _thread_local.playwright = _thread_local.playwright, None
+        playwright.stop()
+
+
+def _episode_thread(get_task, put_result, agent_args, result_dir: str, max_steps: int, own_playwright: bool) -> None:
+    try:
+        with thread_playwright() if own_playwright else nullcontext(), shared_browser():
+            while True:
+                task_name = get_task()
+                if task_name is None:
+                    break
+                put_result((task_name, _try_episode(task_name, agent_args, result_dir, max_steps)))
+    finally:
+        # thread ids are reused, a later thread must not log into this thread's last experiment.log
+        with _logging_lock:
+            _drop_thread_log_handler()
+
+
+def _run_episode_threads(get_task, put_result, agent_args, result_dir: str, max_steps: int, n_threads: int) -> None:
+    """
+    Run episodes from `get_task()` until it returns None, on `n_threads` threads with their own
+    Playwright and browser. The agents share the process' pooled LLM client, so the model calls of
+    different episodes overlap.
+    """
+    if n_threads <= 1:
+        _episode_thread(get_task, put_result, agent_args, result_dir, max_steps, own_playwright=False)
+        return
+    check_threaded_support()
+    _install_thread_playwright()
+    _install_thread_logging()
+    threads = [
+        threading.Thread(
+            target=_episode_thread,
+            args=(get_task, put_result, agent_args, result_dir, max_steps, True),
+            name=f"episode-{i}",
+        )
+        for i in range(n_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _collect(result_queue, n_results: int, is_running):
+    """Yield `n_results` outcomes from `result_queue`, failing if nothing is running anymore."""
+    remaining = n_results
+    while remaining:
+        try:
+            outcome = result_queue.get(timeout=1)
+        except queue.Empty:
+            if not is_running():
+                raise RuntimeError(f"All workers exited with {remaining} episodes left.")
+            continue
+        remaining -= 1
+        yield outcome
+
+
+def run_threaded(task_ids, agent_args, result_dir: str, n_threads: int, max_steps: int = 100):
+    """Run episodes on `n_threads` threads of this process, yielding (task_name, record) as episodes finish."""
+    task_queue = queue.Queue()
+    result_queue = queue.Queue()
+    for task_name in task_ids:
+        task_queue.put(task_name)
+    n_threads = max(1, min(n_threads, len(task_ids)))
+    for _ in range(n_threads):
+        task_queue.put(None)
+
+    runner = threading.Thread(
+        target=_run_episode_threads,
+        args=(task_queue.get, result_queue.put, agent_args, result_dir, max_steps, n_threads),
+        daemon=True,
+    )
+    runner.start()
+    yield from _collect(result_queue, len(task_ids), runner.is_alive)
+
+
+def _worker(task_queue, result_queue, agent_args, result_dir: str, max_steps: int, n_threads: int = 1) -> None:
+    _run_episode_threads(task_queue.get, result_queue.put, agent_args, result_dir, max_steps, n_threads)
+
+
+def run_parallel(task_ids, agent_args, result_dir: str, n_jobs: int, max_steps: int = 100, n_threads: int = 1):
+    """
+    Run episodes on `n_jobs` worker processes pulling from a shared queue, yielding
+    (task_name, record) as episodes finish. Each worker has its own browser, and runs
+    `n_threads` episodes at a time.
+    """
+    import multiprocessing
+
+    # playwright is not fork-safe
+    ctx = multiprocessing.get_context("spawn")
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    for task_name in task_ids:
+        task_queue.put(task_name)
+    n_jobs = max(1, min(n_jobs, len(task_ids)))
+    for _ in range(n_jobs * n_threads):
+        task_queue.put(None)
+
+    workers = [
+        ctx.Process(target=_worker, args=(task_queue, result_queue, agent_args, result_dir, max_steps, n_threads))
+        for _ in range(n_jobs)
+    ]
+    for worker in workers:
+        worker.start()
+    try:
+        yield from _collect(result_queue, len(task_ids), lambda: any(worker.is_alive() for worker in workers))
+    finally:
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    task_ids = collect_task_ids(args.task_name, args.task_lists, args.category)
+    agent_args = make_agent_args(args)
+
+    manifest = RunManifest(args.result_dir)
+    if not args.rerun:
+        pending = manifest.pending(task_ids, agent_args)
+        if len(pending) < len(task_ids):
+            print(f"Skipping {len(task_ids) - len(pending)} episodes already finished in {manifest.path}.")
+        task_ids = pending
+    if not task_ids:
+        print("Nothing to run.")
+        return
+
+    if args.n_jobs > 1:
+        logger.info("Running %d episodes on %d workers.", len(task_ids), args.n_jobs)
+        outcomes = run_parallel(
+            task_ids, agent_args, args.result_dir, args.n_jobs, max_steps=args.max_steps, n_threads=args.n_threads
+        )
+    elif args.n_threads > 1:
+        logger.info("Running %d episodes on %d threads.", len(task_ids), args.n_threads)
+        outcomes = run_threaded(task_ids, agent_args, args.result_dir, args.n_threads, max_steps=args.max_steps)
+    else:
+        logger.info("Running %d episodes in one process.", len(task_ids))
+        outcomes = run_serial(task_ids, agent_args, args.result_dir, max_steps=args.max_steps)
+
+    start = time.time()
+    failed = []
+    episode_time = 0.0
+    for i, (task_name, record) in enumerate(outcomes):
+        episode_time += record["wall_time"]
+        manifest.record(task_name, agent_args, record)
+        print(
+            f"[{i + 1}/{len(task_ids)}] {task_name}  reward: {record.get('cum_reward')}  "
+            f"steps: {record.get('n_steps')}  exp_dir: {record.get('exp_dir')}"
+        )
+        if record.get("err_msg"):
+            failed.append(task_name)
+    wall_time = time.time() - start
+
+    print(f"Ran {len(task_ids)} episodes, {len(failed)} failed.")
+    print(f"  wall time: {wall_time:.1f}s  summed episode time: {episode_time:.1f}s", end="")
+    print(f"  ({episode_time / wall_time:.2f}x)" if wall_time > 0 else "")
+    for task_name in failed:
+        print(f"  failed: {task_name}")
+
+
+if __name__ == "__main__":
+    main()
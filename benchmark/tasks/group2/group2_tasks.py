@@ -1,5 +1,4 @@
 import logging
-import pathlib
 import json
 from typing import List, Optional, Tuple
 
@@ -14,23 +13,14 @@ from browsergym.workarena.utils import url_login
 from browsergym.workarena.api.user import create_user
 
 from ...config import DATA_DIR, IMAGE_DIR, MOVIE_DIR, DOC_DIR
+from ...catalog import get_catalog, media_path
 
-import base64
-import cv2
 import os
 
-from ...metrics.automatic.automatic_evaluation import llm_fuzzy_match
 import re
 
 def _return_path(data_name):
-    if data_name.endswith("jpg") or data_name.endswith("png"):
-        return os.path.join(IMAGE_DIR, data_name)
-    elif data_name.endswith("mp4"):
-        return os.path.join(MOVIE_DIR, data_name)
-    elif data_name.endswith("pdf") or data_name.endswith("txt"):
-        return os.path.join(DOC_DIR, data_name)
-    else:
-        return os.path.join(DATA_DIR, data_name)
+    return media_path(data_name)
 
 def _build_goal(config, with_na_hint = False, only_json_output = False):
     goal_text = "Answer the following question based on the provided file.\n"
@@ -87,21 +77,14 @@ class GenericGroup2Task(AbstractServiceNowTask):  # Inherit from AbstractService
 
         self.config_file: str = None
 
-        config_dir = pathlib.Path(__file__).parent
-        all_configs = []
-
-        for config_file in config_dir.glob("*.json"):
-            with open(config_file, 'r', encoding='utf-8') as f:
-                #all_configs_str += f.read()
-                tmp = f.read()
-                all_configs.extend(json.loads(tmp))
-
         self.used_in_level_2 = True
 
+        catalog = get_catalog()
         if task_id is not None:
-            self.task_configs = [config for config in all_configs if "fieldworkarena." +  config["id"] == task_id]
+            task_config = catalog.get(task_id)
+            self.task_configs = [task_config] if task_config is not None else []
         else:
-            self.task_configs = all_configs
+            self.task_configs = catalog.configs()
         self.task_id = task_id 
         self.is_validated = True
         self.__dict__.update(kwargs)
@@ -1,111 +1,102 @@
-import base64
 import dataclasses
-import io
 import logging
-
-import numpy as np
-import openai
-from PIL import Image
+import math
 
 from browsergym.core.action.highlevel import HighLevelActionSet
 from browsergym.core.action.python import PythonActionSet
 from browsergym.experiments import AbstractAgentArgs, Agent
-from browsergym.utils.obs import flatten_axtree_to_str, flatten_dom_to_str, prune_html
+
+# browsergym's observation utilities are imported where they are used, openai inside benchmark.llm,
+# media dependencies (cv2, PIL, pypdf) inside media.py
 
 from copy import deepcopy
-from langchain_community.document_loaders import PyPDFLoader
 
 
 import re
-import cv2
-
-
-logger = logging.getLogger(__name__)
-
-def image_to_jpg_base64_url(image: np.ndarray | Image.Image):
-    """Convert a numpy array to a base64 encoded image url."""
-
-    if isinstance(image, np.ndarray):
-        image = Image.fromarray(image)
-    if image.mode in ("RGBA", "LA"):
-        image = image.convert("RGB")
-
-    with io.BytesIO() as buffer:
-        image.save(buffer, format="JPEG")
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-
-    return f"data:image/jpeg;base64,{image_base64}"
-
-
-# for feeding video frames to OpenAI API
-def process_video(video_path, seconds_per_frame=1):
-    logging.info("Processing video: %s", video_path)
-    base64Frames = []
-    max_frames = 30
-
-    video = cv2.VideoCapture(video_path)
-
-    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
-    logging.info("Total frames: %s", total_frames)
-
-    fps = video.get(cv2.CAP_PROP_FPS)
 
-    frames_to_skip = int(fps * seconds_per_frame)
-    curr_frame=0
+from benchmark.llm import get_llm_client
+from media import (
+    MAX_FRAMES,
+    NO_BUDGET,
+    THUMBNAIL_SIDE,
+    ImageBudget,
+    load_concurrently,
+    load_document,
+    load_image,
+    load_text,
+    load_video,
+    thumbnail_url,
+)
+from page_diff import AXTREE_BID, HTML_BID, REFRESH_EVERY, PageDiffer
+from prompt import PromptBuilder, frame_pairs, prompt_to_text
+from screenshot import ScreenshotEncoder
+from token_budget import TokenBudget
 
-    if frames_to_skip < total_frames / (max_frames - 1):
-        frames_to_skip = int(total_frames / (max_frames - 1))
-    while curr_frame < total_frames:
-        video.set(cv2.CAP_PROP_POS_FRAMES, curr_frame)
-        success, frame = video.read()
-        if not success:
-            break
-        base64Frames.append(image_to_jpg_base64_url(frame))
-        curr_frame += frames_to_skip
-    seconds_per_frame = frames_to_skip / fps
-    logging.info("Number of frames: %s", len(base64Frames))
-    video.release()
 
-    return base64Frames, seconds_per_frame
+logger = logging.getLogger(__name__)
 
-def parse_goal_object(goal_object):
+def parse_goal_object(goal_object, budget: ImageBudget = NO_BUDGET, stats: dict = None):
+    """
+    Load the media referenced in the goal as openai-style messages.
+    Images and video frames are encoded within `budget`; their sizes are added to `stats` if given.
+    """
     goals = []#deepcopy(goal_object)
-    image_paths = set()
-    video_paths = set()
-    document_paths = set()
-    text_paths = set()
+    # dicts rather than sets, so the files keep the order of the goal
+    image_paths = {}
+    video_paths = {}
+    document_paths = {}
+    text_paths = {}
     
     for msg in goal_object:
         if not msg["type"] == "text":
             continue
         tags = re.findall("\n.*?.jpg\n", msg["text"])
         for tag in tags:
-            image_paths.add(tag.strip())
+            image_paths[tag.strip()] = None
         tags = re.findall("\n.*?.mp4\n", msg["text"])
         for tag in tags:
-            video_paths.add(tag.strip())
+            video_paths[tag.strip()] = None
         tags = re.findall("\n.*?.pdf\n", msg["text"])
         for tag in tags:
-            document_paths.add(tag.strip())
+            document_paths[tag.strip()] = None
         tags = re.findall("\n.*?.txt\n", msg["text"])
         for tag in tags:
-            text_paths.add(tag.strip())
+            text_paths[tag.strip()] = None
 
     
+    # the episode budget is shared by all images and (at most MAX_FRAMES) frames of each video
+    image_budget = budget.per_image(len(image_paths) + MAX_FRAMES * len(video_paths))
+    if stats is None:
+        stats = {}
+    stats.setdefault("media_bytes", 0)
+    stats.setdefault("media_bytes_saved", 0)
+
+    # load all files concurrently, then assemble the messages in a fixed order
+    loaded = load_concurrently(
+        [(load_image, path, {"budget": image_budget}) for path in image_paths]
+        + [(load_video, path, {"budget": image_budget}) for path in video_paths]
+        + [(load_document, path, {}) for path in document_paths]
+        + [(load_text, path, {}) for path in text_paths]
+    )
+
+    def add_image(encoded):
+        goals.append({"type": "image_url", "image_url": {'url': encoded["url"], 'detail': encoded["detail"]}})
+        stats["media_bytes"] += encoded["bytes"]
+        stats["media_bytes_saved"] += encoded["native_bytes"] - encoded["bytes"]
+
     #if not image_paths == set():
     for i, image_path in enumerate(image_paths):
         if i == 0:
             goals.append({"type": "text", "text": "\nThese are the images you are provided."})
         goals.append({"type": "text", "text": image_path + ": "})
-        base64_image = image_to_jpg_base64_url(Image.open(image_path))
-        goals.append({"type": "image_url", "image_url": {'url': base64_image, 'detail': 'auto'}})
+        add_image(loaded[image_path])
 
     for i, video_path in enumerate(video_paths):
         if i == 0:
             goals.append({"type": "text", "text": "\nYou cannot see video directly, so you MUST use these frames decimated from the video."})
         goals.append({"type": "text", "text": video_path + ": "})
-        base64Frames, seconds_per_frame = process_video(video_path)
-        if len(base64Frames) == 0:
+        encoded_frames, seconds_per_frame = loaded[video_path]
+        if len(encoded_frames) == 0:
             return None
         
         def seconds_to_hhmmss(seconds):
@@ -114,38 +105,62 @@ def parse_goal_object(goal_object):
             seconds = int(seconds % 60)
             return f"{hours:02}:{minutes:02}:{seconds:02}"
 
-        for i, base64_frame in enumerate(base64Frames):
+        for i, encoded_frame in enumerate(encoded_frames):
             timestamp = seconds_to_hhmmss(i * seconds_per_frame)
             goals.append({"type": "text", "text": f"timestamp: {timestamp}"})
-            goals.append({"type": "image_url", "image_url": {'url': base64_frame, 'detail': 'low'}})
+            add_image(encoded_frame)
 
     # only use text from pdf
     for i, document_path in enumerate(document_paths):
         if i == 0:
             goals.append({"type": "text", "text": "\nThese are the text extracted from the document you are provided."})
         goals.append({"type": "text", "text": document_path + ": "})
-        loader = PyPDFLoader(document_path)
-        document = loader.load()
-        
-        #print(document_text)
-        document_text = ""
-        for page in document:
-            document_text += page.page_content + "\n"
+        document_text = loaded[document_path]
         goals.append({"type": "text", "text": document_text})
 
     for i, text_path in enumerate(text_paths):
         if i == 0:
             goals.append({"type": "text", "text": "\nThese are the text you are provided."})
         goals.append({"type": "text", "text": text_path + ": "})
-        with open(text_path, "r") as f:
-            text = f.read()
+        text = loaded[text_path]
         goals.append({"type": "text", "text": text})
     return goals
 
+def compact_goal(goal_msgs, frames_per_video=4, thumbnail_side=THUMBNAIL_SIDE):
+    """
+    Reduced version of the goal messages for the steps after the first one: images become
+    thumbnails and each video keeps `frames_per_video` evenly spaced frames. Text is kept.
+    """
+    pairs = frame_pairs(goal_msgs)
+    # consecutive frames belong to the same video
+    videos = []
+    for i in pairs:
+        if videos and videos[-1][-1] == i - 2:
+            videos[-1].append(i)
+        else:
+            videos.append([i])
+    drop = set()
+    for frames in videos:
+        step = max(1, math.ceil(len(frames) / frames_per_video))
+        for j, i in enumerate(frames):
+            if j % step:
+                drop.update((i, i + 1))
+
+    compact = []
+    for i, msg in enumerate(goal_msgs):
+        if i in drop:
+            continue
+        if msg["type"] == "image_url" and isinstance(msg["image_url"], dict):
+            msg = {"type": "image_url", "image_url": {"url": thumbnail_url(msg["image_url"]["url"], thumbnail_side), "detail": "low"}}
+        compact.append(msg)
+    return compact
+
+
 class DemoAgent(Agent):
     """A basic agent using OpenAI API, to demonstrate BrowserGym's functionalities."""
 
     def obs_preprocessor(self, obs: dict) -> dict:
+        from browsergym.utils.obs import flatten_axtree_to_str, flatten_dom_to_str, prune_html
 
         return {
             "chat_messages": obs["chat_messages"],
@@ -168,6 +183,14 @@ class DemoAgent(Agent):
         use_html: bool,
         use_axtree: bool,
         use_screenshot: bool,
+        image_budget: ImageBudget = NO_BUDGET,
+        log_full_prompt: bool = False,
+        screenshot_budget: ImageBudget = NO_BUDGET,
+        skip_unchanged_screenshot: bool = False,
+        observation_diff: bool = False,
+        diff_refresh_every: int = REFRESH_EVERY,
+        max_prompt_tokens: int = None,
+        goal_media_once: bool = False,
     ) -> None:
         super().__init__()
         self.model_name = model_name
@@ -175,11 +198,15 @@ class DemoAgent(Agent):
         self.use_html = use_html
         self.use_axtree = use_axtree
         self.use_screenshot = use_screenshot
+        self.image_budget = image_budget
+        self.log_full_prompt = log_full_prompt
+        self.goal_media_once = goal_media_once
 
         if not (use_html or use_axtree):
             raise ValueError(f"Either use_html or use_axtree must be set to True.")
 
-        self.openai_client = openai.OpenAI()
+        # one pooled client per process, shared by the episodes running in its threads
+        self.openai_client = get_llm_client()
 
         self.action_set = HighLevelActionSet(
             subsets=["chat", "tab", "nav", "bid", "infeas"],  # define a subset of the action space
@@ -193,248 +220,58 @@ class DemoAgent(Agent):
 
         self.action_history = []
         self.loaded_data = ""
+        self.prompt = PromptBuilder(
+            self.action_set,
+            chat_mode=chat_mode,
+            use_axtree=use_axtree,
+            use_html=use_html,
+            use_screenshot=use_screenshot,
+            budget=TokenBudget(max_prompt_tokens, model_name) if max_prompt_tokens else None,
+        )
+        self.screenshot_encoder = ScreenshotEncoder(screenshot_budget, skip_unchanged=skip_unchanged_screenshot)
+        # send only the changes of the AXTree / DOM between two full refreshes
+        self.axtree_differ = PageDiffer(AXTREE_BID, diff_refresh_every) if observation_diff else None
+        self.html_differ = PageDiffer(HTML_BID, diff_refresh_every) if observation_diff else None
 
     def get_action(self, obs: dict) -> tuple[str, dict]:
-        system_msgs = []
-        user_msgs = []
-
-        if self.chat_mode:
-            system_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Instructions
-You are an AI assistant, your goal is to help the user to achieve their goal.
-You can communicate with the user via chat and see images provided by the user.
-You have access to a web browser that both you and the user can see, and with which only you can interact via specific commands.
-
-Review the instructions from the user, the current state of the page and all other information
-to find the best possible next action to accomplish your goal. Your answer will be interpreted
-and executed by a program, make sure to follow the formatting instructions.
-""",
-                }
-            )
-            # append chat messages
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Chat Messages
-""",
-                }
-            )
-            for msg in obs["chat_messages"]:
-                if msg["role"] in ("user", "assistant", "infeasible"):
-                    user_msgs.append(
-                        {
-                            "type": "text",
-                            "text": f"""\
-- [{msg['role']}] {msg['message']}
-""",
-                        }
-                    )
-                elif msg["role"] == "user_image":
-                    user_msgs.append({"type": "image_url", "image_url": msg["message"]})
-                else:
-                    raise ValueError(f"Unexpected chat message role {repr(msg['role'])}")
+        stats = {}
 
-        else:
+        if not self.chat_mode and self.prompt.goal_msgs is None:
             assert obs["goal_object"], "The goal is missing."
-            system_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Instructions
-
-Review the current state of the page and all other information to find the best
-possible next action to accomplish your goal. Your answer will be interpreted
-and executed by a program, make sure to follow the formatting instructions.
-""",
-                }
-            )
-            # append goal
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Goal
-""",
-                }
-            )
             # goal_object is directly presented as a list of openai-style messages
-            #print(self.loaded_data)
-            if self.loaded_data == "":
-                self.loaded_data = parse_goal_object(obs["goal_object"])
-            
-            user_msgs.extend(obs["goal_object"])
-            user_msgs.extend(self.loaded_data)
-
-        # append url of all open tabs
-        user_msgs.append(
-            {
-                "type": "text",
-                "text": f"""\
-# Currently open tabs
-""",
-            }
-        )
-        for page_index, (page_url, page_title) in enumerate(
-            zip(obs["open_pages_urls"], obs["open_pages_titles"])
-        ):
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-Tab {page_index}{" (active tab)" if page_index == obs["active_page_index"] else ""}
-  Title: {page_title}
-  URL: {page_url}
-""",
-                }
-            )
-
-        # append page AXTree (if asked)
-        if self.use_axtree:
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Current page Accessibility Tree
-
-{obs["axtree_txt"]}
-
-""",
-                }
-            )
-        # append page HTML (if asked)
-        if self.use_html:
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# Current page DOM
-
-{obs["pruned_html"]}
-
-""",
-                }
-            )
-
-        # append page screenshot (if asked)
-        if self.use_screenshot:
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": """\
-# Current page Screenshot
-""",
-                }
-            )
-            user_msgs.append(
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": image_to_jpg_base64_url(obs["screenshot"]),
-                        "detail": "auto",
-                    },  # Literal["low", "high", "auto"] = "auto"
-                }
+            self.loaded_data = parse_goal_object(obs["goal_object"], self.image_budget, stats)
+            logger.info(
+                "Goal media: %d bytes sent, %d bytes saved by the image budget.",
+                stats["media_bytes"],
+                stats["media_bytes_saved"],
             )
-
-        # append action space description
-        user_msgs.append(
-            {
-                "type": "text",
-                "text": f"""\
-# Action Space
-
-{self.action_set.describe(with_long_description=False, with_examples=True)}
-
-Here are examples of actions with chain-of-thought reasoning:
-
-I now need to click on the Submit button to send the form. I will use the click action on the button, which has bid 12.
-```click("12")```
-
-I found the information requested by the user, I will send it to the chat.
-```send_msg_to_user("The price for a 15\\" laptop is 1499 USD.")```
-
-You should first click 'All' button.
-""",
-            }
-        )
-
-        # append past actions (and last error message) if any
-        if self.action_history:
-            user_msgs.append(
-                {
-                    "type": "text",
-                    "text": f"""\
-# History of past actions
-""",
-                }
-            )
-            user_msgs.extend(
-                [
-                    {
-                        "type": "text",
-                        "text": f"""\
-
-{action}
-""",
-                    }
-                    for action in self.action_history
-                ]
-            )
-
-            if obs["last_action_error"]:
-                user_msgs.append(
-                    {
-                        "type": "text",
-                        "text": f"""\
-# Error message from last action
-
-{obs["last_action_error"]}
-
-""",
-                    }
-                )
-
-        # ask for the next action
-        user_msgs.append(
-            {
-                "type": "text",
-                "text": f"""\
-# Next action
-
-You will now think step by step and produce your next best action. Reflect on your past actions, any resulting error message, and the current state of the page before deciding on your next action.
-You MUST answer with a single action.
-""",
-            }
-        )
-
-        prompt_text_strings = []
-        for message in system_msgs + user_msgs:
-            match message["type"]:
-                case "text":
-                    
-                    prompt_text_strings.append(message["text"])
-                case "image_url":
-                    image_url = message["image_url"]
-                    if isinstance(message["image_url"], dict):
-                        image_url = image_url["url"]
-                    if image_url.startswith("data:image"):
-                        prompt_text_strings.append(
-                            "image_url: " + image_url[:30] + "... (truncated)"
-                        )
-                    else:
-                        prompt_text_strings.append("image_url: " + image_url)
-                case _:
-                    raise ValueError(
-                        f"Unknown message type {repr(message['type'])} in the task goal."
-                    )
-        full_prompt_txt = "\n".join(prompt_text_strings)
-        logger.info(full_prompt_txt)
+            # browsergym passes goal_object as a tuple
+            goal_msgs = list(obs["goal_object"]) + self.loaded_data
+            has_media = any(msg["type"] == "image_url" for msg in goal_msgs)
+            self.prompt.set_goal(goal_msgs, compact_goal(goal_msgs) if self.goal_media_once and has_media else None)
+        if self.prompt.compact_goal_msgs is not None:
+            stats["goal_media_full"] = int(self.prompt.send_full_goal)
+
+        screenshot = self.screenshot_encoder.encode(obs["screenshot"], stats) if self.use_screenshot else None
+        axtree_txt = pruned_html = None
+        if self.axtree_differ is not None:
+            # active_page_index is a 1-element array in browsergym's observation
+            active_page_index = int(obs["active_page_index"][0])
+            page = (obs["open_pages_urls"][active_page_index], active_page_index)
+            if self.use_axtree:
+                axtree_txt = self.axtree_differ.update(obs["axtree_txt"], page, stats, "axtree")
+            if self.use_html:
+                pruned_html = self.html_differ.update(obs["pruned_html"], page, stats, "html")
+        trimmed = []
+        system_msgs, user_msgs = self.prompt.build(obs, screenshot, axtree_txt, pruned_html, stats, trimmed)
+        if trimmed:
+            logger.info("Prompt trimmed to the token budget: %s", "; ".join(trimmed))
+
+        if self.log_full_prompt and logger.isEnabledFor(logging.INFO):
+            logger.info(prompt_to_text(system_msgs + user_msgs))
 
         # query OpenAI model
-        response = self.openai_client.chat.completions.create(
+        response = self.openai_client.create(
             model=self.model_name,
             messages=[
                 {"role": "system", "content": system_msgs},
@@ -444,8 +281,9 @@ You MUST answer with a single action.
         action = response.choices[0].message.content
 
         self.action_history.append(action)
+        self.prompt.add_action(action)
 
-        return action, {}
+        return action, {"stats": stats, "extra_info": {"prompt_trimmed": trimmed}}
 
 
 @dataclasses.dataclass
@@ -463,6 +301,25 @@ class DemoAgentArgs(AbstractAgentArgs):
     use_html: bool = False
     use_axtree: bool = True
     use_screenshot: bool = False
+    # image budget for goal images and video frames, None means no limit
+    image_max_pixels: int = None
+    image_max_bytes: int = None
+    episode_image_max_bytes: int = None
+    # log the whole prompt of every step (expensive with large pages)
+    log_full_prompt: bool = False
+    # downscale screenshots to at most this many pixels, None means no limit
+    screenshot_max_pixels: int = None
+    # replace a screenshot identical to the last one sent by a short note
+    skip_unchanged_screenshot: bool = False
+    # send the changes of the AXTree / DOM since the last full tree instead of the full tree,
+    # with a full tree every diff_refresh_every steps and after navigation
+    observation_diff: bool = False
+    diff_refresh_every: int = REFRESH_EVERY
+    # trim the prompt to this many tokens (history, then video frames, then page tree), None means no limit
+    max_prompt_tokens: int = None
+    # send the full goal media only on the first step (and when the model asks for it again),
+    # thumbnails and a few frames per video on the other steps
+    goal_media_once: bool = False
 
     def make_agent(self):
         return DemoAgent(
@@ -472,4 +329,16 @@ class DemoAgentArgs(AbstractAgentArgs):
             use_html=self.use_html,
             use_axtree=self.use_axtree,
             use_screenshot=self.use_screenshot,
+            image_budget=ImageBudget(
+                max_pixels=self.image_max_pixels,
+                max_bytes=self.image_max_bytes,
+                episode_max_bytes=self.episode_image_max_bytes,
+            ),
+            log_full_prompt=self.log_full_prompt,
+            screenshot_budget=ImageBudget(max_pixels=self.screenshot_max_pixels),
+            skip_unchanged_screenshot=self.skip_unchanged_screenshot,
+            observation_diff=self.observation_diff,
+            diff_refresh_every=self.diff_refresh_every,
+            max_prompt_tokens=self.max_prompt_tokens,
+            goal_media_once=self.goal_media_once,
         )
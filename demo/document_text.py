@@ -0,0 +1,31 @@
+"""
+Text extraction from PDF documents, built directly on pypdf.
+
+Produces the same text as langchain's PyPDFLoader (each page's `extract_text()` followed by a
+newline) without importing langchain. Pages are extracted lazily and can be streamed one by one;
+whole-document text is memoized per file identity (path, size, mtime).
+"""
+import functools
+import os
+from typing import Iterator
+
+
+def iter_pdf_pages(document_path) -> Iterator[str]:
+    """Yield the text of each page of a PDF, extracting a page only when it is requested."""
+    from pypdf import PdfReader
+
+    with open(document_path, "rb") as f:
+        reader = PdfReader(f)
+        for page in reader.pages:
+            yield page.extract_text()
+
+
+@functools.lru_cache(maxsize=32)
+def _extract_pdf_text(document_path, size, mtime_ns) -> str:
+    return "".join(page_text + "\n" for page_text in iter_pdf_pages(document_path))
+
+
+def extract_pdf_text(document_path) -> str:
+    """Text of a whole PDF, one page after the other, each page followed by a newline."""
+    st = os.stat(document_path)
+    return _extract_pdf_text(os.path.abspath(document_path), st.st_size, st.st_mtime_ns)
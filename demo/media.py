@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import base64
+import dataclasses
+import io
+import logging
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# cv2, numpy and PIL are imported where they are used, so that importing this module (and the
+# agent) stays cheap for tasks without media
+
+from document_text import extract_pdf_text
+from media_cache import get_media_cache
+
+logger = logging.getLogger(__name__)
+
+# Beyond this many frames between two samples, seeking to the previous keyframe is cheaper than
+# decoding every frame in between (x264's default maximum GOP length is 250).
+SEEK_THRESHOLD = 250
+
+# at most this many frames are sampled from a video
+MAX_FRAMES = 30
+
+# number of media files loaded at the same time for one goal
+MEDIA_LOAD_WORKERS = 8
+
+# default JPEG quality of the OpenCV encoder, same as PIL's default
+JPEG_QUALITY = 75
+
+# images up to this size on their longest side lose nothing with detail "low"
+LOW_DETAIL_SIDE = 512
+
+# longest side of the reduced goal images sent after the first step
+THUMBNAIL_SIDE = 256
+
+
+@dataclasses.dataclass(frozen=True)
+class ImageBudget:
+    """Size limits for images sent to the model. None means no limit."""
+
+    max_pixels: int = None  # per image
+    max_bytes: int = None  # per image, size of the base64 url
+    episode_max_bytes: int = None  # all goal images of an episode together
+
+    def is_limited(self) -> bool:
+        return any(v is not None for v in dataclasses.astuple(self))
+
+    def per_image(self, n_images: int) -> "ImageBudget":
+        """Budget of one image when `n_images` images share the episode budget."""
+        max_bytes = self.max_bytes
+        if self.episode_max_bytes is not None and n_images:
+            share = self.episode_max_bytes // n_images
+            max_bytes = share if max_bytes is None else min(max_bytes, share)
+        return ImageBudget(max_pixels=self.max_pixels, max_bytes=max_bytes)
+
+
+NO_BUDGET = ImageBudget()
+
+
+def image_to_jpg_base64_url(image: np.ndarray | Image.Image):
+    """Convert a numpy array to a base64 encoded image url."""
+    import numpy as np
+    from PIL import Image
+
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    if image.mode in ("RGBA", "LA"):
+        image = image.convert("RGB")
+
+    with io.BytesIO() as buffer:
+        image.save(buffer, format="JPEG")
+        image_base64 = base64.b64encode(buffer.getvalue()).decode()
+
+    return f"data:image/jpeg;base64,{image_base64}"
+
+
+def bgr_to_jpg_base64_url(image: np.ndarray, quality: int = JPEG_QUALITY):
+    """
+    Encode a BGR(A) frame decoded by OpenCV with cv2.imencode.
+    Unlike image_to_jpg_base64_url this needs no PIL copy and keeps the colors of OpenCV frames right.
+    """
+    import cv2
+
+    success, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not success:
+        raise ValueError("Could not encode image as JPEG.")
+    image_base64 = base64.b64encode(buffer).decode()
+
+    return f"data:image/jpeg;base64,{image_base64}"
+
+
+def thumbnail_url(url: str, max_side: int = THUMBNAIL_SIDE) -> str:
+    """Smaller copy of a base64 encoded image url, at most `max_side` pixels on its longest side."""
+    header, _, data = url.partition(",")
+    if not header.startswith("data:image"):
+        return url
+
+    from PIL import Image
+
+    with Image.open(io.BytesIO(base64.b64decode(data))) as image:
+        if max(image.size) <= max_side:
+            return url
+        image.thumbnail((max_side, max_side))
+        return image_to_jpg_base64_url(image)
+
+
+def downscale(image: np.ndarray, max_pixels: int) -> np.ndarray:
+    """Shrink `image` to at most `max_pixels` pixels, keeping its aspect ratio."""
+    import cv2
+
+    height, width = image.shape[:2]
+    if not max_pixels or height * width <= max_pixels:
+        return image
+    scale = math.sqrt(max_pixels / (height * width))
+    size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_image(
+    image: np.ndarray | Image.Image,
+    budget: ImageBudget = NO_BUDGET,
+    default_detail="auto",
+    bgr=False,
+    quality: int = JPEG_QUALITY,
+) -> dict:
+    """
+    Encode an image within `budget`. `bgr` arrays (OpenCV frames) are encoded with cv2.imencode.
+
+    Returns {"url", "detail", "bytes", "native_bytes"}, where native_bytes is the size the image
+    would have had at full resolution. Without a budget the image is encoded as is with `default_detail`;
+    with one, a "low" or "high" `default_detail` is kept and "auto" becomes "low" for small images.
+    """
+    if bgr:
+        to_url = partial(bgr_to_jpg_base64_url, quality=quality)
+    else:
+        to_url = image_to_jpg_base64_url
+
+    if not budget.is_limited():
+        url = to_url(image)
+        return {"url": url, "detail": default_detail, "bytes": len(url), "native_bytes": len(url)}
+
+    import numpy as np
+
+    if not isinstance(image, np.ndarray):
+        image = np.asarray(image.convert("RGB"))
+    scaled = downscale(image, budget.max_pixels)
+    url = to_url(scaled)
+    while budget.max_bytes is not None and len(url) > budget.max_bytes and min(scaled.shape[:2]) > 16:
+        # JPEG size is roughly proportional to the number of pixels
+        height, width = scaled.shape[:2]
+        scaled = downscale(scaled, int(height * width * budget.max_bytes / len(url) * 0.9))
+        url = to_url(scaled)
+
+    native_bytes = len(url) if scaled is image else len(to_url(image))
+    detail = default_detail
+    if detail == "auto":
+        # an explicit "low" (video frames) stays low; only "auto" is resolved from the encoded size
+        detail = "low" if max(scaled.shape[:2]) <= LOW_DETAIL_SIDE else "high"
+    return {"url": url, "detail": detail, "bytes": len(url), "native_bytes": native_bytes}
+
+
+def frame_step(total_frames: int, fps: float, seconds_per_frame=1, max_frames=MAX_FRAMES) -> int:
+    """Number of frames between two samples: one frame per `seconds_per_frame`, at most `max_frames` frames."""
+    frames_to_skip = int(fps * seconds_per_frame)
+    if frames_to_skip < total_frames / (max_frames - 1):
+        frames_to_skip = int(total_frames / (max_frames - 1))
+    return max(frames_to_skip, 1)
+
+
+def _read_frames_seek(video, frame_indices):
+    import cv2
+
+    for frame_index in frame_indices:
+        video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+        success, frame = video.read()
+        if not success:
+            return
+        yield frame
+
+
+def _read_frames_sequential(video, frame_indices, seek_threshold=None):
+    """
+    Walk the stream once: grab() (decode only) up to each sampled frame and retrieve() just that one.
+    Gaps longer than `seek_threshold` frames are skipped with a seek instead.
+    """
+    import cv2
+
+    position = 0
+    for frame_index in frame_indices:
+        if seek_threshold is not None and frame_index - position > seek_threshold:
+            video.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            position = frame_index
+        while position < frame_index:
+            if not video.grab():
+                return
+            position += 1
+        if not video.grab():
+            return
+        position += 1
+        success, frame = video.retrieve()
+        if not success:
+            return
+        yield frame
+
+
+def sample_video_frames(video_path, seconds_per_frame=1, max_frames=MAX_FRAMES, strategy="auto", seek_threshold=SEEK_THRESHOLD):
+    """
+    Decode evenly spaced frames of a video.
+
+    strategy: "sequential" decodes the stream once, "seek" seeks before every frame,
+    "auto" decodes sequentially and only seeks over gaps longer than `seek_threshold` frames.
+
+    Returns the BGR frames and the number of seconds between two frames.
+    """
+    import cv2
+
+    video = cv2.VideoCapture(video_path)
+    try:
+        total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = video.get(cv2.CAP_PROP_FPS)
+        logger.info("Total frames: %s", total_frames)
+
+        frames_to_skip = frame_step(total_frames, fps, seconds_per_frame, max_frames)
+        frame_indices = range(0, total_frames, frames_to_skip)
+
+        if strategy == "seek":
+            frames = list(_read_frames_seek(video, frame_indices))
+        elif strategy == "sequential":
+            frames = list(_read_frames_sequential(video, frame_indices))
+        elif strategy == "auto":
+            frames = list(_read_frames_sequential(video, frame_indices, seek_threshold))
+        else:
+            raise ValueError(f"Unknown frame sampling strategy {repr(strategy)}.")
+    finally:
+        video.release()
+
+    seconds_per_frame = frames_to_skip / fps if fps else 0
+    return frames, seconds_per_frame
+
+
+def encode_frames(frames, budget: ImageBudget = NO_BUDGET, quality: int = JPEG_QUALITY, max_workers=None) -> list[dict]:
+    """Encode OpenCV frames with `encode_image` on a thread pool (cv2 releases the GIL while encoding)."""
+    encode = partial(encode_image, budget=budget, default_detail="low", bgr=True, quality=quality)
+    if len(frames) <= 1:
+        return [encode(frame) for frame in frames]
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(frames), os.cpu_count() or 1)) as executor:
+        return list(executor.map(encode, frames))
+
+
+# for feeding video frames to OpenAI API
+def process_video(video_path, seconds_per_frame=1, strategy="auto", budget: ImageBudget = NO_BUDGET, quality: int = JPEG_QUALITY):
+    """Sampled frames of a video encoded with `encode_image`, and the seconds between two frames."""
+    logging.info("Processing video: %s", video_path)
+    frames, seconds_per_frame = sample_video_frames(video_path, seconds_per_frame, strategy=strategy)
+    encoded_frames = encode_frames(frames, budget, quality)
+    logging.info("Number of frames: %s", len(encoded_frames))
+
+    return encoded_frames, seconds_per_frame
+
+
+def _encode_image_file(path, budget: ImageBudget = NO_BUDGET) -> dict:
+    """Image file encoded with `encode_image`; the file is closed before returning."""
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.load()
+        return encode_image(image, budget)
+
+
+def _media_spec(path, seconds_per_frame=1, budget: ImageBudget = NO_BUDGET, quality: int = JPEG_QUALITY):
+    """(cache kind, preprocessing parameters, compute function) of a media file."""
+    ext = os.path.splitext(path)[1].lower()
+    budget_params = dataclasses.asdict(budget)
+    if ext in (".jpg", ".jpeg", ".png"):
+        return "image", {"budget": budget_params}, lambda: _encode_image_file(path, budget)
+    if ext == ".mp4":
+        # "detail" keys out cached frames that were encoded as "high" under a budget
+        params = {
+            "seconds_per_frame": seconds_per_frame,
+            "budget": budget_params,
+            "encoder": "cv2",
+            "quality": quality,
+            "detail": "low",
+        }
+        return "video", params, lambda: process_video(path, seconds_per_frame, budget=budget, quality=quality)
+    if ext == ".pdf":
+        return "pdf_text", {"extractor": "pypdf"}, lambda: extract_pdf_text(path)
+    raise ValueError(f"No preprocessing for media file {repr(path)}.")
+
+
+def _cached(path, refresh=False, **kwargs):
+    kind, params, compute = _media_spec(path, **kwargs)
+    cache = get_media_cache()
+    if cache is None:
+        return compute()
+    if refresh:
+        value = compute()
+        cache.put(cache.key(path, kind, params), value)
+        return value
+    return cache.get_or_compute(path, kind, params, compute)
+
+
+def is_media_cached(path, **kwargs) -> bool:
+    cache = get_media_cache()
+    if cache is None:
+        return False
+    kind, params, _ = _media_spec(path, **kwargs)
+    return cache.contains(path, kind, params)
+
+
+def load_media(path, refresh=False, **kwargs):
+    """Preprocessed media file, from the media cache if possible. `refresh` recomputes the cache entry."""
+    return _cached(path, refresh=refresh, **kwargs)
+
+
+def load_image(image_path, budget: ImageBudget = NO_BUDGET):
+    """Image file encoded with `encode_image`."""
+    return _cached(image_path, budget=budget)
+
+
+def load_video(video_path, seconds_per_frame=1, budget: ImageBudget = NO_BUDGET, quality: int = JPEG_QUALITY):
+    """Sampled frames of a video encoded with `encode_image`, and the seconds between two frames."""
+    return _cached(video_path, seconds_per_frame=seconds_per_frame, budget=budget, quality=quality)
+
+
+def load_document(document_path):
+    """Text extracted from a PDF."""
+    return _cached(document_path)
+
+
+def load_text(text_path):
+    with open(text_path, "r") as f:
+        return f.read()
+
+
+def _timed(load, path, kwargs):
+    start = time.perf_counter()
+    result = load(path, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def load_concurrently(loads, max_workers=MEDIA_LOAD_WORKERS) -> dict:
+    """
+    Run (loader, path, kwargs) jobs on a bounded thread pool and return {path: result}.
+    The time spent on each file is logged.
+    """
+    if not loads:
+        return {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(loads))) as executor:
+        futures = {path: executor.submit(_timed, load, path, kwargs) for load, path, kwargs in loads}
+        results = {}
+        for path, future in futures.items():
+            results[path], seconds = future.result()
+            logger.info("Loaded %s in %.2fs", path, seconds)
+    logger.info("Loaded %d media files in %.2fs", len(loads), time.perf_counter() - start)
+    return results
@@ -0,0 +1,150 @@
+"""
+On-disk cache of preprocessed media (encoded images, sampled video frames, extracted text).
+
+Entries are keyed by the source file (path, size, mtime) and the preprocessing parameters, so a
+changed file or different parameters never hit a stale entry. The cache is bounded in size and
+evicts the least recently used entries. Several worker processes can share one cache directory:
+entries are written atomically and eviction is serialized with a lock file.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = "./cache/media"
+DEFAULT_MAX_BYTES = 4 * 1024**3
+
+
+def file_identity(path: str) -> tuple:
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+class MediaCache:
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, path: str, kind: str, params: dict = None) -> str:
+        data = json.dumps([file_identity(path), kind, params or {}], sort_keys=True)
+        return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".pkl")
+
+    def contains(self, path: str, kind: str, params: dict = None) -> bool:
+        return os.path.exists(self._entry_path(self.key(path, kind, params)))
+
+    def get(self, key: str, default=None):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception as e:
+            logger.warning("Dropping unreadable media cache entry %s: %s", entry_path, e)
+            self._remove(entry_path)
+            return default
+        try:
+            # mtime of an entry is its last use, for LRU eviction
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, value) -> None:
+        entry_path = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning("Could not write media cache entry %s: %s", entry_path, e)
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def get_or_compute(self, path: str, kind: str, params: dict, compute):
+        """Return the cached result of `compute()` for `path`, computing and storing it on a miss."""
+        key = self.key(path, kind, params)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def _remove(self, entry_path: str) -> None:
+        try:
+            os.remove(entry_path)
+        except OSError:
+            pass
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".pkl"):
+                    continue
+                entry_path = os.path.join(root, name)
+                try:
+                    st = os.stat(entry_path)
+                except FileNotFoundError:
+                    continue
+                yield entry_path, st.st_size, st.st_mtime
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache is within `max_bytes`."""
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # another process is already evicting
+                    return
+            entries = list(self._entries())
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            for entry_path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                self._remove(entry_path)
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def clear(self) -> None:
+        for entry_path, _, _ in list(self._entries()):
+            self._remove(entry_path)
+
+
+_media_cache = None
+
+
+def get_media_cache():
+    """
+    Return the process-wide media cache, or None if disabled.
+    Configured with FIELDWORKARENA_MEDIA_CACHE (directory, "" disables) and
+    FIELDWORKARENA_MEDIA_CACHE_SIZE (bytes).
+    """
+    global _media_cache
+    cache_dir = os.environ.get("FIELDWORKARENA_MEDIA_CACHE", DEFAULT_CACHE_DIR)
+    if not cache_dir:
+        return None
+    if _media_cache is None or _media_cache.cache_dir != cache_dir:
+        max_bytes = int(os.environ.get("FIELDWORKARENA_MEDIA_CACHE_SIZE", DEFAULT_MAX_BYTES))
+        _media_cache = MediaCache(cache_dir, max_bytes)
+    return _media_cache
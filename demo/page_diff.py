@@ -0,0 +1,97 @@
+"""
+Diffs of the page observation between two steps.
+
+ServiceNow pages give large accessibility trees (and DOMs) of which only a few nodes change after
+an action. PageDiffer keeps the last full tree it sent, indexed by bid, and afterwards returns
+only the nodes that were added, removed or changed since that tree. The full tree is sent again on
+the first step, after navigation, every `refresh_every` steps, and whenever the diff would not be
+shorter than the tree.
+
+The model does not see the previous prompts, so every diff lists all changes since the last full
+tree rather than since the previous step; between two refreshes the model only knows the unchanged
+nodes from its own past reasoning, and a smaller `refresh_every` trades tokens for context.
+"""
+import re
+
+# "[12] button 'Submit'" in flatten_axtree_to_str, bid="12" in pruned html
+AXTREE_BID = re.compile(r"^\s*\[([^\]\s]+)\]")
+HTML_BID = re.compile(r'\bbid="([^"]+)"')
+
+# refresh the full tree after this many diffs
+REFRESH_EVERY = 5
+
+
+def index_by_bid(text: str, bid_pattern: re.Pattern) -> dict[str, str]:
+    """
+    Split a flattened tree into nodes keyed by bid. Lines without a bid (static text, closing
+    tags) belong to the node above them; lines before the first bid are keyed by "".
+    """
+    nodes = {}
+    bid = ""
+    for line in text.splitlines():
+        match = bid_pattern.search(line)
+        if match:
+            bid = match.group(1)
+        nodes.setdefault(bid, []).append(line)
+    return {bid: "\n".join(lines) for bid, lines in nodes.items()}
+
+
+def diff_nodes(previous: dict[str, str], current: dict[str, str]) -> tuple[list[str], list[str], list[str]]:
+    """Bids of the added, removed and changed nodes, in page order."""
+    added = [bid for bid in current if bid not in previous]
+    removed = [bid for bid in previous if bid not in current]
+    changed = [bid for bid in current if bid in previous and current[bid] != previous[bid]]
+    return added, removed, changed
+
+
+def format_diff(current: dict[str, str], added: list[str], removed: list[str], changed: list[str]) -> str:
+    if not (added or removed or changed):
+        return "No changes since the last full tree.\n"
+    parts = [
+        f"Changes since the last full tree: {len(added)} added, {len(removed)} removed, "
+        f"{len(changed)} changed. Nodes not listed are unchanged.\n"
+    ]
+    if removed:
+        parts.append("Removed: " + ", ".join(f"[{bid}]" for bid in removed) + "\n")
+    if added:
+        parts.append("Added:\n" + "\n".join(current[bid] for bid in added) + "\n")
+    if changed:
+        parts.append("Changed (new version):\n" + "\n".join(current[bid] for bid in changed) + "\n")
+    return "\n".join(parts)
+
+
+class PageDiffer:
+    def __init__(self, bid_pattern: re.Pattern = AXTREE_BID, refresh_every: int = REFRESH_EVERY) -> None:
+        self.bid_pattern = bid_pattern
+        self.refresh_every = refresh_every
+        # nodes and page of the last full tree sent, which every diff is relative to
+        self.nodes = None
+        self.page = None
+        self.steps_since_refresh = 0
+
+    def update(self, text: str, page=None, stats: dict = None, name: str = "axtree") -> str:
+        """
+        Text to send for the current tree: the full tree or its diff to the last full tree sent.
+        `page` identifies the page (e.g. url and active tab); a different page sends the full tree.
+        Adds "<name>_chars", "<name>_full_chars" and "<name>_diff" to `stats` if given.
+        """
+        nodes = index_by_bid(text, self.bid_pattern)
+        output = None
+        if self.nodes is not None and page == self.page and self.steps_since_refresh < self.refresh_every:
+            diff = format_diff(nodes, *diff_nodes(self.nodes, nodes))
+            if len(diff) < len(text):
+                output = diff
+
+        if output is None:
+            self.nodes = nodes
+            self.page = page
+            self.steps_since_refresh = 0
+            output = text
+        else:
+            self.steps_since_refresh += 1
+
+        if stats is not None:
+            stats[f"{name}_chars"] = len(output)
+            stats[f"{name}_full_chars"] = len(text)
+            stats[f"{name}_diff"] = int(output is not text)
+        return output
@@ -0,0 +1,111 @@
+"""
+Pre-compute the media used by the benchmark tasks into the media cache, before running the agent.
+
+Images are encoded, video frames sampled and PDF text extracted on all CPU cores, so the first
+get_action() of each episode reads them from the cache instead of decoding them.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from media import ImageBudget, is_media_cached, load_media
+
+from benchmark.catalog import get_catalog, media_path
+
+# media that parse_goal_object preprocesses (text files are read as is)
+PREPARED_EXTENSIONS = (".jpg", ".mp4", ".pdf")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pre-extract the media of the benchmark tasks into the media cache.")
+    parser.add_argument(
+        "--category",
+        action="append",
+        choices=["factory", "warehouse", "retail"],
+        help="Only prepare the media of a category (can be repeated). Default: all tasks.",
+    )
+    parser.add_argument(
+        "--n_jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes.",
+    )
+    parser.add_argument(
+        "--image_max_pixels",
+        type=int,
+        default=None,
+        help="Same as for run.py, so the prepared images match the agent's image budget.",
+    )
+    parser.add_argument(
+        "--image_max_bytes",
+        type=int,
+        default=None,
+        help="Same as for run.py, so the prepared images match the agent's image budget.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Re-extract files that are already in the cache.",
+    )
+    return parser.parse_args()
+
+
+def collect_media_paths(categories=None) -> list[str]:
+    catalog = get_catalog()
+    if categories:
+        task_ids = [task_id for category in categories for task_id in catalog.by_category(category)]
+    else:
+        task_ids = catalog.task_ids()
+    paths = {}
+    for task_id in task_ids:
+        input_data = catalog.get(task_id)["input_data"]
+        for data_name in [input_data] if isinstance(input_data, str) else input_data:
+            if data_name.lower().endswith(PREPARED_EXTENSIONS):
+                paths[media_path(data_name)] = None
+    return list(paths)
+
+
+def _media_kwargs(path: str, budget: ImageBudget) -> dict:
+    return {} if path.lower().endswith(".pdf") else {"budget": budget}
+
+
+def prepare_file(path: str, budget: ImageBudget, force: bool = False) -> float:
+    start = time.perf_counter()
+    load_media(path, refresh=force, **_media_kwargs(path, budget))
+    return time.perf_counter() - start
+
+
+def main():
+    args = parse_args()
+    paths = collect_media_paths(args.category)
+    # an episode-wide byte budget depends on the task, so only per-image budgets can be prepared
+    budget = ImageBudget(max_pixels=args.image_max_pixels, max_bytes=args.image_max_bytes)
+
+    missing = [path for path in paths if not os.path.exists(path)]
+    paths = [path for path in paths if os.path.exists(path)]
+    up_to_date = set() if args.force else {path for path in paths if is_media_cached(path, **_media_kwargs(path, budget))}
+    paths = [path for path in paths if path not in up_to_date]
+    print(f"{len(paths)} files to prepare, {len(up_to_date)} up to date, {len(missing)} missing.")
+
+    start = time.perf_counter()
+    cpu_time = 0.0
+    with ProcessPoolExecutor(max_workers=args.n_jobs) as executor:
+        futures = {executor.submit(prepare_file, path, budget, args.force): path for path in paths}
+        for i, future in enumerate(as_completed(futures)):
+            path = futures[future]
+            try:
+                seconds = future.result()
+            except Exception as e:
+                print(f"[{i + 1}/{len(paths)}] failed: {path}: {e}")
+                continue
+            cpu_time += seconds
+            print(f"[{i + 1}/{len(paths)}] {seconds:7.2f}s  {path}")
+
+    print(f"Prepared {len(paths)} files in {time.perf_counter() - start:.1f}s ({cpu_time:.1f}s summed).")
+    for path in missing:
+        print(f"  missing: {path}")
+
+
+if __name__ == "__main__":
+    main()
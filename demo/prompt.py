@@ -0,0 +1,247 @@
+"""
+Prompt assembly for DemoAgent.
+
+The instructions, the goal (with its media) and the action space description do not change during
+an episode, so PromptBuilder builds them once. Each step only rebuilds the sections that depend on
+the observation (chat, tabs, AXTree, DOM, screenshot, last error), and the history of past actions
+grows by one message per step. With a TokenBudget the sections are trimmed to fit the budget.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+CHAT_INSTRUCTIONS = """\
+# Instructions
+You are an AI assistant, your goal is to help the user to achieve their goal.
+You can communicate with the user via chat and see images provided by the user.
+You have access to a web browser that both you and the user can see, and with which only you can interact via specific commands.
+
+Review the instructions from the user, the current state of the page and all other information
+to find the best possible next action to accomplish your goal. Your answer will be interpreted
+and executed by a program, make sure to follow the formatting instructions.
+"""
+
+GOAL_INSTRUCTIONS = """\
+# Instructions
+
+Review the current state of the page and all other information to find the best
+possible next action to accomplish your goal. Your answer will be interpreted
+and executed by a program, make sure to follow the formatting instructions.
+"""
+
+ACTION_SPACE = """\
+# Action Space
+
+{action_description}
+
+Here are examples of actions with chain-of-thought reasoning:
+
+I now need to click on the Submit button to send the form. I will use the click action on the button, which has bid 12.
+```click("12")```
+
+I found the information requested by the user, I will send it to the chat.
+```send_msg_to_user("The price for a 15\\" laptop is 1499 USD.")```
+
+You should first click 'All' button.
+"""
+
+# marker the model writes in its answer to get the full goal media again in the next step
+REQUEST_GOAL_MEDIA = "REQUEST_GOAL_MEDIA"
+
+GOAL_MEDIA_FULL = """\
+The files above are shown in full only in this step. Describe in your answer what you need from them to achieve the goal.
+"""
+
+GOAL_MEDIA_COMPACT = f"""\
+The files of the goal were shown in full in an earlier step, your observations about them are in the history of past actions. Reduced versions are shown above. If you need the full files again, write {REQUEST_GOAL_MEDIA} in your answer.
+"""
+
+UNCHANGED_SCREENSHOT = "The page looks the same as in the previous step, the screenshot is not repeated.\n"
+
+NEXT_ACTION = """\
+# Next action
+
+You will now think step by step and produce your next best action. Reflect on your past actions, any resulting error message, and the current state of the page before deciding on your next action.
+You MUST answer with a single action.
+"""
+
+
+def _text(text: str) -> dict:
+    return {"type": "text", "text": text}
+
+
+def frame_pairs(msgs: list[dict]) -> list[int]:
+    """Indices of the "timestamp: ..." texts of the goal that are followed by their video frame."""
+    return [
+        i
+        for i in range(len(msgs) - 1)
+        if msgs[i]["type"] == "text" and msgs[i]["text"].startswith("timestamp: ") and msgs[i + 1]["type"] == "image_url"
+    ]
+
+
+def prompt_to_text(messages: list[dict]) -> str:
+    """Readable version of a prompt for logging, with base64 images truncated."""
+    prompt_text_strings = []
+    for message in messages:
+        match message["type"]:
+            case "text":
+                prompt_text_strings.append(message["text"])
+            case "image_url":
+                image_url = message["image_url"]
+                if isinstance(message["image_url"], dict):
+                    image_url = image_url["url"]
+                if image_url.startswith("data:image"):
+                    prompt_text_strings.append(
+                        "image_url: " + image_url[:30] + "... (truncated)"
+                    )
+                else:
+                    prompt_text_strings.append("image_url: " + image_url)
+            case _:
+                raise ValueError(
+                    f"Unknown message type {repr(message['type'])} in the task goal."
+                )
+    return "\n".join(prompt_text_strings)
+
+
+class PromptBuilder:
+    def __init__(self, action_set, chat_mode: bool, use_axtree: bool, use_html: bool, use_screenshot: bool, budget=None) -> None:
+        self.chat_mode = chat_mode
+        self.use_axtree = use_axtree
+        self.use_html = use_html
+        self.use_screenshot = use_screenshot
+        # optional TokenBudget the prompt is trimmed to
+        self.budget = budget
+
+        # invariant sections, built once per episode
+        self.system_msgs = [_text(CHAT_INSTRUCTIONS if chat_mode else GOAL_INSTRUCTIONS)]
+        self.goal_msgs = None
+        self.compact_goal_msgs = None
+        self.send_full_goal = True
+        self.action_space_msgs = [
+            _text(
+                ACTION_SPACE.format(
+                    action_description=action_set.describe(with_long_description=False, with_examples=True)
+                )
+            )
+        ]
+        self.next_action_msgs = [_text(NEXT_ACTION)]
+
+        # grows by one message per step
+        self.history_msgs = []
+
+    def set_goal(self, goal_msgs: list[dict], compact_goal_msgs: list[dict] = None) -> None:
+        """
+        Goal section (goal object and loaded media), sent unchanged on every step. With
+        `compact_goal_msgs` the full goal is only sent on the first step and when the model asks
+        for it again (REQUEST_GOAL_MEDIA), the compact version on the other steps.
+        """
+        self.goal_msgs = [_text("# Goal\n")] + list(goal_msgs)
+        self.compact_goal_msgs = None
+        if compact_goal_msgs is not None:
+            self.goal_msgs.append(_text(GOAL_MEDIA_FULL))
+            self.compact_goal_msgs = [_text("# Goal\n")] + list(compact_goal_msgs) + [_text(GOAL_MEDIA_COMPACT)]
+        self.send_full_goal = True
+
+    def add_action(self, action: str) -> None:
+        self.history_msgs.append(_text(f"\n{action}\n"))
+        if self.compact_goal_msgs is not None:
+            self.send_full_goal = REQUEST_GOAL_MEDIA in action
+
+    def _chat_msgs(self, obs: dict) -> list[dict]:
+        msgs = [_text("# Chat Messages\n")]
+        for msg in obs["chat_messages"]:
+            if msg["role"] in ("user", "assistant", "infeasible"):
+                msgs.append(_text(f"- [{msg['role']}] {msg['message']}\n"))
+            elif msg["role"] == "user_image":
+                msgs.append({"type": "image_url", "image_url": msg["message"]})
+            else:
+                raise ValueError(f"Unexpected chat message role {repr(msg['role'])}")
+        return msgs
+
+    def _tabs_msgs(self, obs: dict) -> list[dict]:
+        msgs = [_text("# Currently open tabs\n")]
+        for page_index, (page_url, page_title) in enumerate(
+            zip(obs["open_pages_urls"], obs["open_pages_titles"])
+        ):
+            msgs.append(
+                _text(
+                    f"""\
+Tab {page_index}{" (active tab)" if page_index == obs["active_page_index"] else ""}
+  Title: {page_title}
+  URL: {page_url}
+"""
+                )
+            )
+        return msgs
+
+    def sections(self, obs: dict, screenshot: dict = None, axtree_txt: str = None, pruned_html: str = None) -> dict[str, list[dict]]:
+        """
+        User message sections of the current step, by name and in prompt order. `screenshot` is the
+        encoded screenshot ({"url", "detail"}); None means it was left out because the page did not change.
+        `axtree_txt` and `pruned_html` replace the ones of `obs` (e.g. by a diff to the last full tree).
+        """
+        sections = {}
+        if self.chat_mode:
+            sections["chat"] = self._chat_msgs(obs)
+        else:
+            assert self.goal_msgs is not None, "The goal is missing."
+            if self.send_full_goal or self.compact_goal_msgs is None:
+                sections["goal"] = self.goal_msgs
+            else:
+                sections["goal"] = self.compact_goal_msgs
+
+        sections["tabs"] = self._tabs_msgs(obs)
+
+        # append page AXTree (if asked)
+        if self.use_axtree:
+            if axtree_txt is None:
+                axtree_txt = obs["axtree_txt"]
+            sections["axtree"] = [_text(f"# Current page Accessibility Tree\n\n{axtree_txt}\n\n")]
+        # append page HTML (if asked)
+        if self.use_html:
+            if pruned_html is None:
+                pruned_html = obs["pruned_html"]
+            sections["html"] = [_text(f"# Current page DOM\n\n{pruned_html}\n\n")]
+
+        # append page screenshot (if asked)
+        if self.use_screenshot:
+            if screenshot is None:
+                sections["screenshot"] = [_text("# Current page Screenshot\n"), _text(UNCHANGED_SCREENSHOT)]
+            else:
+                sections["screenshot"] = [
+                    _text("# Current page Screenshot\n"),
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": screenshot["url"],
+                            "detail": screenshot["detail"],
+                        },  # Literal["low", "high", "auto"] = "auto"
+                    },
+                ]
+
+        sections["action_space"] = self.action_space_msgs
+
+        # append past actions (and last error message) if any
+        if self.history_msgs:
+            sections["history"] = [_text("# History of past actions\n")] + self.history_msgs
+            if obs["last_action_error"]:
+                sections["error"] = [_text(f"# Error message from last action\n\n{obs['last_action_error']}\n\n")]
+
+        # ask for the next action
+        sections["next_action"] = self.next_action_msgs
+        return sections
+
+    def build(self, obs: dict, screenshot: dict = None, axtree_txt: str = None, pruned_html: str = None, stats: dict = None, trimmed: list = None) -> tuple[list[dict], list[dict]]:
+        """
+        System and user messages of the current step (see `sections` for the arguments). With a
+        token budget the prompt is trimmed to fit; counters go to `stats`, descriptions to `trimmed`.
+        """
+        sections = self.sections(obs, screenshot, axtree_txt, pruned_html)
+        if self.budget is not None:
+            sections = self.budget.fit({"system": self.system_msgs, **sections}, stats, trimmed)
+            del sections["system"]
+
+        user_msgs = []
+        for msgs in sections.values():
+            user_msgs.extend(msgs)
+        return list(self.system_msgs), user_msgs
@@ -7,6 +7,7 @@ from agent import DemoAgentArgs
 from browsergym.experiments import EnvArgs, ExpArgs, get_exp_result
 
 import benchmark
+from benchmark.manifest import RunManifest
 def str2bool(v):
     if isinstance(v, bool):
         return v
@@ -44,12 +45,72 @@ def parse_args():
         default=True,
         help="Use AXTree in the agent's observation space.",
     )
+    parser.add_argument(
+        "--image_max_pixels",
+        type=int,
+        default=None,
+        help="Downscale goal images and video frames to at most this many pixels.",
+    )
+    parser.add_argument(
+        "--image_max_bytes",
+        type=int,
+        default=None,
+        help="Maximum encoded size of one goal image or video frame.",
+    )
+    parser.add_argument(
+        "--episode_image_max_bytes",
+        type=int,
+        default=None,
+        help="Maximum encoded size of all goal images and video frames of an episode.",
+    )
+    parser.add_argument(
+        "--screenshot_max_pixels",
+        type=int,
+        default=None,
+        help="Downscale page screenshots to at most this many pixels.",
+    )
+    parser.add_argument(
+        "--skip_unchanged_screenshot",
+        type=str2bool,
+        default=False,
+        help="Send a short note instead of a screenshot identical to the last one sent.",
+    )
+    parser.add_argument(
+        "--observation_diff",
+        type=str2bool,
+        default=False,
+        help="Send the changes of the AXTree/DOM since the last full tree instead of the full tree.",
+    )
+    parser.add_argument(
+        "--diff_refresh_every",
+        type=int,
+        default=5,
+        help="With --observation_diff, send the full tree again after this many steps.",
+    )
+    parser.add_argument(
+        "--max_prompt_tokens",
+        type=int,
+        default=None,
+        help="Trim the prompt to this many tokens: older history, then video frames, then the page tree.",
+    )
+    parser.add_argument(
+        "--goal_media_once",
+        type=str2bool,
+        default=False,
+        help="Send the full goal media only on the first step, reduced versions on the following steps.",
+    )
     parser.add_argument(
         "--result_dir",
         type=str,
         default="./results",
         help="Directory to save the experiment results.",
     )
+    parser.add_argument(
+        "--rerun",
+        type=str2bool,
+        default=False,
+        help="Run the task even if the resume manifest in result_dir has a finished result for it.",
+    )
 
     return parser.parse_args()
 
@@ -72,6 +133,15 @@ This is a basic agent for demo purposes.
         use_html=args.use_html,
         use_axtree=args.use_axtree,
         use_screenshot=True, # always use screenshot for demo agent
+        image_max_pixels=args.image_max_pixels,
+        image_max_bytes=args.image_max_bytes,
+        episode_image_max_bytes=args.episode_image_max_bytes,
+        screenshot_max_pixels=args.screenshot_max_pixels,
+        skip_unchanged_screenshot=args.skip_unchanged_screenshot,
+        observation_diff=args.observation_diff,
+        diff_refresh_every=args.diff_refresh_every,
+        max_prompt_tokens=args.max_prompt_tokens,
+        goal_media_once=args.goal_media_once,
     )
 
     # setting up environment config
@@ -87,6 +157,12 @@ This is a basic agent for demo purposes.
         quit("Openended task is not supported in this script.")
         
 
+    # skip tasks already finished with the same task config and agent settings
+    manifest = RunManifest(args.result_dir)
+    if not args.rerun and not manifest.pending([args.task_name], agent_args):
+        print(f"{args.task_name} already finished, see {manifest.path}.")
+        return
+
     # setting up the experiment
     exp_args = ExpArgs(
         env_args=env_args,
@@ -100,6 +176,7 @@ This is a basic agent for demo purposes.
     # loading and printing results
     exp_result = get_exp_result(exp_args.exp_dir)
     exp_record = exp_result.get_exp_record()
+    manifest.record(args.task_name, agent_args, dict(exp_record, exp_dir=str(exp_args.exp_dir)))
 
     for key, val in exp_record.items():
         print(f"{key}: {val}")
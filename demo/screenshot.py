@@ -0,0 +1,64 @@
+"""
+Per-step screenshot handling for DemoAgent.
+
+Many actions (scrolling an unchanged list, failed clicks, waiting) leave the page as it was. The
+screenshot of each step is compared with the last one sent through a small block-mean signature
+computed with NumPy; an unchanged screenshot can be replaced by a short note instead of being
+encoded and sent again (PromptBuilder then sends a short note; the AXTree still describes the
+page). Screenshots that are sent are encoded within an ImageBudget.
+"""
+from __future__ import annotations
+
+from media import NO_BUDGET, ImageBudget, encode_image
+
+# side of the square blocks averaged into the signature
+BLOCK_SIZE = 16
+
+# largest change of a block's mean gray level still considered "unchanged"
+CHANGE_THRESHOLD = 2.0
+
+
+def screenshot_signature(image):
+    """Mean gray level of each BLOCK_SIZE x BLOCK_SIZE block of an RGB screenshot."""
+    import numpy as np
+
+    height, width = image.shape[:2]
+    height, width = height - height % BLOCK_SIZE, width - width % BLOCK_SIZE
+    gray = image[:height, :width, :3].mean(axis=2, dtype=np.float32)
+    blocks = gray.reshape(height // BLOCK_SIZE, BLOCK_SIZE, width // BLOCK_SIZE, BLOCK_SIZE)
+    return blocks.mean(axis=(1, 3))
+
+
+def screenshot_changed(previous, current, threshold: float = CHANGE_THRESHOLD) -> bool:
+    import numpy as np
+
+    if previous is None or previous.shape != current.shape:
+        return True
+    return bool(np.abs(current - previous).max() > threshold)
+
+
+class ScreenshotEncoder:
+    def __init__(self, budget: ImageBudget = NO_BUDGET, skip_unchanged: bool = False, threshold: float = CHANGE_THRESHOLD) -> None:
+        self.budget = budget
+        self.skip_unchanged = skip_unchanged
+        self.threshold = threshold
+        # signature of the last screenshot that was sent, so that slow changes add up
+        self.sent_signature = None
+
+    def encode(self, screenshot, stats: dict = None):
+        """
+        Encoded screenshot ({"url", "detail", ...} as from encode_image), or None if
+        `skip_unchanged` is set and the page did not change since the last screenshot sent.
+        """
+        if stats is None:
+            stats = {}
+        if self.skip_unchanged:
+            signature = screenshot_signature(screenshot)
+            if not screenshot_changed(self.sent_signature, signature, self.threshold):
+                stats["screenshot_skipped"] = 1
+                return None
+            self.sent_signature = signature
+        encoded = encode_image(screenshot, self.budget, default_detail="auto")
+        stats["screenshot_bytes"] = encoded["bytes"]
+        stats["screenshot_bytes_saved"] = encoded["native_bytes"] - encoded["bytes"]
+        return encoded
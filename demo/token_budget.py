@@ -0,0 +1,170 @@
+"""
+Token budget for the agent prompt.
+
+The prompt grows during an episode (one full response per past action) and the page tree and goal
+media are not bounded either. TokenBudget counts the tokens of each prompt section with the model's
+tokenizer (tiktoken if installed, about 4 characters per token otherwise) and, when the prompt is
+over budget, trims it in this order until it fits:
+
+1. history: older actions are reduced to their action code, then the oldest ones are dropped,
+2. frames: every other goal video frame is dropped,
+3. html, then axtree: the page tree is cut at the end.
+"""
+import functools
+import re
+
+from prompt import frame_pairs
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# OpenAI vision pricing: 85 tokens for detail "low", 85 + 170 per 512px tile otherwise
+# (a 1024x1024 image, 4 tiles, is used as the estimate)
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+
+# the latest actions are always kept with their reasoning
+KEEP_RECENT_ACTIONS = 3
+
+ACTION_CODE = re.compile(r"```(.*?)```", re.DOTALL)
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model_name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+@functools.lru_cache(maxsize=1024)
+def count_tokens(text: str, model_name: str = "gpt-4o") -> int:
+    encoding = _encoding(model_name)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def message_tokens(msgs: list[dict], model_name: str = "gpt-4o") -> int:
+    total = 0
+    for msg in msgs:
+        if msg["type"] == "text":
+            total += count_tokens(msg["text"], model_name)
+        else:
+            image_url = msg["image_url"]
+            detail = image_url.get("detail", "auto") if isinstance(image_url, dict) else "auto"
+            total += IMAGE_TOKENS.get(detail, IMAGE_TOKENS["auto"])
+    return total
+
+
+def _text(text: str) -> dict:
+    return {"type": "text", "text": text}
+
+
+def _summarize_action(msg: dict) -> dict:
+    """Past action reduced to its action code, without the reasoning."""
+    codes = ACTION_CODE.findall(msg["text"])
+    if not codes:
+        return msg
+    return _text(f"\n```{codes[-1].strip()}```\n")
+
+
+class TokenBudget:
+    def __init__(self, max_tokens: int, model_name: str = "gpt-4o", keep_recent_actions: int = KEEP_RECENT_ACTIONS) -> None:
+        self.max_tokens = max_tokens
+        self.model_name = model_name
+        self.keep_recent_actions = keep_recent_actions
+
+    def count(self, msgs: list[dict]) -> int:
+        return message_tokens(msgs, self.model_name)
+
+    def fit(self, sections: dict[str, list[dict]], stats: dict = None, trimmed: list = None) -> dict[str, list[dict]]:
+        """
+        Trim `sections` (name -> messages, in prompt order) to at most `max_tokens` tokens.
+        Counters of what was trimmed are added to `stats` and descriptions appended to `trimmed`.
+        """
+        if stats is None:
+            stats = {}
+        if trimmed is None:
+            trimmed = []
+        sections = dict(sections)
+        tokens = {name: self.count(msgs) for name, msgs in sections.items()}
+
+        def over() -> int:
+            return sum(tokens.values()) - self.max_tokens
+
+        def replace(name: str, msgs: list[dict]) -> None:
+            sections[name] = msgs
+            tokens[name] = self.count(msgs)
+
+        if over() > 0 and sections.get("history"):
+            self._trim_history(sections, replace, over, stats, trimmed)
+        if over() > 0 and sections.get("goal"):
+            self._drop_frames(sections, replace, over, stats, trimmed)
+        for name in ("html", "axtree"):
+            if over() > 0 and sections.get(name):
+                self._truncate(name, sections, tokens, replace, over, stats, trimmed)
+
+        stats["prompt_tokens_estimate"] = sum(tokens.values())
+        if over() > 0:
+            trimmed.append(f"prompt still {over()} tokens over the budget of {self.max_tokens}")
+        return sections
+
+    def _trim_history(self, sections, replace, over, stats, trimmed) -> None:
+        # history section: header, one message per action, and optionally the last error
+        header, *actions = sections["history"]
+        n_old = max(0, len(actions) - self.keep_recent_actions)
+        if not n_old:
+            return
+        actions = [_summarize_action(msg) for msg in actions[:n_old]] + actions[n_old:]
+        replace("history", [header] + actions)
+        stats["history_summarized"] = n_old
+        trimmed.append(f"history: reasoning of the {n_old} oldest actions removed")
+
+        # drop just enough of the oldest actions, the note costs a few tokens
+        excess = over()
+        n_dropped = 0
+        if excess > 0:
+            excess += self.count([_text(f"\n({n_old} earlier actions omitted)\n")])
+            while excess > 0 and n_dropped < n_old:
+                excess -= self.count([actions[n_dropped]])
+                n_dropped += 1
+            note = _text(f"\n({n_dropped} earlier actions omitted)\n")
+            replace("history", [header, note] + actions[n_dropped:])
+        if n_dropped:
+            stats["history_dropped"] = n_dropped
+            trimmed.append(f"history: {n_dropped} oldest actions dropped")
+
+    def _drop_frames(self, sections, replace, over, stats, trimmed) -> None:
+        goal = sections["goal"]
+        n_dropped = 0
+        while over() > 0:
+            pairs = frame_pairs(goal)
+            if len(pairs) <= 1:
+                break
+            # drop every other frame, keeping the first
+            drop = set()
+            for i in pairs[1::2]:
+                drop.update((i, i + 1))
+            goal = [msg for i, msg in enumerate(goal) if i not in drop]
+            n_dropped += len(drop) // 2
+            replace("goal", goal)
+        if n_dropped:
+            stats["frames_dropped"] = n_dropped
+            trimmed.append(f"goal: {n_dropped} video frames dropped")
+
+    def _truncate(self, name, sections, tokens, replace, over, stats, trimmed) -> None:
+        (msg,) = sections[name]
+        lines = msg["text"].splitlines()
+        keep = len(lines)
+        while over() > 0 and keep > 1:
+            # tokens are roughly proportional to lines
+            target = tokens[name] - over()
+            keep = min(keep - 1, max(1, int(keep * target / max(tokens[name], 1))))
+            replace(name, [_text("\n".join(lines[:keep]) + f"\n... ({len(lines) - keep} more lines truncated)\n\n")])
+        if keep < len(lines):
+            stats[f"{name}_lines_dropped"] = len(lines) - keep
+            trimmed.append(f"{name}: {len(lines) - keep} of {len(lines)} lines truncated")
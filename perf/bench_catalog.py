@@ -0,0 +1,45 @@
+"""Compare loading the group2 task catalog from JSON vs. from the compiled cache.
+
+Usage: python perf/bench_catalog.py [--repeat N]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmark import config
+from benchmark.catalog import TaskCatalog
+
+
+def _timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times) / len(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_path = os.path.join(tmp_dir, "catalog.pickle")
+        TaskCatalog(config.G2_TASK_PATH, cache_path=cache_path)  # warm the cache
+
+        results = {
+            "parse json": _timeit(lambda: TaskCatalog(config.G2_TASK_PATH), args.repeat),
+            "load cache": _timeit(lambda: TaskCatalog(config.G2_TASK_PATH, cache_path=cache_path), args.repeat),
+        }
+        cache_size = os.path.getsize(cache_path)
+
+    print(f"catalog cache: {cache_size / 1024:.1f} KiB")
+    for name, (best, mean) in results.items():
+        print(f"{name:>10}: best {best * 1000:7.2f} ms  mean {mean * 1000:7.2f} ms")
+    print(f"speedup (best): {results['parse json'][0] / results['load cache'][0]:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Measure `import benchmark` startup with lazy (default) vs. eager task registration.
+
+Each sample runs in a fresh interpreter, as run_tasks.sh does for every task.
+
+Usage: python perf/bench_import.py [--repeat N] [--task_name fieldworkarena.1.1.0001]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+SNIPPET = """\
+import time
+start = time.perf_counter()
+import benchmark
+imported = time.perf_counter()
+benchmark.task_entry({task_name!r})
+resolved = time.perf_counter()
+print(imported - start, resolved - start)
+"""
+
+
+def _sample(task_name, eager, repeat):
+    env = dict(os.environ, FIELDWORKARENA_EAGER_REGISTRATION="1" if eager else "0")
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(task_name=task_name)],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        process = time.perf_counter() - start
+        imported, resolved = (float(v) for v in out.split()[-2:])
+        samples.append((imported, resolved, process))
+    return [min(column) for column in zip(*samples)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--task_name", type=str, default="fieldworkarena.1.1.0001")
+    args = parser.parse_args()
+
+    print(f"{'mode':>6} {'import':>10} {'+resolve':>10} {'process':>10}  (best of {args.repeat}, seconds)")
+    for eager in (False, True):
+        imported, resolved, process = _sample(args.task_name, eager, args.repeat)
+        mode = "eager" if eager else "lazy"
+        print(f"{mode:>6} {imported:10.3f} {resolved:10.3f} {process:10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Compare the PIL and OpenCV JPEG encoders on video-sized frames.
+
+Usage: python perf/bench_jpeg_encode.py [--frames 30] [--size 1920x1080]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from media import bgr_to_jpg_base64_url, encode_frames, image_to_jpg_base64_url  # noqa: E402
+
+
+def make_frames(n, width, height):
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frames = []
+    for i in range(n):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (x + i) % 256
+        frame[..., 1] = (y + 2 * i) % 256
+        frame[..., 2] = rng.integers(0, 64, (height, width), dtype=np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def _time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--size", type=str, default="1920x1080")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+    frames = make_frames(args.frames, width, height)
+
+    runs = {
+        "PIL (serial)": lambda: [image_to_jpg_base64_url(frame) for frame in frames],
+        "cv2 (serial)": lambda: [bgr_to_jpg_base64_url(frame) for frame in frames],
+        "cv2 (thread pool)": lambda: [encoded["url"] for encoded in encode_frames(frames)],
+    }
+    print(f"{args.frames} frames of {width}x{height}, best of {args.repeat}")
+    for name, fn in runs.items():
+        seconds, urls = _time(fn, args.repeat)
+        size = sum(len(url) for url in urls) / len(urls)
+        print(f"{name:>18}: {seconds * 1000 / len(frames):7.2f} ms/frame  {size / 1024:7.1f} KiB/frame")
+
+
+if __name__ == "__main__":
+    main()
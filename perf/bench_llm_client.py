@@ -0,0 +1,58 @@
+"""
+Throughput of model calls against the local stand-in server (perf/fake_openai_server.py).
+
+"blocking" makes the calls one after another with openai.OpenAI, as DemoAgent did. "pooled" makes
+them from `--concurrency` threads through the shared LLMClient (one AsyncOpenAI connection pool),
+as episodes running on the runner's threads do. Failed requests (--error_rate) are retried with
+jittered backoff.
+
+Usage: python perf/bench_llm_client.py [--requests 40] [--concurrency 8] [--latency 0.3] [--error_rate 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fake_openai_server import serve  # noqa: E402
+
+from benchmark.llm import LLMClient, RetryPolicy  # noqa: E402
+
+MESSAGES = [{"role": "user", "content": "What is the next action?"}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import openai
+
+    server, url = serve(latency=args.latency, error_rate=args.error_rate)
+
+    blocking = openai.OpenAI(api_key="test", base_url=url)
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        blocking.chat.completions.create(model="fake", messages=MESSAGES)
+    blocking_time = time.perf_counter() - start
+
+    client = LLMClient(api_key="test", base_url=url, policy=RetryPolicy(base_delay=0.1))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as executor:
+        list(executor.map(lambda _: client.create(model="fake", messages=MESSAGES), range(args.requests)))
+    pooled_time = time.perf_counter() - start
+    client.close()
+
+    print(f"{args.requests} requests, {args.latency}s latency, {server.n_errors} injected errors")
+    print(f"  blocking: {blocking_time:6.2f}s  {args.requests / blocking_time:6.1f} req/s")
+    print(f"    pooled: {pooled_time:6.2f}s  {args.requests / pooled_time:6.1f} req/s  ({blocking_time / pooled_time:.1f}x)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+AXTree characters sent per step with and without observation diffs, over a synthetic episode
+where each action changes a few nodes and every `--navigate_every` steps loads a new page.
+
+Usage: python perf/bench_page_diff.py [--steps 100] [--axtree_lines 3000] [--changes 5] [--refresh_every 5]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from page_diff import PageDiffer  # noqa: E402
+
+
+def make_episode(steps, axtree_lines, changes, navigate_every, seed=0):
+    """(page, axtree_txt) per step."""
+    rng = random.Random(seed)
+    episode = []
+    page = 0
+    nodes = {}
+    for step in range(steps):
+        if step % navigate_every == 0:
+            page += 1
+            nodes = {i: f"\t[{page}_{i}] link 'Row {i} of list {page}'" for i in range(axtree_lines)}
+        else:
+            for i in rng.sample(sorted(nodes), changes):
+                nodes[i] = f"\t[{page}_{i}] link 'Row {i} of list {page}' focused, step {step}"
+        episode.append((page, "RootWebArea 'Incidents'\n" + "\n".join(nodes.values())))
+    return episode
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--axtree_lines", type=int, default=3000)
+    parser.add_argument("--changes", type=int, default=5)
+    parser.add_argument("--navigate_every", type=int, default=10)
+    parser.add_argument("--refresh_every", type=int, default=5)
+    args = parser.parse_args()
+
+    episode = make_episode(args.steps, args.axtree_lines, args.changes, args.navigate_every)
+    full = sum(len(text) for _, text in episode)
+
+    differ = PageDiffer(refresh_every=args.refresh_every)
+    sent = 0
+    start = time.perf_counter()
+    for page, text in episode:
+        sent += len(differ.update(text, page))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.steps} steps, {args.axtree_lines} AXTree lines, {args.changes} changes per step")
+    print(f"   full tree: {full / args.steps:10.0f} chars/step")
+    print(f"        diff: {sent / args.steps:10.0f} chars/step  ({sent / full:.1%})  {elapsed * 1000 / args.steps:.2f} ms/step")
+
+
+if __name__ == "__main__":
+    main()
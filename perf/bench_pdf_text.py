@@ -0,0 +1,55 @@
+"""Compare PDF text extraction through langchain's PyPDFLoader with the pypdf-only extractor.
+
+Usage: python perf/bench_pdf_text.py [PDF ...]   (default: data/document/*.pdf)
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from document_text import _extract_pdf_text, extract_pdf_text  # noqa: E402
+
+
+def langchain_text(document_path):
+    from langchain_community.document_loaders import PyPDFLoader
+
+    document_text = ""
+    for page in PyPDFLoader(document_path).load():
+        document_text += page.page_content + "\n"
+    return document_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="*", default=sorted(glob.glob("data/document/*.pdf")))
+    args = parser.parse_args()
+    if not args.paths:
+        parser.error("No PDF given and none found in data/document/.")
+
+    start = time.perf_counter()
+    from langchain_community.document_loaders import PyPDFLoader  # noqa: F401
+
+    print(f"langchain loader import: {time.perf_counter() - start:.2f}s")
+    print(f"{'langchain':>10} {'pypdf':>8} {'memoized':>9}  same  file")
+    for path in args.paths:
+        start = time.perf_counter()
+        expected = langchain_text(path)
+        langchain_time = time.perf_counter() - start
+
+        _extract_pdf_text.cache_clear()
+        start = time.perf_counter()
+        text = extract_pdf_text(path)
+        pypdf_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        extract_pdf_text(path)
+        memoized_time = time.perf_counter() - start
+
+        same = "yes" if text == expected else "NO"
+        print(f"{langchain_time:9.3f}s {pypdf_time:7.3f}s {memoized_time:8.5f}s  {same:>4}  {path}")
+
+
+if __name__ == "__main__":
+    main()
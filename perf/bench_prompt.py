@@ -0,0 +1,106 @@
+"""
+Per-step cost of building the agent prompt over a long synthetic episode.
+
+"rebuild" reproduces the former get_action: every step rebuilt all sections, described the action
+set again and joined the full prompt text for logging. "incremental" uses one PromptBuilder for the
+episode and skips the full-prompt logging (now opt-in). With --max_prompt_tokens, "budget" also
+trims every prompt to that many tokens.
+
+Usage: python perf/bench_prompt.py [--steps 100] [--axtree_lines 3000] [--max_prompt_tokens N]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from prompt import PromptBuilder, prompt_to_text  # noqa: E402
+from token_budget import TokenBudget, message_tokens  # noqa: E402
+
+
+def make_action_set():
+    try:
+        from browsergym.core.action.highlevel import HighLevelActionSet
+
+        return HighLevelActionSet(subsets=["chat", "tab", "nav", "bid", "infeas"], strict=False, multiaction=False)
+    except ImportError:
+
+        class _ActionSet:
+            def describe(self, with_long_description=False, with_examples=True):
+                return "\n".join(f"action_{i}(bid: str)\n    Examples:\n        action_{i}('12')" for i in range(30))
+
+        return _ActionSet()
+
+
+def make_obs(step, axtree_lines):
+    axtree = "\n".join(f"[{i}] button 'Item {i} of step {step // 5}'" for i in range(axtree_lines))
+    return {
+        "chat_messages": [],
+        "open_pages_urls": ["https://example.service-now.com/now/nav/ui/classic/params/target/incident_list.do"],
+        "open_pages_titles": ["Incidents | ServiceNow"],
+        "active_page_index": 0,
+        "axtree_txt": axtree,
+        "pruned_html": "",
+        "last_action_error": "" if step % 7 else "TimeoutError: element not found",
+    }
+
+
+GOAL = [{"type": "text", "text": "Answer the following question based on the provided file.\n" * 5}] + [
+    {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64," + "A" * 50_000, "detail": "low"}}
+] * 30
+
+ACTION = "I will click on the next item to continue. " * 10 + '```click("12")```'
+
+SCREENSHOT = {"url": "data:image/jpeg;base64," + "B" * 200_000, "detail": "auto"}
+
+
+def run(mode, action_set, observations, max_prompt_tokens=None):
+    builder = None
+    budget = TokenBudget(max_prompt_tokens) if mode == "budget" else None
+    times, allocations, tokens = [], [], []
+    history = []
+    for obs in observations:
+        tracemalloc.start()
+        start = time.perf_counter()
+        if mode == "rebuild" or builder is None:
+            builder = PromptBuilder(
+                action_set, chat_mode=False, use_axtree=True, use_html=False, use_screenshot=True, budget=budget
+            )
+            builder.set_goal(GOAL)
+            for action in history:
+                builder.add_action(action)
+        system_msgs, user_msgs = builder.build(obs, SCREENSHOT)
+        if mode == "rebuild":
+            prompt_to_text(system_msgs + user_msgs)
+        times.append(time.perf_counter() - start)
+        allocations.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        tokens.append(message_tokens(system_msgs + user_msgs))
+        history.append(ACTION)
+        builder.add_action(ACTION)
+    return times, allocations, tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=100)
+    parser.add_argument("--axtree_lines", type=int, default=3000)
+    parser.add_argument("--max_prompt_tokens", type=int, default=None)
+    args = parser.parse_args()
+
+    action_set = make_action_set()
+    observations = [make_obs(step, args.axtree_lines) for step in range(args.steps)]
+    print(f"{args.steps} steps, {args.axtree_lines} AXTree lines")
+    modes = ["rebuild", "incremental"] + (["budget"] if args.max_prompt_tokens else [])
+    for mode in modes:
+        times, allocations, tokens = run(mode, action_set, observations, args.max_prompt_tokens)
+        print(
+            f"{mode:>12}: {sum(times) * 1000 / len(times):7.3f} ms/step  "
+            f"peak alloc {sum(allocations) / len(allocations) / 1024:9.1f} KiB/step  "
+            f"last step {times[-1] * 1000:7.3f} ms  {tokens[-1]:7d} tokens"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Startup profile of `import benchmark` and of the demo agent, based on `python -X importtime`.
+
+Prints the total import time of each target and the slowest modules (cumulative time). With
+--save the result is written as JSON; with --baseline a previous result is compared and the
+script exits with status 1 if a target got slower than --tolerance allows.
+
+Usage: python perf/bench_startup.py [--repeat 5] [--top 15] [--save out.json] [--baseline out.json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+TARGETS = {
+    "benchmark": "import benchmark",
+    "agent": "import agent",
+}
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def importtime(statement):
+    """{module: cumulative microseconds} for the modules imported by `statement` in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.join(ROOT, "demo"), ROOT, os.environ.get("PYTHONPATH", "")]))
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env,
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stderr
+    modules = {}
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            modules[match.group(4)] = int(match.group(2))
+    return modules
+
+
+def profile(statement, repeat):
+    """Best-of-`repeat` cumulative time per module."""
+    best = {}
+    for _ in range(repeat):
+        for module, us in importtime(statement).items():
+            best[module] = min(us, best.get(module, us))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--save", type=str, default=None, help="Write the totals and profiles as JSON.")
+    parser.add_argument("--baseline", type=str, default=None, help="Compare with a JSON written by --save.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown vs. the baseline (0.2 = 20%%).")
+    args = parser.parse_args()
+
+    results = {}
+    for target, statement in TARGETS.items():
+        modules = profile(statement, args.repeat)
+        total = modules.get(target, 0)
+        results[target] = {"total_us": total, "modules": modules}
+        print(f"{target}: {total / 1000:.1f} ms")
+        for module, us in sorted(modules.items(), key=lambda item: -item[1])[: args.top]:
+            print(f"  {us / 1000:9.1f} ms  {module}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressed = False
+        for target, result in results.items():
+            if target not in baseline:
+                continue
+            before, after = baseline[target]["total_us"], result["total_us"]
+            change = (after - before) / before if before else 0.0
+            print(f"{target}: {before / 1000:.1f} ms -> {after / 1000:.1f} ms ({change:+.0%})")
+            regressed |= change > args.tolerance
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Compare per-frame seeking with sequential decoding when sampling video frames.
+
+Synthetic MP4s are generated locally (H.264 if OpenCV's FFmpeg build has an encoder, MPEG-4 otherwise).
+
+Usage: python perf/bench_video_sampler.py [--durations 10 60 300] [--max_frames 10 30] [--size 1920x1080]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from media import sample_video_frames  # noqa: E402
+
+STRATEGIES = ["seek", "sequential", "auto"]
+
+
+def make_video(path, duration, fps, width, height):
+    for codec in ("avc1", "mp4v"):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+        if writer.isOpened():
+            break
+    else:
+        raise RuntimeError("No MP4 encoder available in this OpenCV build.")
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    for i in range(int(duration * fps)):
+        frame = background.copy()
+        # a moving block, so that frames actually differ
+        x = (i * 7) % (width - 100)
+        frame[100:200, x : x + 100] = (0, 0, 255)
+        cv2.putText(frame, str(i), (50, height - 50), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 255, 255), 5)
+        writer.write(frame)
+    writer.release()
+    return codec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--durations", type=int, nargs="+", default=[10, 60, 300], help="Video durations in seconds.")
+    parser.add_argument("--max_frames", type=int, nargs="+", default=[10, 30], help="Number of sampled frames.")
+    parser.add_argument("--size", type=str, default="1920x1080")
+    parser.add_argument("--fps", type=int, default=30)
+    args = parser.parse_args()
+    width, height = (int(v) for v in args.size.split("x"))
+
+    print(f"{'duration':>8} {'frames':>6} " + " ".join(f"{s:>11}" for s in STRATEGIES))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for duration in args.durations:
+            path = os.path.join(tmp_dir, f"synthetic_{duration}s.mp4")
+            codec = make_video(path, duration, args.fps, width, height)
+            for max_frames in args.max_frames:
+                timings = []
+                reference = None
+                for strategy in STRATEGIES:
+                    start = time.perf_counter()
+                    frames, _ = sample_video_frames(path, max_frames=max_frames, strategy=strategy)
+                    timings.append(time.perf_counter() - start)
+                    if reference is None:
+                        reference = frames
+                    elif len(frames) != len(reference) or any(
+                        not np.array_equal(a, b) for a, b in zip(frames, reference)
+                    ):
+                        print(f"  warning: {strategy} frames differ from seek ({codec})")
+                print(f"{duration:>7}s {max_frames:>6} " + " ".join(f"{t:>10.2f}s" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers POST /v1/chat/completions after a fixed latency with a canned action, and can fail a share
+of the requests with 429 (and Retry-After) or 500 to exercise retries. Point an agent or the grader
+at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any OPENAI_API_KEY.
+
+Usage: python perf/fake_openai_server.py [--port 8765] [--latency 0.5] [--error_rate 0.1]
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = 'I have the answer.\n```send_msg_to_user("correct")```'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: dict, headers: dict = None) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        server = self.server
+        with server.lock:
+            server.n_requests += 1
+        time.sleep(server.latency)
+
+        if not self.path.endswith("/chat/completions"):
+            self._reply(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        if random.random() < server.error_rate:
+            with server.lock:
+                server.n_errors += 1
+            if random.random() < 0.5:
+                self._reply(429, {"error": {"message": "Rate limit reached", "type": "rate_limit"}}, {"Retry-After": "0.1"})
+            else:
+                self._reply(500, {"error": {"message": "Internal error", "type": "server_error"}})
+            return
+
+        self._reply(
+            200,
+            {
+                "id": f"chatcmpl-{server.n_requests}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": server.answer},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            },
+        )
+
+
+def serve(port: int = 0, latency: float = 0.5, error_rate: float = 0.0, answer: str = DEFAULT_ANSWER):
+    """Start the server on a background thread and return it with its base url (".../v1")."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    server.answer = answer
+    server.lock = threading.Lock()
+    server.n_requests = 0
+    server.n_errors = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, url = serve(args.port, args.latency, args.error_rate)
+    print(f"Serving fake chat completions on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
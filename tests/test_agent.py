@@ -0,0 +1,168 @@
+import base64
+import io
+import os
+import sys
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from agent import DemoAgentArgs, compact_goal  # noqa: E402
+from media import image_to_jpg_base64_url  # noqa: E402
+from prompt import REQUEST_GOAL_MEDIA, frame_pairs  # noqa: E402
+
+
+class FakeClient:
+    """Stands in for the pooled LLM client and records the requests."""
+
+    def __init__(self, action="noop()"):
+        self.action = action
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = SimpleNamespace(content=self.action)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def make_obs(axtree_txt="RootWebArea 'Incidents'\n\t[12] button 'Submit'", url="http://localhost/incidents", tab=0):
+    """Observation shaped like browsergym 0.13.3's after DemoAgent.obs_preprocessor."""
+    return {
+        "chat_messages": [],
+        "screenshot": np.zeros((64, 64, 3), dtype=np.uint8),
+        # browsergym passes the goal as a tuple of openai-style messages
+        "goal_object": ({"type": "text", "text": "How many workers are in the video?"},),
+        "last_action": "",
+        "last_action_error": "",
+        "open_pages_urls": (url, "http://localhost/other"),
+        "open_pages_titles": ("Incidents", "Other"),
+        "active_page_index": np.asarray([tab]),
+        "axtree_txt": axtree_txt,
+        "pruned_html": "<html bid=\"1\"><button bid=\"12\">Submit</button></html>",
+    }
+
+
+def make_agent(**kwargs):
+    agent = DemoAgentArgs(**kwargs).make_agent()
+    agent.openai_client = FakeClient()
+    return agent
+
+
+def user_text(request) -> str:
+    content = request["messages"][1]["content"]
+    return "".join(part["text"] for part in content if part["type"] == "text")
+
+
+@pytest.mark.parametrize("use_screenshot", [False, True])
+def test_get_action_with_browsergym_obs(use_screenshot):
+    agent = make_agent(use_screenshot=use_screenshot)
+    action, info = agent.get_action(make_obs())
+    assert action == "noop()"
+    assert "stats" in info
+    (request,) = agent.openai_client.requests
+    text = user_text(request)
+    assert "How many workers are in the video?" in text
+    assert "[12] button 'Submit'" in text
+
+
+def test_get_action_second_step_keeps_goal():
+    agent = make_agent()
+    agent.get_action(make_obs())
+    agent.get_action(make_obs())
+    assert len(agent.openai_client.requests) == 2
+    assert "How many workers are in the video?" in user_text(agent.openai_client.requests[1])
+
+
+def test_observation_diff_with_browsergym_obs():
+    agent = make_agent(observation_diff=True, use_html=True)
+    base = "RootWebArea 'Incidents'\n" + "\n".join(f"\t[{i}] link 'Incident row {i}'" for i in range(50))
+    agent.get_action(make_obs(base))
+    agent.get_action(make_obs(base.replace("'Incident row 7'", "'Incident row 7' focused")))
+    first, second = (user_text(request) for request in agent.openai_client.requests)
+    assert "[30] link 'Incident row 30'" in first
+    assert "Changes since the last full tree" in second
+    assert "[7] link 'Incident row 7' focused" in second
+    assert "[30] link 'Incident row 30'" not in second
+
+
+def test_observation_diff_sends_full_tree_after_tab_switch():
+    agent = make_agent(observation_diff=True)
+    base = "RootWebArea 'Incidents'\n" + "\n".join(f"\t[{i}] link 'Incident row {i}'" for i in range(50))
+    agent.get_action(make_obs(base, tab=0))
+    agent.get_action(make_obs(base, tab=1))
+    assert "[30] link 'Incident row 30'" in user_text(agent.openai_client.requests[1])
+
+
+def image_msg(size=(640, 480), detail="high"):
+    url = image_to_jpg_base64_url(np.zeros((size[1], size[0], 3), dtype=np.uint8))
+    return {"type": "image_url", "image_url": {"url": url, "detail": detail}}
+
+
+def video_msgs(n_frames):
+    msgs = [{"type": "text", "text": "video warehouse_01.mp4"}]
+    for i in range(n_frames):
+        msgs += [{"type": "text", "text": f"timestamp: 00:00:{i:02d}"}, image_msg((64, 48), "low")]
+    return msgs
+
+
+def image_side(msg) -> int:
+    with Image.open(io.BytesIO(base64.b64decode(msg["image_url"]["url"].partition(",")[2]))) as image:
+        return max(image.size)
+
+
+def test_compact_goal_keeps_text_and_shrinks_images():
+    goal = [{"type": "text", "text": "Which area is shown?"}, image_msg()]
+    compact = compact_goal(goal, thumbnail_side=128)
+    assert compact[0] == goal[0]
+    assert compact[1]["image_url"]["detail"] == "low"
+    assert image_side(compact[1]) == 128
+    assert image_side(goal[1]) == 640
+
+
+@pytest.mark.parametrize(
+    "n_frames, expected",
+    [
+        (12, [0, 3, 6, 9]),
+        (10, [0, 3, 6, 9]),
+        (3, [0, 1, 2]),
+    ],
+)
+def test_compact_goal_keeps_a_few_frames_per_video(n_frames, expected):
+    goal = video_msgs(n_frames) + video_msgs(n_frames)
+    compact = compact_goal(goal, frames_per_video=4)
+    timestamps = [msg["text"] for msg in compact if msg["type"] == "text" and msg["text"].startswith("timestamp")]
+    assert timestamps == [f"timestamp: 00:00:{i:02d}" for i in expected] * 2
+    assert frame_pairs(compact) == [i for i, msg in enumerate(compact) if msg["type"] == "text" and msg["text"].startswith("timestamp")]
+
+
+def test_goal_media_once_sends_full_goal_on_request():
+    agent = make_agent(goal_media_once=True)
+    obs = make_obs()
+    obs["goal_object"] = obs["goal_object"] + (image_msg(),)
+    full_url = obs["goal_object"][1]["image_url"]["url"]
+
+    def sent_full_goal(request) -> bool:
+        content = request["messages"][1]["content"]
+        return any(part["type"] == "image_url" and part["image_url"]["url"] == full_url for part in content)
+
+    _, info = agent.get_action(obs)
+    assert info["stats"]["goal_media_full"] == 1
+    agent.openai_client.action = f"I need to see the image again. {REQUEST_GOAL_MEDIA}\n```noop()```"
+    _, info = agent.get_action(obs)
+    assert info["stats"]["goal_media_full"] == 0
+    agent.openai_client.action = "noop()"
+    _, info = agent.get_action(obs)
+    assert info["stats"]["goal_media_full"] == 1
+    _, info = agent.get_action(obs)
+    assert info["stats"]["goal_media_full"] == 0
+    assert [sent_full_goal(request) for request in agent.openai_client.requests] == [True, False, True, False]
+    assert "How many workers are in the video?" in user_text(agent.openai_client.requests[1])
+
+
+def test_goal_without_media_is_always_sent_in_full():
+    agent = make_agent(goal_media_once=True)
+    _, info = agent.get_action(make_obs())
+    assert agent.prompt.compact_goal_msgs is None
+    assert "goal_media_full" not in info["stats"]
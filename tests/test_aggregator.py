@@ -0,0 +1,176 @@
+import json
+import os
+
+import pytest
+
+from benchmark import aggregator
+from benchmark.aggregator import ResultsIndex, exp_dir_stamp, read_episode
+from benchmark.catalog import TaskCatalog
+from benchmark.grading import EXPERIMENT_LOG, SCORES_FILE
+
+CATEGORIES = {"fieldworkarena.1.1.0001": "factory", "fieldworkarena.1.1.0002": "factory", "fieldworkarena.2.1.0001": "warehouse"}
+
+
+class FakeCatalog:
+    def __init__(self, categories):
+        self.categories = categories
+
+    def category_of(self, task_id):
+        return self.categories.get(task_id.removesuffix(".report"))
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    catalog = FakeCatalog(dict(CATEGORIES))
+    monkeypatch.setattr(aggregator, "get_catalog", lambda: catalog)
+    return catalog
+
+
+def make_episode(result_dir, task_id, date="2024-05-01_10-00-00", reward=1.0, n_steps=3, err_msg=None, answer="3"):
+    exp_dir = result_dir / f"{date}_DemoAgent_on_{task_id}_42"
+    exp_dir.mkdir(exist_ok=True)
+    summary = {
+        "cum_reward": reward,
+        "n_steps": n_steps,
+        "stats.cum_step_elapsed": 2.0,
+        "stats.cum_agent_elapsed": 8.0,
+        "err_msg": err_msg,
+    }
+    (exp_dir / aggregator.SUMMARY_INFO).write_text(json.dumps(summary))
+    (exp_dir / EXPERIMENT_LOG).write_text(f"<id>{task_id}</id>\n<answer>{answer}</answer>\n")
+    return exp_dir
+
+
+def write_scores(result_dir, scores):
+    with open(result_dir / SCORES_FILE, "w", encoding="utf-8") as f:
+        for exp_dir, score in scores.items():
+            f.write(json.dumps({"exp_dir": str(exp_dir), "score": score}) + "\n")
+
+
+def scan(result_dir):
+    with ResultsIndex(str(result_dir)) as index:
+        return index.scan()
+
+
+def counts(added=0, updated=0, removed=0, unchanged=0, running=0):
+    return {"added": added, "updated": updated, "removed": removed, "unchanged": unchanged, "running": running}
+
+
+def test_read_episode(tmp_path, catalog):
+    exp_dir = make_episode(tmp_path, "fieldworkarena.1.1.0001", err_msg="timeout")
+    assert read_episode(str(exp_dir)) == {
+        "name": exp_dir.name,
+        "task_id": "fieldworkarena.1.1.0001",
+        "category": "factory",
+        "grp": "1.1",
+        "reward": 1.0,
+        "n_steps": 3,
+        "duration": 10.0,
+        "answer": "3",
+        "err_msg": "timeout",
+        "score": None,
+    }
+
+
+def test_unfinished_episode_has_no_stamp(tmp_path):
+    exp_dir = tmp_path / "2024-05-01_10-00-00_DemoAgent_on_fieldworkarena.1.1.0001_42"
+    exp_dir.mkdir()
+    assert exp_dir_stamp(str(exp_dir)) is None
+
+
+def test_scan_is_incremental(tmp_path, catalog):
+    first = make_episode(tmp_path, "fieldworkarena.1.1.0001")
+    second = make_episode(tmp_path, "fieldworkarena.2.1.0001")
+    (tmp_path / "2024-05-01_11-00-00_DemoAgent_on_fieldworkarena.1.1.0002_42").mkdir()
+    assert scan(tmp_path) == counts(added=2, running=1)
+    assert scan(tmp_path) == counts(unchanged=2, running=1)
+
+    make_episode(tmp_path, "fieldworkarena.1.1.0001", reward=0.0, n_steps=12)
+    assert scan(tmp_path) == counts(updated=1, unchanged=1, running=1)
+
+    for path in second.iterdir():
+        path.unlink()
+    second.rmdir()
+    assert scan(tmp_path) == counts(removed=1, unchanged=1, running=1)
+
+    with ResultsIndex(str(tmp_path)) as index:
+        (row,) = index.episodes()
+    assert (row["name"], row["reward"], row["n_steps"]) == (first.name, 0.0, 12)
+
+
+def test_scan_does_not_read_unchanged_episodes(tmp_path, catalog, monkeypatch):
+    make_episode(tmp_path, "fieldworkarena.1.1.0001")
+    scan(tmp_path)
+    read = []
+    monkeypatch.setattr(aggregator, "read_episode", lambda exp_dir: read.append(exp_dir))
+    assert scan(tmp_path) == counts(unchanged=1)
+    assert read == []
+
+
+def test_scores_are_joined_when_they_change(tmp_path, catalog):
+    first = make_episode(tmp_path, "fieldworkarena.1.1.0001")
+    second = make_episode(tmp_path, "fieldworkarena.1.1.0002")
+    write_scores(tmp_path, {first: 1.0})
+    scan(tmp_path)
+    with ResultsIndex(str(tmp_path)) as index:
+        assert [row["score"] for row in index.episodes()] == [1.0, None]
+
+    # grading again changes the scores of episodes that did not change
+    write_scores(tmp_path, {first: 0.0, second: 1.0})
+    assert scan(tmp_path) == counts(unchanged=2)
+    with ResultsIndex(str(tmp_path)) as index:
+        assert [row["score"] for row in index.episodes()] == [0.0, 1.0]
+
+    # a rewritten episode keeps its score
+    make_episode(tmp_path, "fieldworkarena.1.1.0002", answer="four")
+    scan(tmp_path)
+    with ResultsIndex(str(tmp_path)) as index:
+        assert index.episodes("fieldworkarena.1.1.0002")[0]["score"] == 1.0
+
+
+def test_missing_categories_are_filled_later(tmp_path, catalog):
+    catalog.categories = {}
+    make_episode(tmp_path, "fieldworkarena.1.1.0001")
+    scan(tmp_path)
+    with ResultsIndex(str(tmp_path)) as index:
+        assert index.episodes()[0]["category"] is None
+
+    # the task id lists are found on a later scan
+    catalog.categories = dict(CATEGORIES)
+    assert scan(tmp_path) == counts(unchanged=1)
+    with ResultsIndex(str(tmp_path)) as index:
+        assert index.episodes()[0]["category"] == "factory"
+
+
+def test_summary(tmp_path, catalog):
+    make_episode(tmp_path, "fieldworkarena.1.1.0001", date="2024-05-01_10-00-00", reward=0.0)
+    make_episode(tmp_path, "fieldworkarena.1.1.0001", date="2024-05-02_10-00-00", reward=1.0)
+    make_episode(tmp_path, "fieldworkarena.1.1.0002", reward=0.0, err_msg="timeout")
+    make_episode(tmp_path, "fieldworkarena.2.1.0001", reward=1.0, n_steps=5)
+    with ResultsIndex(str(tmp_path)) as index:
+        index.scan()
+        latest = index.summary("category")
+        assert [(row["category"], row["episodes"], row["reward"], row["errors"]) for row in latest] == [
+            ("factory", 2, 0.5, 1),
+            ("warehouse", 1, 1.0, 0),
+        ]
+        all_runs = index.summary("group", latest_only=False)
+        assert [(row["group"], row["episodes"], row["duration"]) for row in all_runs] == [("1.1", 3, 30.0), ("2.1", 1, 10.0)]
+
+
+def test_index_of_another_schema_is_rebuilt(tmp_path, catalog, monkeypatch):
+    make_episode(tmp_path, "fieldworkarena.1.1.0001")
+    scan(tmp_path)
+    monkeypatch.setattr(aggregator, "SCHEMA_VERSION", aggregator.SCHEMA_VERSION + 1)
+    assert scan(tmp_path) == counts(added=1)
+
+
+def test_categories_do_not_depend_on_the_working_directory(tmp_path, monkeypatch):
+    task_dir = tmp_path / "tasks"
+    task_dir.mkdir()
+    (task_dir / "Tasks_1.1.json").write_text(
+        json.dumps([{"id": "1.1.0001", "output_format": "text", "input_data": "image a.jpg", "conversations": []}])
+    )
+    monkeypatch.chdir(tmp_path)
+    assert not os.path.exists("all_task_ids_factory.txt")
+    assert TaskCatalog(str(task_dir)).category_of("fieldworkarena.1.1.0001") == "factory"
@@ -0,0 +1,110 @@
+import importlib
+import json
+import os
+
+import pytest
+
+from benchmark.catalog import TaskCatalog, base_task_id, task_group
+
+
+def task_config(task_id, output_format="text", input_data="image factory_01.jpg"):
+    return {
+        "id": task_id,
+        "output_format": output_format,
+        "input_data": input_data,
+        "conversations": [{"from": "human", "value": f"Question {task_id}"}],
+    }
+
+
+@pytest.fixture
+def task_dir(tmp_path):
+    path = tmp_path / "group2"
+    path.mkdir()
+    (path / "Tasks_1.1.json").write_text(json.dumps([task_config("1.1.0001"), task_config("1.1.0002", "json")]))
+    (path / "Tasks_2.1.json").write_text(json.dumps([task_config("2.1.0001", input_data="video warehouse_01.mp4")]))
+    return path
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Number of times the catalog was built from the task files instead of the cache."""
+    calls = []
+    load = TaskCatalog._load
+
+    def counting_load(self):
+        calls.append(self.task_dir)
+        load(self)
+
+    monkeypatch.setattr(TaskCatalog, "_load", counting_load)
+    return calls
+
+
+def test_catalog_indexes(task_dir):
+    catalog = TaskCatalog(str(task_dir))
+    assert catalog.task_ids() == ["fieldworkarena.1.1.0001", "fieldworkarena.1.1.0002", "fieldworkarena.2.1.0001"]
+    assert catalog.by_group("1.1") == ["fieldworkarena.1.1.0001", "fieldworkarena.1.1.0002"]
+    assert catalog.by_output_format("json") == ["fieldworkarena.1.1.0002"]
+    assert catalog.by_media("data/movie/warehouse_01.mp4") == ["fieldworkarena.2.1.0001"]
+    assert catalog.get("fieldworkarena.9.9.9999") is None
+
+
+def test_cache_is_used_when_files_are_unchanged(task_dir, tmp_path, loads):
+    cache_path = str(tmp_path / "catalog.pickle")
+    first = TaskCatalog(str(task_dir), cache_path)
+    second = TaskCatalog(str(task_dir), cache_path)
+    assert len(loads) == 1
+    assert second.task_ids() == first.task_ids()
+
+
+def test_touched_file_with_same_content_keeps_the_cache(task_dir, tmp_path, loads):
+    cache_path = str(tmp_path / "catalog.pickle")
+    TaskCatalog(str(task_dir), cache_path)
+    path = task_dir / "Tasks_1.1.json"
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    TaskCatalog(str(task_dir), cache_path)
+    assert len(loads) == 1
+
+
+def test_changed_file_invalidates_the_cache(task_dir, tmp_path, loads):
+    cache_path = str(tmp_path / "catalog.pickle")
+    TaskCatalog(str(task_dir), cache_path)
+    (task_dir / "Tasks_1.1.json").write_text(json.dumps([task_config("1.1.0001"), task_config("1.1.0003")]))
+    catalog = TaskCatalog(str(task_dir), cache_path)
+    assert len(loads) == 2
+    assert "fieldworkarena.1.1.0003" in catalog
+    assert "fieldworkarena.1.1.0002" not in catalog
+
+
+def test_added_file_invalidates_the_cache(task_dir, tmp_path, loads):
+    cache_path = str(tmp_path / "catalog.pickle")
+    TaskCatalog(str(task_dir), cache_path)
+    (task_dir / "Tasks_3.1.json").write_text(json.dumps([task_config("3.1.0001")]))
+    catalog = TaskCatalog(str(task_dir), cache_path)
+    assert len(loads) == 2
+    assert catalog.groups() == ["1.1", "2.1", "3.1"]
+
+
+def test_unreadable_cache_is_rebuilt(task_dir, tmp_path, loads):
+    cache_path = tmp_path / "catalog.pickle"
+    cache_path.write_bytes(b"not a pickle")
+    catalog = TaskCatalog(str(task_dir), str(cache_path))
+    assert len(catalog) == 3
+    TaskCatalog(str(task_dir), str(cache_path))
+    assert len(loads) == 1
+
+
+def test_old_cache_version_is_rebuilt(task_dir, tmp_path, loads, monkeypatch):
+    cache_path = str(tmp_path / "catalog.pickle")
+    TaskCatalog(str(task_dir), cache_path)
+    # benchmark.catalog is also the name of the package's catalog instance
+    catalog_module = importlib.import_module("benchmark.catalog")
+    monkeypatch.setattr(catalog_module, "CACHE_VERSION", catalog_module.CACHE_VERSION + 1)
+    TaskCatalog(str(task_dir), cache_path)
+    assert len(loads) == 2
+
+
+def test_task_id_helpers():
+    assert base_task_id("fieldworkarena.1.1.0001.report") == "fieldworkarena.1.1.0001"
+    assert base_task_id("fieldworkarena.1.1.0001") == "fieldworkarena.1.1.0001"
+    assert task_group("fieldworkarena.3.2.0004") == "3.2"
+    assert task_group("fieldworkarena.3.2.0004.report") == "3.2"
@@ -0,0 +1,141 @@
+import pytest
+
+from benchmark.metrics.automatic.comparators import (
+    compare_exact,
+    compare_json,
+    compare_numbers,
+    compare_time_ranges,
+    fast_match,
+)
+
+
+@pytest.mark.parametrize(
+    "answer, reference, expected",
+    [
+        ("Forklift.", "forklift", "correct"),
+        ("  The   Forklift ", "the forklift", "correct"),
+        ("a truck", "forklift", None),
+    ],
+)
+def test_compare_exact(answer, reference, expected):
+    assert compare_exact(answer, reference) == expected
+
+
+@pytest.mark.parametrize(
+    "answer, reference, expected",
+    [
+        ("There are 3 workers.", "3", "correct"),
+        ("1,200 boxes", "1200", "correct"),
+        ("2.50", "2.5", "correct"),
+        ("There are 4 workers.", "3", "incorrect"),
+        # several numbers, or a time, need the grader
+        ("3 workers and 2 forklifts", "3", None),
+        ("at 00:00:03", "3", None),
+        # only bare number references
+        ("3", "3 workers", None),
+        ("no number here", "3", None),
+    ],
+)
+def test_compare_numbers(answer, reference, expected):
+    assert compare_numbers(answer, reference) == expected
+
+
+@pytest.mark.parametrize(
+    "answer, reference, expected",
+    [
+        ("From 00:00:12 to 00:00:20", "00:00:12 - 00:00:20", "correct"),
+        ("start 0:00:13, end 0:00:21", "Start: 00:00:12, End: 00:00:20", "correct"),
+        ("00:12-00:20", "00:00:12 ~ 00:00:20", "correct"),
+        ('{"start_time": "00:00:12"}', "start_time: 00:00:12", "correct"),
+        ("From 00:00:30 to 00:00:40", "00:00:12 - 00:00:20", "incorrect"),
+        # a different number of times needs the grader
+        ("At 00:00:12", "00:00:12 - 00:00:20", None),
+    ],
+)
+def test_compare_time_ranges(answer, reference, expected):
+    assert compare_time_ranges(answer, reference) == expected
+
+
+def test_compare_time_ranges_tolerance():
+    assert compare_time_ranges("00:00:15", "00:00:12", tolerance=3.0) == "correct"
+    assert compare_time_ranges("00:00:16", "00:00:12", tolerance=3.0) == "incorrect"
+
+
+@pytest.mark.parametrize(
+    "reference",
+    [
+        "The worker enters at 00:00:12 without a helmet",
+        "An incident occurs at 00:00:12.",
+        "00:00:12 (no helmet)",
+    ],
+)
+def test_compare_time_ranges_ignores_references_with_other_text(reference):
+    assert compare_time_ranges("At 00:00:12 the worker enters wearing a helmet", reference) is None
+
+
+@pytest.mark.parametrize(
+    "answer, reference, expected",
+    [
+        ('{"count": 3, "area": "A"}', '{"count": 3, "area": "A"}', "correct"),
+        ('Here it is: {"Count": "3", "Area": "a"}', '{"count": 3, "area": "A"}', "correct"),
+        ('{"count": 4, "area": "A"}', '{"count": 3, "area": "A"}', "incorrect"),
+        ('[{"start": "00:00:13", "end": "00:00:20"}]', '[{"start": "00:00:12", "end": "00:00:20"}]', "correct"),
+        ('{"count": 4, "area": "B"}', '{"count": 3, "area": "A"}', "incorrect"),
+        ('{"ok": false}', '{"ok": true}', "incorrect"),
+        ('[{"start": "00:00:40"}]', '[{"start": "00:00:12"}]', "incorrect"),
+        # a different structure needs the grader
+        ('{"count": 3}', '{"count": 3, "area": "A"}', None),
+        ('{"count": 3, "note": "counted twice"}', '{"count": 3}', None),
+        ('[3]', '{"count": 3}', None),
+        ('{"count": [3]}', '{"count": 3}', None),
+        ("no json", '{"count": 3}', None),
+        # free text values need the grader
+        ('{"cause": "the box fell"}', '{"cause": "a box dropped"}', None),
+        # not a json reference
+        ('{"count": 3}', "3", None),
+    ],
+)
+def test_compare_json(answer, reference, expected):
+    assert compare_json(answer, reference) == expected
+
+
+@pytest.mark.parametrize(
+    "answer, reference, expected",
+    [
+        ("3", "3", ("correct", "exact")),
+        ("There are 3 workers", "3", ("correct", "number")),
+        ("From 00:00:12 to 00:00:20", "00:00:12-00:00:20", ("correct", "time_range")),
+        ('{"count": 3}', '{"count": 3}', ("correct", "json")),
+        ("At 00:00:12 the worker enters wearing a helmet", "The worker enters at 00:00:12 without a helmet", None),
+        ("The worker is not wearing a helmet", "No helmet", None),
+        # references meaning "not achievable" are left to the grader
+        ("N/A", "N/A", None),
+    ],
+)
+def test_fast_match(answer, reference, expected):
+    assert fast_match(answer, reference) == expected
+
+
+def test_compare_json_renamed_key_needs_grader():
+    answer = '{"Start Time": "00:00:12", "End Time": "00:00:20"}'
+    reference = '{"start_time": "00:00:12", "end_time": "00:00:20"}'
+    assert compare_json(answer, reference) is None
+    assert fast_match('{"Worker Count": 3}', '{"worker_count": 3}') is None
+
+
+@pytest.mark.parametrize(
+    "answer, expected",
+    [
+        ('["forklift", "pallet", "helmet"]', "correct"),
+        # reordered or partial lists need the grader
+        ('["helmet", "forklift", "pallet"]', None),
+        ('["forklift", "pallet"]', None),
+    ],
+)
+def test_compare_json_lists(answer, expected):
+    assert compare_json(answer, '["forklift", "pallet", "helmet"]') == expected
+
+
+def test_compare_json_list_with_a_value_matching_nothing():
+    assert compare_json("[3, 9]", "[4, 3]") == "incorrect"
+    assert compare_json('{"counts": [5, 3]}', '{"counts": [3, 5]}') is None
@@ -0,0 +1,159 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from openai.types.chat import ChatCompletion
+
+from benchmark import completion_cache
+from benchmark.completion_cache import CompletionCache, CompletionCacheMiss, get_completion_cache, request_key
+from benchmark.llm import LLMClient
+
+
+def make_completion(content="noop()", model="gpt-4o"):
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": model,
+            "choices": [
+                {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}
+            ],
+        }
+    )
+
+
+def make_request(text="How many workers?", image="data:image/jpeg;base64,AAAA"):
+    content = [{"type": "text", "text": text}, {"type": "image_url", "image_url": {"url": image, "detail": "low"}}]
+    return {"model": "gpt-4o", "messages": [{"role": "user", "content": content}], "temperature": 0}
+
+
+class FakeCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return make_completion(f"answer {self.calls}", kwargs["model"])
+
+
+class FakeAsyncClient:
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=FakeCompletions())
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(cache):
+        client = LLMClient(completion_cache=cache)
+        client._client = FakeAsyncClient()
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_request_key_hashes_images():
+    key = request_key(**make_request())
+    assert key == request_key(**make_request())
+    assert key != request_key(**make_request(image="data:image/jpeg;base64,BBBB"))
+    assert key != request_key(**make_request(text="How many forklifts?"))
+    normalized = completion_cache._normalize(make_request(image="data:image/jpeg;base64," + "A" * 10_000))
+    assert len(json.dumps(normalized)) < 1000
+
+
+def test_put_and_get(tmp_path):
+    cache = CompletionCache(str(tmp_path))
+    key = request_key(**make_request())
+    assert cache.get(key) is None
+    cache.put(key, make_completion(), "gpt-4o")
+    assert cache.get(key).choices[0].message.content == "noop()"
+    assert len(cache) == 1
+
+
+def test_records_of_other_instances_are_found(tmp_path):
+    # another process appending to the same store
+    reader = CompletionCache(str(tmp_path))
+    writer = CompletionCache(str(tmp_path))
+    keys = [request_key(**make_request(f"question {i}")) for i in range(3)]
+    for i, key in enumerate(keys):
+        writer.put(key, make_completion(f"answer {i}"))
+    assert [reader.get(key).choices[0].message.content for key in keys] == ["answer 0", "answer 1", "answer 2"]
+
+
+def test_index_is_reused_and_extended(tmp_path):
+    key = request_key(**make_request())
+    first = CompletionCache(str(tmp_path))
+    first.put(key, make_completion())
+    assert len(first) == 1
+    assert (tmp_path / completion_cache.INDEX_FILE).exists()
+
+    second = CompletionCache(str(tmp_path))
+    assert second._offsets == first._offsets
+    other = request_key(**make_request("question 2"))
+    first.put(other, make_completion("answer 2"))
+    assert second.get(other).choices[0].message.content == "answer 2"
+
+
+def test_index_of_a_replaced_store_is_ignored(tmp_path):
+    cache = CompletionCache(str(tmp_path))
+    for i in range(3):
+        cache.put(request_key(**make_request(f"question {i}")), make_completion())
+    # writes the index
+    assert len(cache) == 3
+    (tmp_path / completion_cache.STORE_FILE).write_text("")
+    assert len(CompletionCache(str(tmp_path))) == 0
+
+
+def test_partial_record_is_indexed_once_complete(tmp_path):
+    cache = CompletionCache(str(tmp_path))
+    key = request_key(**make_request())
+    line = json.dumps({"key": key, "model": "gpt-4o", "time": 0, "response": make_completion().model_dump(mode="json")})
+    store = tmp_path / completion_cache.STORE_FILE
+    store.write_text(line[:50])
+    assert cache.get(key) is None
+    store.write_text(line + "\n")
+    assert cache.get(key).choices[0].message.content == "noop()"
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        CompletionCache(mode="replay-all")
+
+
+def test_record_then_replay(tmp_path, make_client):
+    recorder = make_client(CompletionCache(str(tmp_path), "record"))
+    first = recorder.create(**make_request())
+    again = recorder.create(**make_request())
+    assert recorder._client.chat.completions.calls == 1
+    assert again.choices[0].message.content == first.choices[0].message.content == "answer 1"
+
+    replayer = make_client(CompletionCache(str(tmp_path), "replay"))
+    assert replayer.create(**make_request()).choices[0].message.content == "answer 1"
+    with pytest.raises(CompletionCacheMiss):
+        replayer.create(**make_request("How many forklifts?"))
+    assert replayer._client.chat.completions.calls == 0
+
+
+@pytest.mark.parametrize("mode", ["", "passthrough"])
+def test_get_completion_cache_passthrough(monkeypatch, mode):
+    monkeypatch.setenv("FIELDWORKARENA_LLM_CACHE", mode)
+    assert get_completion_cache() is None
+
+
+def test_get_completion_cache_from_env(tmp_path, monkeypatch):
+    monkeypatch.setattr(completion_cache, "_completion_cache", None)
+    monkeypatch.setenv("FIELDWORKARENA_LLM_CACHE", "replay")
+    monkeypatch.setenv("FIELDWORKARENA_LLM_CACHE_DIR", str(tmp_path / "replay"))
+    cache = get_completion_cache()
+    assert (cache.mode, cache.cache_dir) == ("replay", str(tmp_path / "replay"))
+    assert get_completion_cache() is cache
+    monkeypatch.setenv("FIELDWORKARENA_LLM_CACHE", "record")
+    assert get_completion_cache().mode == "record"
@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+from benchmark import grading
+from benchmark.grading import (
+    SCORES_FILE,
+    VerdictCache,
+    exp_task_id,
+    grade_results,
+    load_references,
+    read_answer,
+    verdict_key,
+)
+
+
+def make_exp_dir(result_dir, task_id, log, date="2024-05-01_10-00-00"):
+    exp_dir = result_dir / f"{date}_DemoAgent_on_{task_id}_42"
+    exp_dir.mkdir()
+    (exp_dir / grading.EXPERIMENT_LOG).write_text(log)
+    return exp_dir
+
+
+def logged(task_id, answer):
+    return f"INFO - task - <id>{task_id}</id>\n<answer>{answer}</answer>\n"
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("2024-05-01_10-00-00_DemoAgent_on_fieldworkarena.1.1.0001_42", "fieldworkarena.1.1.0001"),
+        ("2024-05-01_10-00-00_DemoAgent_on_fieldworkarena.1.1.0001.report_42", "fieldworkarena.1.1.0001.report"),
+        ("2024-05-01_10-00-00_other_experiment", None),
+    ],
+)
+def test_exp_task_id(tmp_path, name, expected):
+    assert exp_task_id(str(tmp_path / name)) == expected
+
+
+def test_read_answer_takes_the_last_answer(tmp_path):
+    exp_dir = make_exp_dir(tmp_path, "fieldworkarena.1.1.0001", logged("1.1.0001", "2") + logged("1.1.0001", " 3 "))
+    assert read_answer(str(exp_dir)) == {"task_id": "fieldworkarena.1.1.0001", "exp_dir": str(exp_dir), "answer": "3"}
+
+
+def test_read_answer_ignores_answers_of_other_tasks(tmp_path):
+    # a log that also holds the answer of another task must not lend it to this one
+    log = logged("1.1.0001", "3") + logged("fieldworkarena.2.1.0005", "forklift")
+    exp_dir = make_exp_dir(tmp_path, "fieldworkarena.1.1.0001", log)
+    assert read_answer(str(exp_dir))["answer"] == "3"
+
+    exp_dir = make_exp_dir(tmp_path, "fieldworkarena.1.1.0002", log)
+    assert read_answer(str(exp_dir)) == {"task_id": "fieldworkarena.1.1.0002", "exp_dir": str(exp_dir), "answer": None}
+
+
+def test_read_answer_of_report_task(tmp_path):
+    exp_dir = make_exp_dir(tmp_path, "fieldworkarena.1.1.0001.report", logged("1.1.0001", "incident reported"))
+    answer = read_answer(str(exp_dir))
+    assert answer["task_id"] == "fieldworkarena.1.1.0001.report"
+    assert answer["answer"] == "incident reported"
+
+
+def test_read_answer_of_unknown_task(tmp_path):
+    exp_dir = tmp_path / "experiment"
+    exp_dir.mkdir()
+    (exp_dir / grading.EXPERIMENT_LOG).write_text(logged("1.1.0001", "2") + logged("1.1.0002", "3"))
+    assert read_answer(str(exp_dir))["task_id"] == "fieldworkarena.1.1.0002"
+    assert read_answer(str(exp_dir))["answer"] == "3"
+    assert read_answer(str(tmp_path / "missing")) is None
+
+
+def test_load_references(tmp_path):
+    tasks = tmp_path / "tasks.json"
+    tasks.write_text(
+        json.dumps([{"id": "1.1.0001", "conversations": [{"from": "human", "value": "Q"}, {"from": "gpt", "value": "3"}]}])
+    )
+    answers = tmp_path / "answers.json"
+    answers.write_text(json.dumps({"fieldworkarena.2.1.0001": 4}))
+    assert load_references([str(tasks), str(answers)]) == {"fieldworkarena.1.1.0001": "3", "fieldworkarena.2.1.0001": "4"}
+
+
+def test_verdict_cache(tmp_path):
+    path = str(tmp_path / grading.CACHE_FILE)
+    key = verdict_key("Q", "3", "three")
+    VerdictCache(path).put(key, "correct")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "partial')
+    assert VerdictCache(path).get(key) == "correct"
+
+
+@pytest.fixture
+def grader(monkeypatch):
+    """Grader model answering from `verdicts` (answer -> verdict), counting its calls."""
+    calls = []
+    verdicts = {}
+
+    async def fake_grader(answer, reference, question):
+        calls.append(answer)
+        return verdicts[answer]
+
+    monkeypatch.setattr(grading, "allm_fuzzy_match_response", fake_grader)
+    monkeypatch.setattr(grading, "question_of", lambda task_id: f"Question of {task_id}")
+    return calls, verdicts
+
+
+def read_scores(result_dir):
+    with open(result_dir / SCORES_FILE, encoding="utf-8") as f:
+        return {entry["task_id"]: entry for entry in map(json.loads, f)}
+
+
+def test_grade_results(tmp_path, grader):
+    calls, verdicts = grader
+    verdicts.update({"a forklift": "correct", "a helmet": "the answer is probably right"})
+    make_exp_dir(tmp_path, "fieldworkarena.1.1.0001", logged("1.1.0001", "There are 3 workers"))
+    make_exp_dir(tmp_path, "fieldworkarena.1.1.0002", logged("1.1.0002", "a forklift"))
+    make_exp_dir(tmp_path, "fieldworkarena.1.1.0003", logged("1.1.0003", "a helmet"))
+    make_exp_dir(tmp_path, "fieldworkarena.1.1.0004", "no answer logged")
+    make_exp_dir(tmp_path, "fieldworkarena.1.1.0005", logged("1.1.0005", "3"))
+    references = {f"fieldworkarena.1.1.000{i}": reference for i, reference in enumerate(["3", "forklift", "helmet", "2"], 1)}
+
+    entries, stats = grade_results(str(tmp_path), references)
+    assert stats == {"fast_path": 1, "graded": 2, "cached": 0, "errors": 1}
+    scores = read_scores(tmp_path)
+    assert [(entry["status"], entry["score"]) for entry in scores.values()] == [
+        ("graded", 1.0),
+        ("graded", 1.0),
+        # a verdict that is none of correct / incorrect / partially correct
+        ("error", None),
+        ("no_answer", 0.0),
+        ("no_reference", None),
+    ]
+    assert scores["fieldworkarena.1.1.0001"]["grader"] == "number"
+
+    # grading again only grades what was not graded before
+    calls.clear()
+    _, stats = grade_results(str(tmp_path), references)
+    assert stats == {"fast_path": 1, "graded": 0, "cached": 2, "errors": 1}
+    assert calls == []
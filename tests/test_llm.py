@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmark.llm import LLMClient, RetryPolicy, backoff_delay
+
+
+class FakeCompletions:
+    """chat.completions of an AsyncOpenAI client, failing the first `failures` calls."""
+
+    def __init__(self, failures=0, delay=0.0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise asyncio.TimeoutError()
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(model=kwargs["model"], usage=None)
+
+
+class FakeAsyncClient:
+    def __init__(self, completions):
+        self.chat = SimpleNamespace(completions=completions)
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def make_client():
+    clients = []
+
+    def make(completions, **policy):
+        client = LLMClient(policy=RetryPolicy(base_delay=0.0, **policy))
+        client._client = FakeAsyncClient(completions)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        client.close()
+
+
+def test_backoff_delay_uses_retry_after():
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    assert backoff_delay(0, policy, retry_after=3.0) == 3.0
+    assert backoff_delay(0, policy, retry_after=30.0) == 10.0
+
+
+@pytest.mark.parametrize("attempt, limit", [(0, 1.0), (2, 4.0), (10, 10.0)])
+def test_backoff_delay_jitter(attempt, limit):
+    policy = RetryPolicy(base_delay=1.0, max_delay=10.0)
+    delays = [backoff_delay(attempt, policy) for _ in range(100)]
+    assert all(0 <= delay <= limit for delay in delays)
+
+
+def test_create_retries_timeouts(make_client):
+    completions = FakeCompletions(failures=2)
+    client = make_client(completions, max_retries=2)
+    assert client.create(model="gpt-4o", messages=[]).model == "gpt-4o"
+    assert completions.calls == 3
+
+
+def test_create_gives_up_after_max_retries(make_client):
+    completions = FakeCompletions(failures=3)
+    client = make_client(completions, max_retries=2)
+    with pytest.raises(asyncio.TimeoutError):
+        client.create(model="gpt-4o", messages=[])
+    assert completions.calls == 3
+
+
+def test_create_from_threads_overlaps(make_client):
+    completions = FakeCompletions(delay=0.3)
+    client = make_client(completions)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(client.create(model="gpt-4o", messages=[]))) for _ in range(8)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8
+    assert completions.max_in_flight == 8
+    assert time.perf_counter() - start < 8 * 0.3
+
+
+def test_acreate_from_another_event_loop(make_client):
+    client = make_client(FakeCompletions())
+    response = asyncio.run(client.acreate(model="gpt-4o", messages=[]))
+    assert response.model == "gpt-4o"
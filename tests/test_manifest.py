@@ -0,0 +1,67 @@
+import dataclasses
+
+import pytest
+
+from benchmark.manifest import MANIFEST_FILE, RunManifest, episode_key
+
+TASK = "fieldworkarena.1.1.0001"
+
+
+@dataclasses.dataclass
+class AgentArgs:
+    model_name: str = "gpt-4o"
+    use_html: bool = False
+
+
+@pytest.fixture
+def exp_dir(tmp_path):
+    path = tmp_path / "results" / "2026-10-18_AgentArgs_on_fieldworkarena.1.1.0001_None"
+    path.mkdir(parents=True)
+    return str(path)
+
+
+def test_episode_key_depends_on_task_and_agent_args():
+    key = episode_key(TASK, AgentArgs())
+    assert key == episode_key(TASK, AgentArgs())
+    assert key != episode_key("fieldworkarena.1.1.0002", AgentArgs())
+    assert key != episode_key(TASK, AgentArgs(model_name="gpt-4o-mini"))
+    assert key != episode_key(TASK + ".report", AgentArgs())
+
+
+def test_finished_episode_is_skipped_after_restart(tmp_path, exp_dir):
+    result_dir = str(tmp_path / "results")
+    RunManifest(result_dir).record(TASK, AgentArgs(), {"exp_dir": exp_dir, "err_msg": None})
+
+    manifest = RunManifest(result_dir)
+    assert manifest.pending([TASK, "fieldworkarena.1.1.0002"], AgentArgs()) == ["fieldworkarena.1.1.0002"]
+
+
+def test_changed_agent_args_run_again(tmp_path, exp_dir):
+    result_dir = str(tmp_path / "results")
+    RunManifest(result_dir).record(TASK, AgentArgs(), {"exp_dir": exp_dir})
+    assert RunManifest(result_dir).pending([TASK], AgentArgs(use_html=True)) == [TASK]
+
+
+def test_failed_episode_runs_again(tmp_path, exp_dir):
+    result_dir = str(tmp_path / "results")
+    RunManifest(result_dir).record(TASK, AgentArgs(), {"exp_dir": exp_dir, "err_msg": "TimeoutError"})
+    assert RunManifest(result_dir).pending([TASK], AgentArgs()) == [TASK]
+
+
+def test_deleted_exp_dir_runs_again(tmp_path, exp_dir):
+    import shutil
+
+    result_dir = str(tmp_path / "results")
+    RunManifest(result_dir).record(TASK, AgentArgs(), {"exp_dir": exp_dir})
+    shutil.rmtree(exp_dir)
+    assert RunManifest(result_dir).pending([TASK], AgentArgs()) == [TASK]
+
+
+def test_latest_entry_wins_and_partial_lines_are_ignored(tmp_path, exp_dir):
+    result_dir = str(tmp_path / "results")
+    manifest = RunManifest(result_dir)
+    manifest.record(TASK, AgentArgs(), {"exp_dir": exp_dir, "err_msg": "TimeoutError"})
+    manifest.record(TASK, AgentArgs(), {"exp_dir": exp_dir})
+    with open(tmp_path / "results" / MANIFEST_FILE, "a", encoding="utf-8") as f:
+        f.write('{"task_id": "fieldworkarena.1.1.0002", "key"')
+    assert RunManifest(result_dir).pending([TASK], AgentArgs()) == []
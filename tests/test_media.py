@@ -0,0 +1,140 @@
+import base64
+import gc
+import io
+import os
+import sys
+import warnings
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+import media  # noqa: E402
+from media import load_image  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_media_cache(monkeypatch):
+    monkeypatch.setenv("FIELDWORKARENA_MEDIA_CACHE", "")
+
+
+def make_image_file(path, size=(640, 480), image_format="PNG"):
+    rng = np.random.default_rng(0)
+    Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)).save(path, format=image_format)
+    return str(path)
+
+
+def decoded_size(url: str) -> tuple:
+    with Image.open(io.BytesIO(base64.b64decode(url.partition(",")[2]))) as image:
+        return image.size
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_load_image_closes_the_file(tmp_path):
+    paths = [make_image_file(tmp_path / f"image_{i}.png") for i in range(20)]
+    before = open_fds()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", ResourceWarning)
+        encoded = [load_image(path, media.ImageBudget(max_pixels=100_000)) for path in paths]
+        gc.collect()
+    assert open_fds() == before
+    assert all(item["url"].startswith("data:image/jpeg;base64,") for item in encoded)
+
+
+def test_load_image_without_budget_keeps_size(tmp_path):
+    encoded = load_image(make_image_file(tmp_path / "image.jpg", image_format="JPEG"))
+    assert decoded_size(encoded["url"]) == (640, 480)
+    assert encoded["detail"] == "auto"
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_load_image_closes_the_file_when_encoding_fails(tmp_path, monkeypatch):
+    def failing_encode(image, budget=media.NO_BUDGET, **kwargs):
+        raise RuntimeError("encoder failed")
+
+    monkeypatch.setattr(media, "encode_image", failing_encode)
+    path = make_image_file(tmp_path / "image.png")
+    before = open_fds()
+    # the traceback keeps the frames, and so an unclosed image, alive
+    with pytest.raises(RuntimeError) as excinfo:
+        load_image(path)
+    assert excinfo.traceback
+    assert open_fds() == before
+
+
+def make_image(size=(640, 480)):
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+
+
+@pytest.mark.parametrize(
+    "size, expected",
+    [
+        ((400, 300), "low"),
+        ((1280, 720), "high"),
+    ],
+)
+def test_encode_image_resolves_auto_detail_by_size(size, expected):
+    encoded = media.encode_image(make_image(size), media.ImageBudget(max_pixels=2_000_000))
+    assert encoded["detail"] == expected
+
+
+@pytest.mark.parametrize("detail", ["low", "high"])
+def test_encode_image_keeps_explicit_detail_under_a_budget(detail):
+    budget = media.ImageBudget(max_pixels=100_000)
+    large = media.encode_image(make_image((1280, 720)), budget, default_detail=detail)
+    small = media.encode_image(make_image((320, 240)), budget, default_detail=detail)
+    assert large["detail"] == small["detail"] == detail
+
+
+def test_encode_image_respects_max_pixels():
+    encoded = media.encode_image(make_image((1280, 720)), media.ImageBudget(max_pixels=100_000))
+    width, height = decoded_size(encoded["url"])
+    assert width * height <= 100_000
+    assert abs(width / height - 1280 / 720) < 0.05
+    assert encoded["bytes"] < encoded["native_bytes"]
+
+
+def test_encode_image_respects_max_bytes():
+    encoded = media.encode_image(make_image((1280, 720)), media.ImageBudget(max_bytes=50_000))
+    assert encoded["bytes"] == len(encoded["url"]) <= 50_000
+    assert encoded["native_bytes"] > 50_000
+
+
+def test_encode_image_within_budget_is_not_scaled():
+    encoded = media.encode_image(make_image((320, 240)), media.ImageBudget(max_pixels=100_000))
+    assert decoded_size(encoded["url"]) == (320, 240)
+    assert encoded["bytes"] == encoded["native_bytes"]
+
+
+@pytest.mark.parametrize(
+    "budget, n_images, expected",
+    [
+        (media.ImageBudget(episode_max_bytes=400_000), 4, 100_000),
+        (media.ImageBudget(max_bytes=50_000, episode_max_bytes=400_000), 4, 50_000),
+        (media.ImageBudget(max_bytes=50_000), 4, 50_000),
+        (media.ImageBudget(episode_max_bytes=400_000), 0, None),
+    ],
+)
+def test_image_budget_per_image(budget, n_images, expected):
+    per_image = budget.per_image(n_images)
+    assert per_image.max_bytes == expected
+    assert per_image.max_pixels == budget.max_pixels
+    assert per_image.episode_max_bytes is None
+
+
+def test_encode_frames_are_low_detail():
+    frames = [make_image((1280, 720))[..., ::-1].copy() for _ in range(3)]
+    for budget in (media.NO_BUDGET, media.ImageBudget(max_pixels=2_000_000)):
+        encoded = media.encode_frames(frames, budget)
+        assert [frame["detail"] for frame in encoded] == ["low"] * 3
+
+
+def test_video_cache_key_tracks_frame_detail(tmp_path):
+    _, params, _ = media._media_spec(str(tmp_path / "video.mp4"), budget=media.ImageBudget(max_pixels=100_000))
+    assert params["detail"] == "low"
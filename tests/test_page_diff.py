@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from page_diff import AXTREE_BID, HTML_BID, PageDiffer, diff_nodes, index_by_bid  # noqa: E402
+
+PAGE = ("http://localhost/incidents", 0)
+
+
+def make_tree(rows=50, **changes):
+    lines = ["RootWebArea 'Incidents'"]
+    for i in range(rows):
+        lines.append(changes.get(f"row{i}", f"\t[{i}] link 'Incident row {i}'"))
+    return "\n".join(line for line in lines if line is not None)
+
+
+def test_index_by_bid():
+    nodes = index_by_bid("RootWebArea 'x'\n\t[1] button 'a'\n\t\tStaticText 'b'\n\t[2] link 'c'", AXTREE_BID)
+    assert nodes == {"": "RootWebArea 'x'", "1": "\t[1] button 'a'\n\t\tStaticText 'b'", "2": "\t[2] link 'c'"}
+    assert set(index_by_bid('<div bid="a1"><p bid="a2">x</p></div>', HTML_BID)) == {"a1"}
+
+
+def test_diff_nodes():
+    previous = {"1": "a", "2": "b", "3": "c"}
+    current = {"1": "a", "2": "B", "4": "d"}
+    assert diff_nodes(previous, current) == (["4"], ["3"], ["2"])
+
+
+def test_first_step_sends_full_tree():
+    tree = make_tree()
+    stats = {}
+    assert PageDiffer().update(tree, PAGE, stats) == tree
+    assert stats["axtree_diff"] == 0
+
+
+def test_diff_lists_changed_node():
+    differ = PageDiffer()
+    differ.update(make_tree(), PAGE)
+    stats = {}
+    diff = differ.update(make_tree(row3="\t[3] link 'Incident row 3' focused"), PAGE, stats)
+    assert "[3] link 'Incident row 3' focused" in diff
+    assert "[10] link" not in diff
+    assert stats["axtree_diff"] == 1
+    assert stats["axtree_chars"] < stats["axtree_full_chars"]
+
+
+def test_diff_is_relative_to_last_full_tree():
+    # prompts are stateless: a change of step 1 must still be listed at step 2
+    differ = PageDiffer()
+    differ.update(make_tree(), PAGE)
+    differ.update(make_tree(row3="\t[3] link 'changed 3'"), PAGE)
+    diff = differ.update(make_tree(row3="\t[3] link 'changed 3'", row7="\t[7] link 'changed 7'"), PAGE)
+    assert "[3] link 'changed 3'" in diff
+    assert "[7] link 'changed 7'" in diff
+
+
+def test_removed_and_added_nodes():
+    differ = PageDiffer()
+    differ.update(make_tree(), PAGE)
+    diff = differ.update(make_tree(row5=None) + "\n\t[99] dialog 'Saved'", PAGE)
+    assert "Removed: [5]" in diff
+    assert "[99] dialog 'Saved'" in diff
+
+
+def test_navigation_sends_full_tree():
+    differ = PageDiffer()
+    differ.update(make_tree(), PAGE)
+    tree = make_tree(row3="\t[3] link 'changed'")
+    assert differ.update(tree, ("http://localhost/other", 0)) == tree
+    assert differ.update(tree, ("http://localhost/other", 1)) == tree
+
+
+def test_refresh_every():
+    differ = PageDiffer(refresh_every=2)
+    tree = make_tree()
+    outputs = [differ.update(tree, PAGE) for _ in range(5)]
+    assert [output == tree for output in outputs] == [True, False, False, True, False]
+
+
+def test_full_tree_when_diff_is_not_shorter():
+    differ = PageDiffer()
+    differ.update(make_tree(rows=3), PAGE)
+    tree = make_tree(rows=3, row0="\t[0] x", row1="\t[1] y", row2="\t[2] z")
+    assert differ.update(tree, PAGE) == tree
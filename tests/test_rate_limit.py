@@ -0,0 +1,134 @@
+import asyncio
+import threading
+
+import pytest
+
+from benchmark import rate_limit
+from benchmark.rate_limit import DEFAULT_COMPLETION_TOKENS, RateLimiter, estimate_tokens
+
+
+class FakeClock:
+    """Stands in for the time module; sleep() advances the clock."""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize(
+    "messages, max_tokens, expected",
+    [
+        ([{"role": "user", "content": "x" * 400}], 100, 200),
+        ([{"role": "user", "content": [{"type": "text", "text": "x" * 40}]}], None, 10 + DEFAULT_COMPLETION_TOKENS),
+        (
+            [{"role": "user", "content": [{"type": "image_url", "image_url": {"url": "data:", "detail": "low"}}]}],
+            10,
+            85 + 10,
+        ),
+        ([{"role": "user", "content": [{"type": "image_url", "image_url": "data:"}]}], 10, 765 + 10),
+    ],
+)
+def test_estimate_tokens(messages, max_tokens, expected):
+    assert estimate_tokens(messages, max_tokens) == expected
+
+
+def test_unlimited_never_waits(tmp_path):
+    limiter = RateLimiter(state_dir=str(tmp_path))
+    assert not limiter.is_limited()
+    assert limiter.reserve("gpt-4o", 10**9) == 0.0
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_requests_per_minute(tmp_path, clock):
+    limiter = RateLimiter(rpm=60, state_dir=str(tmp_path))
+    assert [limiter.reserve("gpt-4o", 100) for _ in range(60)] == [0.0] * 60
+    assert limiter.reserve("gpt-4o", 100) == pytest.approx(1.0)
+    clock.sleep(1.0)
+    assert limiter.reserve("gpt-4o", 100) == 0.0
+
+
+def test_tokens_per_minute(tmp_path, clock):
+    limiter = RateLimiter(tpm=6000, state_dir=str(tmp_path))
+    assert limiter.reserve("gpt-4o", 5000) == 0.0
+    # a refused request takes nothing
+    assert limiter.reserve("gpt-4o", 2000) == pytest.approx(10.0)
+    assert limiter.reserve("gpt-4o", 1000) == 0.0
+    assert limiter.acquire("gpt-4o", 3000) == pytest.approx(30.0)
+
+
+def test_request_larger_than_the_bucket_waits_for_a_full_bucket(tmp_path, clock):
+    limiter = RateLimiter(tpm=6000, state_dir=str(tmp_path))
+    assert limiter.reserve("gpt-4o", 10_000) == 0.0
+    assert limiter.reserve("gpt-4o", 10_000) == pytest.approx(60.0)
+
+
+def test_settle_returns_unused_tokens(tmp_path, clock):
+    limiter = RateLimiter(tpm=6000, state_dir=str(tmp_path))
+    limiter.reserve("gpt-4o", 6000)
+    limiter.settle("gpt-4o", 6000, 1000)
+    assert limiter.reserve("gpt-4o", 5000) == 0.0
+    assert limiter.reserve("gpt-4o", 100) > 0
+
+
+def test_models_have_their_own_buckets(tmp_path, clock):
+    limiter = RateLimiter(rpm=1, state_dir=str(tmp_path))
+    assert limiter.reserve("gpt-4o", 1) == 0.0
+    assert limiter.reserve("gpt-4o-mini", 1) == 0.0
+    assert limiter.reserve("gpt-4o", 1) > 0
+
+
+def test_limiters_share_the_state_file(tmp_path, clock):
+    # as the processes of one host do
+    first = RateLimiter(rpm=2, state_dir=str(tmp_path))
+    second = RateLimiter(rpm=2, state_dir=str(tmp_path))
+    assert first.reserve("gpt-4o", 1) == 0.0
+    assert second.reserve("gpt-4o", 1) == 0.0
+    assert first.reserve("gpt-4o", 1) > 0
+    assert second.reserve("gpt-4o", 1) > 0
+
+
+@pytest.mark.skipif(rate_limit.fcntl is None, reason="needs fcntl")
+def test_aacquire_does_not_block_the_event_loop_on_the_lock(tmp_path):
+    limiter = RateLimiter(rpm=60, state_dir=str(tmp_path))
+    locked = threading.Event()
+    release = threading.Event()
+
+    def hold_lock():
+        # another process holding the state file
+        with open(limiter._state_path("gpt-4o") + ".lock", "a") as lock:
+            rate_limit.fcntl.flock(lock, rate_limit.fcntl.LOCK_EX)
+            locked.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    locked.wait(5)
+
+    async def main():
+        ticks = 0
+        acquire = asyncio.ensure_future(limiter.aacquire("gpt-4o", 1))
+        while ticks < 5:
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert not acquire.done()
+        release.set()
+        assert await acquire == 0.0
+        return ticks
+
+    try:
+        assert asyncio.run(main()) == 5
+    finally:
+        release.set()
+        holder.join()
@@ -0,0 +1,166 @@
+import logging
+import threading
+from pathlib import Path
+
+import pytest
+
+import browsergym.core
+import browsergym.core.chat
+import browsergym.core.env
+from browsergym.experiments import ExpArgs
+
+from benchmark import runner
+
+
+@pytest.fixture
+def restore_browsergym(monkeypatch):
+    """Undo the thread patches of the runner after the test."""
+    for module in (browsergym.core, browsergym.core.env, browsergym.core.chat):
+        monkeypatch.setattr(module, "_get_global_playwright", module._get_global_playwright)
+    monkeypatch.setattr(ExpArgs, "_set_logger", ExpArgs._set_logger)
+    monkeypatch.setattr(ExpArgs, "_unset_logger", ExpArgs._unset_logger)
+    root_logger = logging.getLogger()
+    handlers, level = root_logger.handlers[:], root_logger.level
+    yield
+    root_logger.handlers[:] = handlers
+    root_logger.setLevel(level)
+    runner._episode_log_handlers.clear()
+
+
+def test_check_threaded_support(monkeypatch):
+    runner.check_threaded_support()
+    monkeypatch.setattr(runner, "THREADED_BROWSERGYM_VERSION", "0.0.1")
+    with pytest.raises(RuntimeError, match="experimental"):
+        runner.check_threaded_support()
+
+
+def test_parse_args_refuses_threads_with_other_browsergym(monkeypatch):
+    monkeypatch.setattr(runner, "THREADED_BROWSERGYM_VERSION", "0.0.1")
+    assert runner.parse_args(["--task_name", "fieldworkarena.1.1.0001"]).n_threads == 1
+    with pytest.raises(SystemExit):
+        runner.parse_args(["--task_name", "fieldworkarena.1.1.0001", "--n_threads", "4"])
+
+
+def test_thread_playwright_patches_env_and_chat(restore_browsergym):
+    runner._install_thread_playwright()
+    get_playwright = browsergym.core._get_global_playwright
+    assert get_playwright.thread_aware
+    # chat.py and env.py import _get_global_playwright by name
+    assert browsergym.core.env._get_global_playwright is get_playwright
+    assert browsergym.core.chat._get_global_playwright is get_playwright
+
+    seen = {}
+
+    def episode(name):
+        runner._thread_local.playwright = name
+        try:
+            seen[name] = browsergym.core.chat._get_global_playwright()
+        finally:
+            runner._thread_local.playwright = None
+
+    threads = [threading.Thread(target=episode, args=(f"playwright-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {f"playwright-{i}": f"playwright-{i}" for i in range(4)}
+
+
+def test_thread_logging_keeps_experiment_logs_apart(tmp_path, restore_browsergym):
+    runner._install_thread_logging()
+    n_episodes, n_lines = 8, 20
+    barrier = threading.Barrier(4)
+
+    def episode_thread(episodes):
+        try:
+            barrier.wait()
+            for i in episodes:
+                exp_args = ExpArgs(agent_args=None, env_args=None)
+                exp_args.exp_dir = Path(tmp_path) / f"episode_{i}"
+                exp_args.exp_dir.mkdir()
+                exp_args._set_logger()
+                for line in range(n_lines):
+                    logging.getLogger("task").info("<id>%d</id> line %d", i, line)
+                exp_args._unset_logger()
+                exp_args.logging_file_handler.close()
+        finally:
+            with runner._logging_lock:
+                runner._drop_thread_log_handler()
+
+    threads = [threading.Thread(target=episode_thread, args=(range(j, n_episodes, 4),)) for j in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for i in range(n_episodes):
+        lines = (tmp_path / f"episode_{i}" / "experiment.log").read_text().splitlines()
+        assert len(lines) == n_lines
+        assert all(f"<id>{i}</id>" in line for line in lines)
+    assert not runner._episode_log_handlers
+
+
+DEMO_DIR = str(Path(__file__).resolve().parent.parent / "demo")
+
+
+def test_collect_task_ids_keeps_order_without_duplicates(tmp_path):
+    task_list = tmp_path / "tasks.txt"
+    task_list.write_text("fieldworkarena.1.1.0002\n\nfieldworkarena.1.1.0001\nfieldworkarena.1.1.0002\n")
+    task_ids = runner.collect_task_ids(["fieldworkarena.1.1.0001", "fieldworkarena.2.1.0001"], [str(task_list)])
+    assert task_ids == ["fieldworkarena.1.1.0001", "fieldworkarena.2.1.0001", "fieldworkarena.1.1.0002"]
+
+
+def test_collect_task_ids_by_category():
+    factory = runner.collect_task_ids(categories=["factory"])
+    assert factory and factory == runner.get_catalog().by_category("factory")
+    everything = runner.collect_task_ids(categories=["all"])
+    assert len(everything) == len(set(everything)) > len(factory)
+
+
+def test_make_agent_args_passes_only_given_options():
+    args = runner.parse_args(["--task_name", "fieldworkarena.1.1.0001", "--agent_path", DEMO_DIR])
+    agent_args = runner.make_agent_args(args)
+    assert agent_args.model_name == "gpt-4o"
+    assert agent_args.use_screenshot is True
+    assert agent_args.observation_diff is False
+
+    args = runner.parse_args(
+        ["--task_name", "x", "--agent_path", DEMO_DIR, "--observation_diff", "true", "--max_prompt_tokens", "1000"]
+    )
+    agent_args = runner.make_agent_args(args)
+    assert agent_args.observation_diff is True
+    assert agent_args.max_prompt_tokens == 1000
+
+
+def test_parse_args_needs_tasks():
+    with pytest.raises(SystemExit):
+        runner.parse_args([])
+
+
+def test_try_episode_records_harness_failures(monkeypatch):
+    def failing_episode(*args, **kwargs):
+        raise ValueError("no browser")
+
+    monkeypatch.setattr(runner, "run_episode", failing_episode)
+    record = runner._try_episode("fieldworkarena.1.1.0001", None, "results", 10)
+    assert record == {"err_msg": "ValueError: no browser", "wall_time": 0.0}
+
+
+def test_collect_yields_all_outcomes():
+    import queue
+
+    results = queue.Queue()
+    for i in range(3):
+        results.put((f"task{i}", {"wall_time": 1.0}))
+    assert [task for task, _ in runner._collect(results, 3, lambda: True)] == ["task0", "task1", "task2"]
+
+
+def test_collect_fails_when_workers_died():
+    import queue
+
+    results = queue.Queue()
+    results.put(("task0", {"wall_time": 1.0}))
+    outcomes = runner._collect(results, 2, lambda: False)
+    assert next(outcomes)[0] == "task0"
+    with pytest.raises(RuntimeError, match="1 episodes left"):
+        next(outcomes)
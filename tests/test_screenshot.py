@@ -0,0 +1,76 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+from media import ImageBudget  # noqa: E402
+from screenshot import BLOCK_SIZE, ScreenshotEncoder, screenshot_changed, screenshot_signature  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def no_media_cache(monkeypatch):
+    monkeypatch.setenv("FIELDWORKARENA_MEDIA_CACHE", "")
+
+
+def make_screenshot(value=200, size=(320, 240)):
+    return np.full((size[1], size[0], 3), value, dtype=np.uint8)
+
+
+def test_screenshot_signature_shape():
+    signature = screenshot_signature(make_screenshot(size=(330, 250)))
+    assert signature.shape == (250 // BLOCK_SIZE, 330 // BLOCK_SIZE)
+
+
+@pytest.mark.parametrize(
+    "change, expected",
+    [
+        (0, False),
+        (1, False),
+        (5, True),
+    ],
+)
+def test_screenshot_changed(change, expected):
+    screenshot = make_screenshot()
+    screenshot[:BLOCK_SIZE, :BLOCK_SIZE] += change
+    assert screenshot_changed(screenshot_signature(make_screenshot()), screenshot_signature(screenshot)) is expected
+
+
+def test_screenshot_changed_on_new_size():
+    previous = screenshot_signature(make_screenshot(size=(320, 240)))
+    assert screenshot_changed(previous, screenshot_signature(make_screenshot(size=(640, 480))))
+    assert screenshot_changed(None, previous)
+
+
+def test_encoder_sends_every_screenshot_by_default():
+    encoder = ScreenshotEncoder()
+    assert encoder.encode(make_screenshot()) is not None
+    assert encoder.encode(make_screenshot()) is not None
+
+
+def test_encoder_skips_unchanged_screenshot():
+    encoder = ScreenshotEncoder(skip_unchanged=True)
+    stats = {}
+    assert encoder.encode(make_screenshot(), stats) is not None
+    assert "screenshot_skipped" not in stats
+    stats = {}
+    assert encoder.encode(make_screenshot(), stats) is None
+    assert stats == {"screenshot_skipped": 1}
+    assert encoder.encode(make_screenshot(100)) is not None
+
+
+def test_encoder_sends_slow_changes_once_they_add_up():
+    # each step changes the page by less than the threshold, the sum of the steps does not
+    encoder = ScreenshotEncoder(skip_unchanged=True, threshold=2.0)
+    sent = [encoder.encode(make_screenshot(200 + step)) is not None for step in range(5)]
+    assert sent == [True, False, False, True, False]
+
+
+def test_encoder_stats_of_budget():
+    encoder = ScreenshotEncoder(budget=ImageBudget(max_pixels=20_000))
+    stats = {}
+    encoded = encoder.encode(make_screenshot(size=(1280, 720)), stats)
+    assert stats["screenshot_bytes"] == encoded["bytes"]
+    assert stats["screenshot_bytes_saved"] == encoded["native_bytes"] - encoded["bytes"] > 0
+    assert encoded["detail"] == "low"
@@ -0,0 +1,139 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "demo"))
+import token_budget  # noqa: E402
+from token_budget import IMAGE_TOKENS, TokenBudget, message_tokens  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def character_count(monkeypatch):
+    """Count about 4 characters per token, tiktoken downloads its encodings on first use."""
+    monkeypatch.setattr(token_budget, "tiktoken", None)
+    token_budget._encoding.cache_clear()
+    token_budget.count_tokens.cache_clear()
+    yield
+    token_budget._encoding.cache_clear()
+    token_budget.count_tokens.cache_clear()
+
+
+def text(value):
+    return {"type": "text", "text": value}
+
+
+def image(detail="low"):
+    return {"type": "image_url", "image_url": {"url": "data:image/jpeg;base64,AAAA", "detail": detail}}
+
+
+def action(i, reasoning_words=200):
+    reasoning = " ".join(["reasoning"] * reasoning_words)
+    return text(f"\n{reasoning}\n```click('{i}')```\n")
+
+
+def make_sections(n_actions=8, n_frames=8, tree_lines=200):
+    goal = [text("# Goal\nCount the workers.")]
+    for i in range(n_frames):
+        goal += [text(f"timestamp: 00:00:{i:02d}"), image()]
+    tree = "\n".join(f"[{i}] button 'item {i}'" for i in range(tree_lines))
+    return {
+        "goal": goal,
+        "axtree": [text(f"# Current page Accessibility Tree\n\n{tree}\n\n")],
+        "html": [text(f"# Current page DOM\n\n{tree}\n\n")],
+        "history": [text("# History of past actions\n")] + [action(i) for i in range(n_actions)],
+    }
+
+
+def tokens(budget, sections):
+    return sum(budget.count(msgs) for msgs in sections.values())
+
+
+@pytest.mark.parametrize("detail", ["low", "high", "auto"])
+def test_message_tokens_of_images(detail):
+    assert message_tokens([image(detail)]) == IMAGE_TOKENS[detail]
+
+
+def test_fit_keeps_a_prompt_within_budget():
+    sections = make_sections()
+    budget = TokenBudget(max_tokens=10**6)
+    stats = {}
+    trimmed = []
+    assert budget.fit(sections, stats, trimmed) == sections
+    assert trimmed == []
+    assert stats["prompt_tokens_estimate"] == tokens(budget, sections)
+
+
+def test_fit_summarizes_history_first():
+    sections = make_sections()
+    full = tokens(TokenBudget(0), sections)
+    budget = TokenBudget(max_tokens=full - 100)
+    stats = {}
+    fitted = budget.fit(sections, stats)
+    assert stats["history_summarized"] == 5
+    assert "history_dropped" not in stats
+    assert fitted["goal"] == sections["goal"]
+    assert fitted["axtree"] == sections["axtree"] and fitted["html"] == sections["html"]
+    # the latest actions keep their reasoning, the older ones only their action code
+    assert fitted["history"][-3:] == sections["history"][-3:]
+    assert fitted["history"][1] == text("\n```click('0')```\n")
+
+
+def test_fit_drops_oldest_actions_before_frames():
+    sections = make_sections()
+    budget = TokenBudget(max_tokens=10**6)
+    history = budget.count(sections["history"])
+    budget.max_tokens = tokens(budget, sections) - history + budget.count(sections["history"][-3:]) + 30
+    stats = {}
+    fitted = budget.fit(sections, stats)
+    assert 0 < stats["history_dropped"] <= 5
+    assert "frames_dropped" not in stats
+    assert fitted["history"][1]["text"] == f"\n({stats['history_dropped']} earlier actions omitted)\n"
+    assert fitted["history"][-3:] == sections["history"][-3:]
+    assert stats["prompt_tokens_estimate"] <= budget.max_tokens
+
+
+def test_fit_drops_every_other_frame_before_the_page_tree():
+    sections = make_sections(n_actions=0)
+    budget = TokenBudget(max_tokens=10**6)
+    budget.max_tokens = tokens(budget, sections) - 3 * IMAGE_TOKENS["low"]
+    stats = {}
+    fitted = budget.fit(sections, stats)
+    assert stats["frames_dropped"] == 4
+    timestamps = [msg["text"] for msg in fitted["goal"] if msg["type"] == "text" and msg["text"].startswith("timestamp")]
+    assert timestamps == [f"timestamp: 00:00:{i:02d}" for i in (0, 2, 4, 6)]
+    assert fitted["goal"][0] == sections["goal"][0]
+    assert fitted["html"] == sections["html"] and fitted["axtree"] == sections["axtree"]
+
+
+def test_fit_truncates_html_before_axtree():
+    sections = make_sections(n_actions=0, n_frames=1)
+    budget = TokenBudget(max_tokens=10**6)
+    budget.max_tokens = tokens(budget, sections) - budget.count(sections["html"]) // 2
+    stats = {}
+    trimmed = []
+    fitted = budget.fit(sections, stats, trimmed)
+    assert stats["html_lines_dropped"] > 0
+    assert "axtree_lines_dropped" not in stats
+    assert fitted["axtree"] == sections["axtree"]
+    assert fitted["html"][0]["text"].endswith(f"... ({stats['html_lines_dropped']} more lines truncated)\n\n")
+    assert trimmed == [f"html: {stats['html_lines_dropped']} of 203 lines truncated"]
+    assert stats["prompt_tokens_estimate"] <= budget.max_tokens
+
+
+def test_fit_truncates_axtree_last():
+    sections = make_sections(n_actions=6)
+    budget = TokenBudget(max_tokens=10**6)
+    recent_history = budget.count(sections["history"][:1] + sections["history"][-3:]) + 20
+    budget.max_tokens = recent_history + budget.count(sections["goal"][:3]) + budget.count(sections["axtree"]) // 2
+    stats = {}
+    trimmed = []
+    budget.fit(sections, stats, trimmed)
+    assert [line.split(":")[0] for line in trimmed] == ["history", "history", "goal", "html", "axtree"]
+    assert stats["frames_dropped"] == 7
+
+
+def test_fit_reports_a_prompt_still_over_budget():
+    trimmed = []
+    TokenBudget(max_tokens=10).fit({"goal": [text(" ".join(["goal"] * 100))]}, trimmed=trimmed)
+    assert trimmed == [f"prompt still {message_tokens([text(' '.join(['goal'] * 100))]) - 10} tokens over the budget of 10"]